@@ -9,7 +9,7 @@ from backend.api.kbase.models import KnowledgeBase
 from backend.api.assistant.models import Assistant
 from backend.api.chat.repository import ChatRepository, AgentMessagesRepository
 from backend.api.session.repository import SessionRepository
-from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.base_vector_store import BaseVectorStore
 from backend.util.auth_utils import TokenData
 
 class LLMGatewayFactory:
@@ -22,7 +22,7 @@ class LLMGatewayFactory:
         message_gateway: ChatRepository,
         agent_message_gateway: AgentMessagesRepository,
         session_gateway: SessionRepository,
-        vector_store: PostgresVectorStore,
+        vector_store: BaseVectorStore,
         current_user: TokenData = None
     ) -> BaseAssistantGateway:
         if assistant_type == "rag":
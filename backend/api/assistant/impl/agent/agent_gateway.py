@@ -2,7 +2,9 @@ import logging
 import json
 import logfire
 from typing import Optional, List, AsyncIterator
+from openai import AsyncOpenAI
 from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIModel
 from backend.api.chat.models import OpsLoomMessageChunk
 from backend.api.chat.models import ChatRequest, Message, MessagePair
 from backend.api.assistant.base_assistant_gateway import BaseAssistantGateway
@@ -10,6 +12,7 @@ from backend.api.chat.repository import ChatRepository, AgentMessagesRepository
 from backend.api.chat.models import AgentMessages
 from backend.api.session.repository import SessionRepository
 from backend.util.auth_utils import TokenData
+from backend.util.governed_http import governed_http_client
 from pydantic_ai.messages import (
     ModelMessagesTypeAdapter,
     ModelRequest,
@@ -29,6 +32,15 @@ from .tools import register_agent_tools
 
 logger = logging.getLogger(__name__)
 
+_openai_client: Optional[AsyncOpenAI] = None
+
+def _governed_openai_client() -> AsyncOpenAI:
+    """ One rate-governed client for all agent instances; 429s are retried by rate_governor, not the SDK. """
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(http_client=governed_http_client("openai"), max_retries=0)
+    return _openai_client
+
 
 class AgentGateway(BaseAssistantGateway):
     """
@@ -54,7 +66,8 @@ class AgentGateway(BaseAssistantGateway):
         # The AI Agent: pydantic-ai approach
         self.agent = Agent(
             name="hotel_agent",
-            model="openai:gpt-4o",
+            # Requests go through rate_governor (see backend/util/governed_http.py).
+            model=OpenAIModel("gpt-4o", openai_client=_governed_openai_client()),
             end_strategy="exhaustive",
             retries=2,
             model_settings={"parallel_tool_calls": False},
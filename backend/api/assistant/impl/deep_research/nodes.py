@@ -6,6 +6,8 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import END 
 from langchain_core.output_parsers import StrOutputParser
 
+from backend.util.governed_http import governed_http_client
+
 from .state import PlanExecute
 from .models import Plan, Response 
 from .prompts import PLANNER_PROMPT, REPLANNER_PROMPT, SYNTHESIS_PROMPT
@@ -16,9 +18,11 @@ logger = logging.getLogger(__name__)
 # Max steps safety limit
 MAX_STEPS = 15 #can also be set to a higher value
 
-planner_llm = ChatOpenAI(model="gpt-4o", temperature=0) 
-replanner_llm = ChatOpenAI(model="gpt-4o", temperature=0) 
-synthesis_llm = ChatOpenAI(model="gpt-4o", temperature=0)
+# Requests go through rate_governor (see backend/util/governed_http.py), which also retries 429s.
+_http_client = governed_http_client("openai")
+planner_llm = ChatOpenAI(model="gpt-4o", temperature=0, http_async_client=_http_client, max_retries=0)
+replanner_llm = ChatOpenAI(model="gpt-4o", temperature=0, http_async_client=_http_client, max_retries=0)
+synthesis_llm = ChatOpenAI(model="gpt-4o", temperature=0, http_async_client=_http_client, max_retries=0)
 
 # Chains
 planner = PLANNER_PROMPT | planner_llm.with_structured_output(Plan)
@@ -2,13 +2,16 @@ from langchain_openai import ChatOpenAI
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langgraph.prebuilt import create_react_agent
 
+from backend.util.governed_http import governed_http_client
+
 # System prompt for the ReAct agent that executes individual steps
 # This could be customized further if needed
 STEP_EXECUTOR_SYSTEM_PROMPT = "You are a helpful assistant. You have access to a search tool." 
 
 # Initialize LLM and Tools (ensure API keys are set in environment)
 # Consider making model name configurable
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
+# Requests go through rate_governor (see backend/util/governed_http.py), which also retries 429s.
+llm = ChatOpenAI(model="gpt-4o", temperature=0, http_async_client=governed_http_client("openai"), max_retries=0)
 tools = [TavilySearchResults(max_results=3)] # Reduced max_results for efficiency
 
 # Create the ReAct agent executor
@@ -7,6 +7,7 @@ from backend.api.chat.models import ChatRequest, Message, OpsLoomMessageChunk
 from backend.api.chat.repository import ChatRepository
 from backend.api.assistant.base_assistant_gateway import BaseAssistantGateway
 from backend.api.chat.chat_factory import ChatFactory
+from backend.util.tracing import stage, timed_stream
 
 logger = logging.getLogger(__name__)
 
@@ -44,13 +45,15 @@ class NoRagAssistant(BaseAssistantGateway):
         session_id = str(chat_request.session_id)
 
         # 1) Get chat history.
-        history = await self.get_chat_history(session_id)
+        with stage("chat_history"):
+            history = await self.get_chat_history(session_id)
 
         # 2) Construct prompt.
-        prompt = self.construct_prompt(query, history)
+        with stage("prompt"):
+            prompt = self.construct_prompt(query, history)
 
         # 3) Stream from LLM, yielding OpsLoomMessageChunk objects.
-        async for chunk in self.stream_llm_response(prompt):
+        async for chunk in timed_stream(self.stream_llm_response(prompt)):
             yield chunk
 
     async def get_summary_title(self, chat_request: ChatRequest) -> str:
@@ -1,7 +1,6 @@
 import logging
 import os
 from typing import AsyncIterator, List, Optional
-import cohere
 
 from backend.api.assistant.models import Assistant
 from backend.api.chat.models import ChatRequest, Message
@@ -9,8 +8,15 @@ from backend.api.kbase.models import KnowledgeBase
 from backend.api.chat.repository import ChatRepository
 from backend.api.chat.chat_factory import ChatFactory  
 from backend.util.config import get_config_value
-from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.util.tracing import stage, timed_stream
+from backend.api.kbase.base_vector_store import BaseVectorStore
+from backend.api.kbase.context_packing import pack_context
+from backend.api.kbase.embedder_registry import embedder_registry
+from backend.api.kbase.federated_search import FederatedVectorSearch
+from backend.api.kbase.reranker_factory import get_reranker
+from backend.api.kbase.rerank_stage import RerankStage
 from backend.api.assistant.base_assistant_gateway import BaseAssistantGateway
+from backend.api.assistant.query_classifier import is_chit_chat
 
 from backend.api.chat.models import OpsLoomMessageChunk 
 
@@ -18,12 +24,20 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
 ENV_RERANK = get_config_value("RERANK") == "true"
+RERANK_PROVIDER = get_config_value("RERANK_PROVIDER") or "cohere"
+RERANK_MODEL = get_config_value("RERANK_MODEL")
+RERANK_BUDGET_MS = float(get_config_value("RERANK_BUDGET_MS") or 300)
+RERANK_TOP_N = int(get_config_value("RERANK_TOP_N") or 2)
+RAG_CONTEXT_TOKEN_BUDGET = int(get_config_value("RAG_CONTEXT_TOKEN_BUDGET") or 3000)
+# Upper bound on retrieved chunks; the kbase's relevance cutoffs (max_distance, score_gap) may return fewer.
+RAG_TOP_K = int(get_config_value("RAG_TOP_K") or 5)
+RAG_SKIP_CHIT_CHAT = (get_config_value("RAG_SKIP_CHIT_CHAT") or "true") == "true"
 
 class RagAssistant(BaseAssistantGateway):
     __slots__ = (
         "vector_store",
         "message_gateway",
-        # "cohere_client",
+        "reranker",
         "knowledge_base",
         "assistant",
         "llm"
@@ -34,13 +48,13 @@ class RagAssistant(BaseAssistantGateway):
         knowledge_base: KnowledgeBase,
         assistant: Assistant,
         message_gateway: ChatRepository,
-        vector_store: PostgresVectorStore,
+        vector_store: BaseVectorStore,
         openai_key: Optional[str] = None,
         cohere_key: Optional[str] = None,
     ):
         self.vector_store = vector_store
         self.message_gateway = message_gateway
-        # self.cohere_client = cohere.Client(cohere_key or os.getenv("COHERE_API_KEY"))
+        self.reranker = self.initialize_reranker(cohere_key) if ENV_RERANK else None
         self.knowledge_base = knowledge_base
         self.assistant = assistant
         self.llm = self.initialize_llm(openai_key)
@@ -59,13 +73,34 @@ class RagAssistant(BaseAssistantGateway):
             api_key=openai_key or os.getenv("OPENAI_API_KEY")
         )
 
-    def embed_query(self, query: str) -> List[float]:
+    def initialize_reranker(self, cohere_key: Optional[str] = None) -> Optional[RerankStage]:
         """
-        Embed the query text using Cohere's embed API.
-        Note: This is a synchronous call. If needed, consider an async executor.
+        Build the rerank stage from RERANK_PROVIDER ("cohere" or "lexical"), around the
+        process-wide reranker for that provider, model and key (see get_reranker).
+        A reranker that cannot be created is logged and skipped rather than failing the chat.
         """
-        embedded_query = self.llm.embed_query(query)
-        return embedded_query
+        try:
+            reranker = get_reranker(
+                RERANK_PROVIDER,
+                api_key=cohere_key or os.getenv("COHERE_API_KEY"),
+                model=RERANK_MODEL,
+            )
+        except Exception as e:
+            logger.error(f"Reranking disabled, could not create the {RERANK_PROVIDER} reranker: {str(e)}")
+            return None
+        return RerankStage(reranker, budget_ms=RERANK_BUDGET_MS)
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embed the query text with the knowledge base's own embedder (the one its chunks were
+        indexed with), resolved through the embedder registry. A federated vector store searches
+        several kbases with one embedding, made with the embedder they share.
+        Results are served from the process-wide query embedding cache.
+        """
+        with stage("embed_query"):
+            if isinstance(self.vector_store, FederatedVectorSearch):
+                return await embedder_registry.embed_query_for_key(self.vector_store.embedder_key, query)
+            return await embedder_registry.embed_query(self.knowledge_base, query)
 
     async def get_ai_response_stream(self, chat_request: ChatRequest) -> AsyncIterator[OpsLoomMessageChunk]:
         """
@@ -74,22 +109,27 @@ class RagAssistant(BaseAssistantGateway):
           2) Gather chat history
           3) Construct prompt
           4) Stream LLM response as OpsLoomMessageChunk objects
+
+        Each step is timed as a stage of the current request trace (backend/util/tracing.py).
         """
         query = chat_request.message.content
         session_id = str(chat_request.session_id)
 
         # Step 1: Retrieve relevant documents
-        context = await self.retrieve_relevant_documents(query)
+        with stage("retrieval"):
+            context = await self.retrieve_relevant_documents(query)
 
         # Step 2: Get chat history
-        history = await self.get_chat_history(session_id)
+        with stage("chat_history"):
+            history = await self.get_chat_history(session_id)
 
         # Step 3: Construct prompt
-        prompt = self.construct_prompt(query, context, history)
+        with stage("prompt"):
+            prompt = self.construct_prompt(query, context, history)
 
         # Step 4: Stream LLM response
         # Return OpsLoomMessageChunk pieces directly so that the caller can process them.
-        async for chunk in self.stream_llm_response(prompt):
+        async for chunk in timed_stream(self.stream_llm_response(prompt)):
             yield chunk
 
     async def get_summary_title(self, chat_request: ChatRequest) -> str:
@@ -110,40 +150,54 @@ class RagAssistant(BaseAssistantGateway):
                 title += chunk["content"]
         return title.strip()
 
-    async def retrieve_relevant_documents(self, query: str, k: int = 5) -> str:
+    async def retrieve_relevant_documents(self, query: str, k: int = RAG_TOP_K) -> str:
         """
         1) Embed query
         2) Vector search
         3) Possibly rerank
         4) Return a concatenated context
+
+        Small talk ("thanks!", "hi") gets no context, skipping the embedding call and the search.
         """
-        query_embedding = self.embed_query(query)
+        if RAG_SKIP_CHIT_CHAT and is_chit_chat(query):
+            logger.info("Skipping retrieval for a chit-chat query")
+            return ""
+
+        query_embedding = await self.embed_query(query)
         logger.info(f"Knowledge base: {self.knowledge_base.name}")
 
         # 1) Retrieve documents from the vector store
-        retrieved_chunks = await self.vector_store.mmr_by_vector(
-            query_embedding=query_embedding,
-            k=k,
-        )
-        logger.info(f"Retrieved {len(retrieved_chunks.chunks)} documents from the vector store")
-
-        # 2) Prepare doc texts for optional re-rank
-        docs_for_rerank = [chunk.content for chunk in retrieved_chunks.chunks]
-
-        if ENV_RERANK:
-            # Rerank using Cohere
-            rerank_results = self.cohere_client.rerank(
-                query=query,
-                documents=docs_for_rerank,
-                top_n=2,
-                model='rerank-english-v3.0',
-                return_documents=True
+        retrieval_mode = self.assistant.config.retrieval_mode
+        if retrieval_mode == "hybrid":
+            retrieved_chunks = await self.vector_store.hybrid_search(
+                query_text=query,
+                query_embedding=query_embedding,
+                k=k,
+            )
+        elif retrieval_mode == "similarity":
+            retrieved_chunks = await self.vector_store.similarity_search_by_vector(
+                query_embedding=query_embedding,
+                k=k,
             )
-            ranked_documents = [str(result.document) for result in rerank_results.results]
-            context = "\n\n".join(ranked_documents)
         else:
-            context = "\n\n".join(docs_for_rerank)
+            retrieved_chunks = await self.vector_store.mmr_by_vector(
+                query_embedding=query_embedding,
+                k=k,
+            )
+        logger.info(f"Retrieved {len(retrieved_chunks.chunks)} of up to {k} documents from the vector store")
+
+        # 2) Optionally rerank the candidates; falls back to vector order on timeout or error.
+        chunks = retrieved_chunks.chunks
+        if self.reranker:
+            chunks = await self.reranker.rerank(query, chunks, top_n=RERANK_TOP_N)
 
+        # 3) Pack the chunks into the prompt budget, merging overlapping neighbours.
+        with stage("context_packing"):
+            context = pack_context(
+                chunks,
+                max_tokens=self.assistant.config.context_token_budget or RAG_CONTEXT_TOKEN_BUDGET,
+                model=self.assistant.config.model,
+            )
         return context
 
     async def get_chat_history(self, session_id: str) -> List[Message]:
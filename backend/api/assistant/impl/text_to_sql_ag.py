@@ -17,6 +17,7 @@ from psycopg2.extras import RealDictCursor
 
 # Import the ChatFactory to create the LLM instance.
 from backend.api.chat.chat_factory import ChatFactory
+from backend.util.tracing import stage
 
 logger = logging.getLogger(__name__)
 
@@ -207,7 +208,8 @@ or is irrelevant to the database schema and/or table name, please respond with j
     async def get_ai_response_stream(self, chat_request: ChatRequest) -> AsyncIterator[BaseMessageChunk]:
         query = chat_request.message.content
 
-        relevant = self.route_query(query)
+        with stage("route_query"):
+            relevant = self.route_query(query)
         logger.info(f"Query is relevant to the database schema: {relevant}")
         if not relevant:
             async for chunk in self.stream_llm_response(response_type="text", prompt=
@@ -222,13 +224,15 @@ or is irrelevant to the database schema and/or table name, please respond with j
             return  # Stop execution if not relevant
 
         # Generate SQL query from user query
-        sql_query = await self.generate_sql_query(query)
+        with stage("generate_sql"):
+            sql_query = await self.generate_sql_query(query)
         if not sql_query:
             yield BaseMessageChunk(content="Error generating SQL query.", type="text")
             return
         
         # Execute the SQL query
-        sql_results = await self.execute_sql_query(sql_query)
+        with stage("execute_sql"):
+            sql_results = await self.execute_sql_query(sql_query)
         if sql_results is None or not isinstance(sql_results, list):
             yield BaseMessageChunk(content="Error executing SQL query.", type="text")
             return
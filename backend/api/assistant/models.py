@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 from uuid import UUID, uuid4
 
 class Metadata(BaseModel):
@@ -19,6 +19,19 @@ class AssistantConfig(BaseModel):
     type: str = Field(..., description="type of the assistant")
     model: str = Field(..., description="Model used by the assistant")
     table_name: Optional[str] = Field(default=None, description="Table name for the assistant")
+    retrieval_mode: Literal["mmr", "similarity", "hybrid"] = Field(
+        default="mmr",
+        description="How rag assistants retrieve context: MMR, plain vector similarity, or hybrid lexical + vector"
+    )
+    additional_kbase_ids: List[UUID] = Field(
+        default=[],
+        description="Further knowledge bases searched together with kbase_id (federated retrieval)"
+    )
+    context_token_budget: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Maximum tokens of retrieved context in the prompt (RAG_CONTEXT_TOKEN_BUDGET by default)"
+    )
 
 class Assistant(BaseModel):
     id: UUID = Field(default_factory=uuid4)
@@ -0,0 +1,41 @@
+"""
+Cheap query classification done before retrieval.
+
+is_chit_chat recognises greetings, thanks, praise and goodbyes ("hi", "thanks a lot!",
+"great", "bye"): messages made up only of such words, with no question. Retrieving context
+for them costs an embedding call and a vector search and only adds unrelated text to the
+prompt. The word list is deliberately small, so anything with real content is still retrieved for.
+
+Answers and references are not chit-chat: "yes", "ok", "no" or "sure, that one" reply to the
+assistant's last question and need the same context as the conversation, so affirmations,
+negations and pronouns are not in the list.
+"""
+import re
+
+_TOKEN = re.compile(r"[a-z']+")
+
+# A chit-chat message is at most this many words; longer messages carry content.
+MAX_CHIT_CHAT_WORDS = 8
+
+CHIT_CHAT_WORDS = frozenset(
+    "hi hello hey hiya howdy yo greetings there all everyone morning afternoon evening good night "
+    "thanks thank thx ty cheers appreciate appreciated "
+    "you so much very a lot lots many "
+    "great cool nice awesome perfect excellent wonderful amazing helpful "
+    "bye goodbye see later cya ciao take care have day "
+    "lol haha hmm oh ah wow".split()
+)
+
+
+def is_chit_chat(query: str) -> bool:
+    """ True if the query is small talk that needs no knowledge-base context. """
+    text = query.strip().lower()
+    if not text or "?" in text:
+        return False
+    words = _TOKEN.findall(text)
+    if not words or len(words) > MAX_CHIT_CHAT_WORDS:
+        return False
+    # Anything besides words and punctuation/emoji (numbers, codes, paths) is content.
+    if re.search(r"\d", text):
+        return False
+    return all(word in CHIT_CHAT_WORDS for word in words)
@@ -55,7 +55,7 @@ class AssistantRepository:
             new_id = uuid.uuid4()
 
             # Convert config and metadata to dict before storing
-            config_dict = assistant_in.config.model_dump()
+            config_dict = assistant_in.config.model_dump(mode="json")
             # rename to 'assistant_metadata'
             metadata_dict = None
             if assistant_in.assistant_metadata: 
@@ -117,7 +117,7 @@ class AssistantRepository:
                 .values(
                     name=assistant_in.name,
                     system_prompts=assistant_in.system_prompts,
-                    config=assistant_in.config.model_dump(),
+                    config=assistant_in.config.model_dump(mode="json"),
                     assistant_metadata=assistant_in.assistant_metadata.model_dump() if assistant_in.assistant_metadata else None,
                 )
                 .returning(AssistantORM)
@@ -59,11 +59,33 @@ class AIResponseService:
         self.knowledge_base = kb
 
         # 3) Possibly build a vector store
-        if assistant.config.type in ["rag", "sql"]:
+        if assistant.config.type in ["rag", "sql"] and assistant.config.additional_kbase_ids:
+            # Federated retrieval across the assistant's kbase and its additional kbases.
+            from backend.api.kbase.federated_search import FederatedVectorSearch
+            if not kb:
+                # The assistant's own kbase is its primary one (prompt, logging); it cannot be missing.
+                raise ValueError(
+                    f"Assistant {assistant_id} has additional knowledge bases but its own knowledge base "
+                    f"{assistant.kbase_id} was not found"
+                )
+            kbases = [kb]
+            for kbase_id in assistant.config.additional_kbase_ids:
+                extra_kb = await self.kbase_repo.get_kbase_by_id(kbase_id)
+                if not extra_kb:
+                    logger.error(f"KnowledgeBase not found with id {kbase_id}")
+                    continue
+                kbases.append(extra_kb)
+            # Validates that every kbase shares one embedder (ValueError otherwise); queries are
+            # embedded once with it.
+            self.vector_store = FederatedVectorSearch(kbases)
+        elif assistant.config.type in ["rag", "sql"] and kb and kb.vector_backend == "flat":
+            from backend.api.kbase.flat_vector_store import flat_store_registry
+            self.vector_store = await flat_store_registry.get(self.db, kb)
+        elif assistant.config.type in ["rag", "sql"]:
             from backend.api.kbase.pgvectorstore import PostgresVectorStore
-            self.vector_store = PostgresVectorStore(
+            self.vector_store = PostgresVectorStore.from_kbase(
                 session=self.db,        # pass your AsyncSession
-                kbase_id=kb.id,         # or assistant.kbase_id
+                kbase=kb,               # carries the kbase's metric / index settings
             )
 
         # 4) Build the LLM gateway
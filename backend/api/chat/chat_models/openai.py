@@ -1,10 +1,40 @@
 import os
 import openai
-from typing import List, AsyncIterator, Iterator, Optional
+from typing import Dict, List, AsyncIterator, Iterator, Optional, Tuple
 from backend.api.chat.chat_model_base import BaseChatModel
 from backend.api.chat.models import OpsLoomMessageChunk
+from backend.api.kbase.context_packing import get_token_counter
+from backend.api.kbase.embedders.clients import key_fingerprint
+from backend.util.config import get_config_value
+from backend.util.rate_governor import rate_governor
+
+# Completion tokens counted against the tokens-per-minute limit before the answer is known.
+COMPLETION_TOKENS_ESTIMATE = int(get_config_value("CHAT_COMPLETION_TOKENS_ESTIMATE") or 512)
+
+# One sync and one async client (each with its connection pool) per API key, shared by all
+# chat model instances. Keyed by the key's fingerprint, as in embedders/clients.py.
+_clients: Dict[str, Tuple[openai.OpenAI, openai.AsyncOpenAI]] = {}
+
+def _clients_for(api_key: str) -> Tuple[openai.OpenAI, openai.AsyncOpenAI]:
+    fingerprint = key_fingerprint(api_key)
+    clients = _clients.get(fingerprint)
+    if clients is None:
+        # rate_governor retries 429s (and pauses the model for every caller); the SDK must not.
+        # Dedicated clients rather than the module-level openai settings, which other code shares.
+        clients = _clients[fingerprint] = (
+            openai.OpenAI(api_key=api_key, max_retries=0),
+            openai.AsyncOpenAI(api_key=api_key, max_retries=0),
+        )
+    return clients
 
 class OpenAIChatModel(BaseChatModel):
+    """
+    Chat model on the OpenAI API. The sync methods use a shared OpenAI client, the async ones
+    a shared AsyncOpenAI client, so neither a request nor reading a stream blocks the event
+    loop. Every request goes through rate_governor.
+    """
+    embedding_model = "text-embedding-3-large"
+
     def __init__(self, model: str = "gpt-4", temperature: float = 0.7, api_key: Optional[str] = None):
         self.model = model
         self.temperature = temperature
@@ -12,13 +42,18 @@ class OpenAIChatModel(BaseChatModel):
         if not self.api_key:
             raise ValueError("OpenAI API key must be provided or set in the OPENAI_API_KEY environment variable.")
         openai.api_key = self.api_key
+        self._client, self._async_client = _clients_for(self.api_key)
 
     def embed_query(self, query: str) -> List[float]:
         """
         Generate an embedding for the given query using OpenAI's API.
         """
-        response = openai.embeddings.create(input=query, model="text-embedding-3-large")
-     
+        response = rate_governor.call_sync(
+            "openai",
+            self.embedding_model,
+            lambda: self._client.embeddings.create(input=query, model=self.embedding_model),
+            tokens=get_token_counter(self.embedding_model)(query),
+        )
         return response.data[0].embedding
 
     def _format_messages(self, messages: List[str]) -> List[dict]:
@@ -29,83 +64,84 @@ class OpenAIChatModel(BaseChatModel):
         """
         return [{"role": "user", "content": m} for m in messages]
 
+    def _estimate_tokens(self, messages: List[str]) -> int:
+        count_tokens = get_token_counter(self.model)
+        return sum(count_tokens(m) for m in messages) + COMPLETION_TOKENS_ESTIMATE
+
+    def _create_completion(self, messages: List[str], stream: bool):
+        """ Blocking chat.completions.create, rate-governed; call it from a worker thread when on the event loop. """
+        return rate_governor.call_sync(
+            "openai",
+            self.model,
+            lambda: self._client.chat.completions.create(
+                model=self.model,
+                messages=self._format_messages(messages),
+                temperature=self.temperature,
+                stream=stream,
+            ),
+            tokens=self._estimate_tokens(messages),
+        )
+
+    async def _acreate_completion(self, messages: List[str], stream: bool):
+        """ chat.completions.create on the async client, rate-governed. """
+        return await rate_governor.call(
+            "openai",
+            self.model,
+            lambda: self._async_client.chat.completions.create(
+                model=self.model,
+                messages=self._format_messages(messages),
+                temperature=self.temperature,
+                stream=stream,
+            ),
+            tokens=self._estimate_tokens(messages),
+        )
+
     def invoke(self, messages: List[str]) -> OpsLoomMessageChunk:
         """
         Synchronously send messages to the model and return the entire response.
         """
-        formatted_messages = self._format_messages(messages)
-        response =  openai.chat.completions.create(
-            model=self.model,
-            messages=formatted_messages,
-            temperature=self.temperature,
-            stream=False
-        )
-        # The first choice is generally the primary response
-        message = response["choices"][0]["message"]
-        return OpsLoomMessageChunk(
-            content=message.get("content", ""),
-            type="text",
-            id=response.get("id", ""),
-            additional_kwargs={"finish_reason": response["choices"][0].get("finish_reason")},
-            response_metadata=response
-        )
+        return self._to_message_chunk(self._create_completion(messages, stream=False))
 
     def stream(self, messages: List[str]) -> Iterator[OpsLoomMessageChunk]:
         """
         Synchronously stream a response from the model, yielding chunks as they arrive.
         """
-        formatted_messages = self._format_messages(messages)
-        response =  openai.chat.completions.create(
-            model=self.model,
-            messages=formatted_messages,
-            temperature=self.temperature,
-            stream=True
-        )
+        response = self._create_completion(messages, stream=True)
         # The response is a generator that yields partial chunks.
         for chunk in response:
-            delta = chunk["choices"][0].get("delta", {})
-            content = delta.get("content", "")
+            choice = chunk.choices[0]
             yield OpsLoomMessageChunk(
-                content=content,
+                content=(choice.delta.content if choice.delta else None) or "",
                 type="text",
-                id=chunk.get("id", ""),
-                additional_kwargs={"finish_reason": chunk["choices"][0].get("finish_reason")},
-                response_metadata=chunk
+                id=chunk.id,
+                additional_kwargs={"finish_reason": choice.finish_reason},
             )
 
     async def ainvoke(self, messages: List[str]) -> OpsLoomMessageChunk:
         """
         Asynchronously send messages to the model and return the entire response.
         """
-        formatted_messages = self._format_messages(messages)
-        response = await openai.chat.completions.create(
-            model=self.model,
-            messages=formatted_messages,
-            temperature=self.temperature,
-            stream=False
-        )
-        message = response["choices"][0]["message"]
+        response = await self._acreate_completion(messages, stream=False)
+        return self._to_message_chunk(response)
+
+    @staticmethod
+    def _to_message_chunk(response) -> OpsLoomMessageChunk:
+        # The first choice is generally the primary response
+        choice = response.choices[0]
         return OpsLoomMessageChunk(
-            content=message.get("content", ""),
+            content=choice.message.content or "",
             type="text",
-            id=response.get("id", ""),
-            additional_kwargs={"finish_reason": response["choices"][0].get("finish_reason")},
-            response_metadata=response
+            id=response.id,
+            additional_kwargs={"finish_reason": choice.finish_reason},
+            response_metadata=response.model_dump(),
         )
 
     async def astream(self, messages: List[str]) -> AsyncIterator[OpsLoomMessageChunk]:
         """
         Asynchronously stream the model's response, yielding partial chunks.
         """
-        formatted_messages = self._format_messages(messages)
-        # Use 'create' with stream=True for async streaming
-        response = openai.chat.completions.create(
-            model=self.model,
-            messages=formatted_messages,
-            temperature=self.temperature,
-            stream=True
-        )
-        for chunk in response:
+        response = await self._acreate_completion(messages, stream=True)
+        async for chunk in response:
             # chunk is a ChatCompletionChunk object
             choice = chunk.choices[0]
             delta = choice.delta
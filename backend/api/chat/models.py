@@ -35,6 +35,8 @@ class FeedbackRequest(BaseModel):
 class ChatRequest(BaseModel):
     session_id: str
     message: Message
+    # Append a final {"type": "trace", ...} line with per-stage timings to the response stream.
+    include_trace: bool = False
 
 class Source(BaseModel):
     source: str
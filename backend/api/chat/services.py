@@ -22,6 +22,7 @@ from backend.api.assistant.repository import AssistantRepository
 from backend.api.kbase.repository import KbaseRepository
 from backend.util.logging import SetupLogging
 from backend.util.auth_utils import TokenData
+from backend.util.tracing import finish_trace, stage, start_trace, timed_stream
 
 logger = SetupLogging()
 
@@ -64,6 +65,7 @@ class ChatService:
         # 1) Validate the session
         logger.info(f"Processing chat request for session: {request.session_id}")
         session = await self.validate_session(request.session_id, current_user)
+        trace = start_trace("chat", session_id=str(session.id), assistant_id=str(session.assistant_id))
 
         # 2) Convert assistant_id to a standard UUID if needed
         if not isinstance(session.assistant_id, UUID):
@@ -79,7 +81,8 @@ class ChatService:
             current_user=current_user,
             retriever=self.retriever
         )
-        await ai_service.initialize(assistant_id_uuid)
+        with stage("initialize"):
+            await ai_service.initialize(assistant_id_uuid)
 
         # 4) Handle Title Generation (asynchronously)
         title_exists = await self.session_repository.check_session_title(session.id)
@@ -95,7 +98,7 @@ class ChatService:
 
         try:
             # Stream directly from the AI service (which yields OpsLoomMessageChunk dicts)
-            async for ops_chunk in ai_service.get_ai_response_stream(request):
+            async for ops_chunk in timed_stream(ai_service.get_ai_response_stream(request), prefix="response"):
                 logger.debug(f"Received ops_chunk from gateway: {ops_chunk}")
 
                 message_id_for_db = ops_chunk.get("message_id")
@@ -251,7 +254,8 @@ class ChatService:
                         content=final_ai_content_for_db, # Final accumulated TEXT content
                         blocks=final_ai_blocks_for_db # Final block structure based on accumulated text
                     )
-                    await self.store_message_pair(session, request, final_ai_message, message_id_for_db)
+                    with stage("store_messages"):
+                        await self.store_message_pair(session, request, final_ai_message, message_id_for_db)
                     logger.info("Successfully saved final message pair.")
                 else:
                      logger.warning("Final AI content for DB is empty. Skipping save.")
@@ -279,6 +283,17 @@ class ChatService:
             except Exception as e_final:
                  logger.error(f"Error during final message saving/title update: {e_final}", exc_info=True)
                  # Decide if this error needs to be propagated or just logged
+            trace_fields = finish_trace(trace)
+
+        # Optional trailing metadata: per-stage timings of this request.
+        if request.include_trace:
+            yield json.dumps({
+                "type": "trace",
+                "message_id": str(message_id_for_db or ""),
+                "assistant_id": str(assistant_id_uuid),
+                "blocks": [],
+                "trace": trace_fields,
+            }) + "\n"
 
 
     async def validate_session(self, session_id: str, current_user: TokenData) -> UserSession:
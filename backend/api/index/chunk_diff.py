@@ -0,0 +1,54 @@
+"""
+Diff of an uploaded source document against the chunks its kbase already holds.
+
+Chunk content is stored once per kbase (unique content hash), so the row holding a chunk of
+one source may have been stored for another: when source B contains a chunk that source A
+already stored, B's copy is not stored again. Which sources contain which content is recorded
+separately, in kbase_document_sources, and a row is only deleted once no source contains its
+content any more. Otherwise re-uploading A without that chunk would silently drop it from B.
+"""
+from typing import Iterable, List, Set
+
+
+class SourceDiff:
+    __slots__ = ("embed", "unchanged", "removed", "orphaned")
+
+    def __init__(self, embed: List[int], unchanged: int, removed: Set[str], orphaned: Set[str]):
+        # Positions of the chunks to embed and store: the first chunk of each content not yet in the kbase.
+        self.embed = embed
+        # Chunks whose content this source already contained.
+        self.unchanged = unchanged
+        # Content the source contained before and no longer does; its references are dropped.
+        self.removed = removed
+        # The part of removed that no other source contains; those rows are deleted.
+        self.orphaned = orphaned
+
+
+def diff_source(
+    hashes: List[str],
+    previous: Iterable[str],
+    stored: Iterable[str],
+    referenced_elsewhere: Iterable[str],
+) -> SourceDiff:
+    """
+    Args:
+        hashes: Content hash of each chunk of the new version of the source, in order.
+        previous: Hashes the source contained before (its kbase_document_sources entries).
+        stored: Hashes of the new version already stored in the kbase, under any source.
+        referenced_elsewhere: Hashes of previous that other sources of the kbase contain.
+    """
+    new_hashes = set(hashes)
+    previous = set(previous)
+    seen = set(stored)
+    embed = []
+    for position, digest in enumerate(hashes):
+        if digest not in seen:
+            seen.add(digest)
+            embed.append(position)
+    removed = previous - new_hashes
+    return SourceDiff(
+        embed=embed,
+        unchanged=sum(1 for digest in hashes if digest in previous),
+        removed=removed,
+        orphaned=removed - set(referenced_elsewhere),
+    )
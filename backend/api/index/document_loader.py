@@ -40,7 +40,8 @@ class DocumentLoader:
         file_size = self._check_s3_file_size(uri)
 
         docs = []
-        document_uuid = str(uuid.uuid4())
+        # Derived from the URI so that a re-upload of the same file keeps its document id.
+        document_uuid = str(uuid.uuid5(uuid.NAMESPACE_URL, uri))
 
         if file_size > 10_000_000:  # 10MB
             split_filenames = self._split_pdf(uri)
@@ -11,4 +11,11 @@ class IndexRequest(BaseModel):
 
 class IndexResponse(BaseModel):
     message: str
-    s3_uri: str
\ No newline at end of file
+    s3_uri: str
+    # Chunks stored; chunks kept from a previous upload of the same file; chunks of that
+    # upload deleted because they are gone; and chunks skipped because the same content
+    # was already in the kbase.
+    chunks_indexed: int = 0
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    chunks_deduplicated: int = 0
@@ -19,8 +19,7 @@ async def index_document(
     try:
         # Pass the injected session to IndexService.
         index_service = IndexService(kbase_name, session)
-        s3_uri = await index_service.process_and_index_document(file, kbase_name)
-        return IndexResponse(message="Document processed and indexed successfully", s3_uri=s3_uri)
+        return await index_service.process_and_index_document(file, kbase_name)
     except HTTPException as http_ex:
         raise http_ex
     except Exception as e:
@@ -1,16 +1,22 @@
-import os
 import uuid
+from typing import List, Tuple
 from fastapi import HTTPException, UploadFile
+from backend.api.index.models import IndexResponse
 from backend.api.index.upload_s3 import UploadS3
 from backend.api.index.document_loader import DocumentLoader
 from backend.api.index.text_processor import TextProcessor
+from backend.api.index.chunk_diff import diff_source
 from backend.api.kbase.services import KbaseService
 from backend.api.kbase.repository import KbaseRepository
-from backend.api.kbase.models import Document, Chunk
+from backend.api.kbase.models import Document, Chunk, KnowledgeBase
 from backend.api.kbase.pgvectorstore import PostgresVectorStore
-from backend.api.kbase.embedder_factory import get_embedder  # The embedder factory
+from backend.api.kbase.content_hash import content_hash
+from backend.api.kbase.flat_vector_store import flat_store_registry
+from backend.api.kbase.embedder_registry import embedder_registry
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.util.logging import SetupLogging
+from backend.util.rate_governor import background_priority
+from backend.util.tracing import stage
 
 logger = SetupLogging()
 
@@ -25,7 +31,7 @@ class IndexService:
         self.kbase_repository = KbaseRepository(session)
         self.kbase_service = KbaseService(repository=self.kbase_repository)
 
-    async def process_and_index_document(self, file: UploadFile, kbase_name: str) -> str:
+    async def process_and_index_document(self, file: UploadFile, kbase_name: str) -> IndexResponse:
         try:
             kbase = await self.kbase_service.get_kbase_by_name(kbase_name)
             if not kbase:
@@ -43,30 +49,86 @@ class IndexService:
 
             # Group split chunks into a single kbase Document.
             document = self._group_chunks_by_document_id(split_docs)
+            document.source_uri = s3_uri
 
-            # Create the embedder using the factory.
-            embedder = get_embedder("openai", api_key=os.getenv("OPENAI_API_KEY"))
+            # Diff against the chunks stored for a previous upload of the same file: only chunks
+            # with new content are embedded, and chunks that are gone are deleted unless another
+            # source of the kbase contains them too. Content already in the kbase (or repeated
+            # within the document) is not embedded again either.
+            total_chunks = len(document.chunks)
+            document, source_hashes, stale_ids, unchanged = await self._diff_against_stored(kbase, document)
 
-            # embedder = get_embedder("boto3", region_name=os.getenv("AWS_REGION"))
+            # The kbase's own embedder, so its queries are embedded the same way.
+            embedder = embedder_registry.get(kbase)
 
-            # Compute embeddings for each chunk.
-            for i, chunk in enumerate(document.chunks):
-                updated_chunk = await embedder.embed_text(chunk)
-                document.chunks[i].embeddings = updated_chunk.embeddings
+            # Compute embeddings for all chunks in batched, concurrent requests. Ingest is bulk
+            # work: under provider rate limits it waits behind interactive chat traffic.
+            with stage("embed_chunks"), background_priority():
+                await embedder.embed_texts(document.chunks)
 
-            # Persist the document’s chunks to the vector store.
-            vector_store = PostgresVectorStore(self.session, kbase_id=kbase.id)
-            await vector_store.add_document(document)
+            # Record the embedding dimension the first time a kbase is indexed,
+            # so that ANN indexes can be built over a typed column.
+            if not kbase.embedding_dim and document.chunks:
+                kbase.embedding_dim = len(document.chunks[0].embeddings)
+                await self.kbase_repository.set_embedding_dim(kbase.id, kbase.embedding_dim)
 
-            return s3_uri
+            # Persist the document’s chunks to the vector store. Chunks inserted concurrently
+            # by another upload since the check above are skipped here as well.
+            vector_store = PostgresVectorStore.from_kbase(self.session, kbase)
+            # The source's content references are replaced and stale chunks deleted in the same
+            # transaction as the insert; a chunk another source still contains is kept.
+            stored = await vector_store.add_document(document, replace_ids=stale_ids, source_hashes=source_hashes)
+            if stored or stale_ids:
+                # Postgres stays the source of truth; flat stores reload it on next use.
+                flat_store_registry.invalidate(kbase.id)
+
+            deduplicated = total_chunks - unchanged - stored
+            logger.info(
+                f"Indexed {s3_uri} into kbase {kbase_name}: {stored} new, {unchanged} unchanged, "
+                f"{len(stale_ids)} deleted, {deduplicated} deduplicated chunks"
+            )
+            return IndexResponse(
+                message="Document processed and indexed successfully",
+                s3_uri=s3_uri,
+                chunks_indexed=stored,
+                chunks_unchanged=unchanged,
+                chunks_deleted=len(stale_ids),
+                chunks_deduplicated=deduplicated,
+            )
 
         except HTTPException as http_ex:
             logger.error(f"HTTP error in process_and_index_document: {str(http_ex)}")
             raise
+        except ValueError as e:
+            logger.error(f"Invalid document for kbase {kbase_name}: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error(f"Error in process_and_index_document: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail="Internal server error")
 
+    async def _diff_against_stored(self, kbase: KnowledgeBase, document: Document) -> Tuple[Document, List[str], List[uuid.UUID], int]:
+        """
+        Compare a document with what the kbase holds for its source_uri (see chunk_diff.py).
+
+        Returns the chunks to embed and insert (first chunk of each content hash not yet in the
+        kbase), the content hashes of the whole document (the source's new references), the ids
+        of stored chunks whose content neither this nor any other source contains any more, and
+        the number of chunks whose content the source already contained.
+        """
+        vector_store = PostgresVectorStore.from_kbase(self.session, kbase)
+        hashes = [content_hash(chunk.content) for chunk in document.chunks]
+        previous = await vector_store.source_content_hashes(document.source_uri)
+        stored = await vector_store.existing_content_hashes(hashes)
+        referenced_elsewhere = await vector_store.hashes_in_other_sources(previous - set(hashes), document.source_uri)
+        diff = diff_source(hashes, previous, stored, referenced_elsewhere)
+        stale_ids = await vector_store.chunk_ids_by_hash(diff.orphaned)
+        return (
+            Document(chunks=[document.chunks[i] for i in diff.embed], source_uri=document.source_uri),
+            hashes,
+            stale_ids,
+            diff.unchanged,
+        )
+
     def _group_chunks_by_document_id(self, split_docs: list) -> Document:
         """
         Since we are processing a single uploaded document, group all split chunks into one Document.
@@ -76,10 +138,14 @@ class IndexService:
         for doc in split_docs:
             # Generate a new UUID for each chunk.
             chunk_uuid = uuid.uuid4()
+            metadata = {key: value for key, value in doc.metadata.items() if key != "embedding"}
             chunk = Chunk(
                 id=chunk_uuid,
                 content=doc.page_content,
-                embeddings=doc.metadata.get("embedding")  # Will be populated later.
+                embeddings=doc.metadata.get("embedding"),  # Will be populated later.
+                # title, link, kbase, document id and chunk_id from DocumentLoader / TextProcessor;
+                # persisted as JSONB so searches can be filtered by them.
+                metadata=metadata,
             )
             chunks.append(chunk)
         # Return a single Document containing all chunks.
@@ -9,7 +9,17 @@ class BaseEmbedderGateway(ABC):
         """ embed text. adds embeddings to Chunk object """
         pass
 
+    @abstractmethod
+    async def embed_texts(self, chunks: list[Chunk]) -> list[Chunk]:
+        """ embed many chunks in batched, concurrent provider calls. adds embeddings to each Chunk; order matches the input """
+        pass
+
     @abstractmethod
     async def embed_query(self, query: str) -> list[float]:
         """ embed query """
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """ embed many queries, in as few provider calls as possible. order matches the input """
+        pass
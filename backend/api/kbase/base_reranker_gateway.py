@@ -0,0 +1,17 @@
+from abc import ABC, abstractmethod
+from typing import List
+from backend.api.kbase.models import Chunk
+
+class BaseRerankerGateway(ABC):
+    __slots__ = ()
+    """ abstract base class with methods that all reranker classes must implement """
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """ provider and model, used in rerank cache keys """
+        pass
+
+    @abstractmethod
+    async def rerank(self, query: str, chunks: List[Chunk], top_n: int) -> List[Chunk]:
+        """ the top_n chunks most relevant to the query, best first, with rerank_score set """
+        pass
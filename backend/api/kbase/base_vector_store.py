@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from backend.api.kbase.models import Document, RetrievedChunks
+
+class BaseVectorStore(ABC):
+    __slots__ = ()
+    """ abstract base class with methods that all vector store backends must implement """
+    @abstractmethod
+    async def add_document(self, document: Document) -> int:
+        """ store a document's chunks and their embeddings, returning how many chunks were stored """
+        pass
+
+    @abstractmethod
+    async def similarity_search_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> RetrievedChunks:
+        """ top k chunks by similarity to the query embedding """
+        pass
+
+    @abstractmethod
+    async def mmr_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        lambda_: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> RetrievedChunks:
+        """ k chunks selected by max marginal relevance from a larger candidate set """
+        pass
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> RetrievedChunks:
+        """ lexical + vector search. backends without a text index fall back to vector similarity """
+        return await self.similarity_search_by_vector(query_embedding, k=k, filter=filter)
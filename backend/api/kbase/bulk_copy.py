@@ -0,0 +1,133 @@
+"""
+Bulk loading into kbase_documents with Postgres binary COPY (asyncpg copy_records_to_table).
+
+Binary COPY needs asyncpg codecs for pgvector's types. Registering them changes how vectors
+are encoded on that connection, while the SQLAlchemy Vector type sends vectors as text, so
+COPY runs on its own small engine whose connections have the codecs registered on connect
+and are never used for ORM queries.
+"""
+import json
+import uuid
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from backend.util.config import get_config_value
+from backend.util.database import DATABASE_URL
+
+KBASE_DOCUMENT_COPY_COLUMNS = (
+    "id", "kbase_id", "source_uri", "content", "content_hash", "metadata",
+    "embedding", "embedding_half", "embedding_bq",
+)
+STAGING_TABLE = "kbase_documents_staging"
+
+DEFAULT_COPY_BATCH_SIZE = int(get_config_value("KBASE_COPY_BATCH_SIZE") or 1000)
+
+_copy_engine: Optional[AsyncEngine] = None
+
+
+def get_copy_engine() -> AsyncEngine:
+    """ The engine used for COPY, created on first use. """
+    global _copy_engine
+    if _copy_engine is None:
+        _copy_engine = create_async_engine(DATABASE_URL, pool_size=2, max_overflow=2)
+
+        @event.listens_for(_copy_engine.sync_engine, "connect")
+        def register_pgvector_codecs(dbapi_connection, connection_record):
+            from pgvector.asyncpg import register_vector
+            dbapi_connection.run_async(register_vector)
+
+    return _copy_engine
+
+
+async def copy_kbase_documents(
+    rows: Iterable[Sequence],
+    batch_size: int = DEFAULT_COPY_BATCH_SIZE,
+    columns: Sequence[str] = KBASE_DOCUMENT_COPY_COLUMNS,
+    skip_duplicates: bool = False,
+    delete_ids: Optional[Sequence[uuid.UUID]] = None,
+    source: Optional[Tuple[str, Sequence[str]]] = None,
+    kbase_id: Optional[uuid.UUID] = None,
+) -> int:
+    """
+    COPY rows into kbase_documents in batches of batch_size, all in one transaction:
+    either every row is loaded or none is. Returns the number of rows loaded.
+
+    Rows are tuples in `columns` order; metadata must already be a JSON string, vectors
+    lists or NumPy arrays, and embedding_bq an asyncpg.BitString.
+
+    With skip_duplicates, rows are copied into a temporary staging table and moved over with
+    INSERT ... ON CONFLICT (kbase_id, content_hash) DO NOTHING, since COPY itself cannot skip
+    conflicting rows. Rows whose content already exists in the kbase (including ones inserted
+    concurrently) are dropped and not counted.
+
+    kbase_id is the kbase the rows belong to; its content_version is bumped in the same
+    transaction, so processes holding an in-memory copy of the kbase reload it. With
+    source = (source_uri, content hashes), the source's kbase_document_sources entries are
+    replaced with the given hashes (requires kbase_id).
+
+    Rows with delete_ids are then deleted before the load, so replacing part of a document is
+    atomic. A row is kept if some source still contains its content (e.g. one that was
+    deduplicated against it).
+    """
+    column_list = list(columns)
+    target = STAGING_TABLE if skip_duplicates else "kbase_documents"
+    loaded = 0
+    async with get_copy_engine().connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver_conn = raw.driver_connection
+        async with driver_conn.transaction():
+            if kbase_id:
+                await driver_conn.execute("UPDATE kbase SET content_version = content_version + 1 WHERE id = $1", kbase_id)
+            if source:
+                if not kbase_id:
+                    raise ValueError("source requires kbase_id")
+                source_uri, hashes = source
+                hashes = list(set(hashes))
+                await driver_conn.execute(
+                    "DELETE FROM kbase_document_sources "
+                    "WHERE kbase_id = $1 AND source_uri = $2 AND NOT content_hash = ANY($3::text[])",
+                    kbase_id, source_uri, hashes,
+                )
+                await driver_conn.execute(
+                    "INSERT INTO kbase_document_sources (kbase_id, source_uri, content_hash) "
+                    "SELECT $1, $2, unnest($3::text[]) ON CONFLICT DO NOTHING",
+                    kbase_id, source_uri, hashes,
+                )
+            if delete_ids:
+                await driver_conn.execute(
+                    "DELETE FROM kbase_documents d WHERE d.id = ANY($1::uuid[]) AND NOT EXISTS ("
+                    "SELECT 1 FROM kbase_document_sources s "
+                    "WHERE s.kbase_id = d.kbase_id AND s.content_hash = d.content_hash)",
+                    list(delete_ids),
+                )
+            if skip_duplicates:
+                # LIKE copies the column types only: no constraints, no generated columns.
+                await driver_conn.execute(
+                    f"CREATE TEMP TABLE {STAGING_TABLE} (LIKE kbase_documents) ON COMMIT DROP"
+                )
+            batch: List[Sequence] = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    await driver_conn.copy_records_to_table(target, records=batch, columns=column_list)
+                    loaded += len(batch)
+                    batch = []
+            if batch:
+                await driver_conn.copy_records_to_table(target, records=batch, columns=column_list)
+                loaded += len(batch)
+            if skip_duplicates:
+                names = ", ".join(column_list)
+                status = await driver_conn.execute(
+                    f"INSERT INTO kbase_documents ({names}) SELECT {names} FROM {STAGING_TABLE} "
+                    "ON CONFLICT (kbase_id, content_hash) DO NOTHING"
+                )
+                # Command status is "INSERT 0 <rows>".
+                loaded = int(status.split()[-1])
+    return loaded
+
+
+def metadata_json(metadata: Optional[dict]) -> Optional[str]:
+    """ asyncpg's jsonb codec takes JSON text. """
+    return json.dumps(metadata, default=str) if metadata is not None else None
@@ -0,0 +1,162 @@
+"""
+Maintenance commands for knowledge bases. Run from the repository root, e.g.
+
+    uv run python -m backend.api.kbase.cli backfill-quantized visa_kbase
+    uv run python -m backend.api.kbase.cli backfill-quantized visa_kbase --quantization binary
+    uv run python -m backend.api.kbase.cli export-snapshot visa_kbase ./snapshots/visa_kbase
+    uv run python -m backend.api.kbase.cli import-snapshot ./snapshots/visa_kbase --name visa_kbase_copy
+    uv run python -m backend.api.kbase.cli export-flat-snapshot visa_kbase
+    uv run python -m backend.api.kbase.cli purge-unsourced-chunks visa_kbase --dry-run
+    uv run python -m backend.api.kbase.cli vacuum-embedding-cache --unused-days 90
+
+Commands use POSTGRES_CONNECTION_STRING like the API server.
+"""
+import argparse
+import asyncio
+from typing import Optional
+from uuid import UUID
+
+import dotenv
+
+dotenv.load_dotenv()
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.api.kbase.flat_vector_store import flat_store_registry
+from backend.api.kbase.models import KnowledgeBase, QuantizationRequest
+from backend.api.kbase.persistent_embedding_cache import embedding_cache_store
+from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.repository import KbaseRepository
+from backend.api.kbase.snapshot import export_kbase_snapshot, import_kbase_snapshot
+from backend.util.database import async_session_maker
+
+
+async def _resolve_kbase(repository: KbaseRepository, name_or_id: str) -> Optional[KnowledgeBase]:
+    try:
+        return await repository.get_kbase_by_id(UUID(name_or_id))
+    except ValueError:
+        return await repository.get_kbase_by_name(name_or_id)
+
+
+async def backfill_quantized(session: AsyncSession, args: argparse.Namespace) -> None:
+    repository = KbaseRepository(session)
+    kbase = await _resolve_kbase(repository, args.kbase)
+    if not kbase:
+        raise SystemExit(f"Knowledge base not found: {args.kbase}")
+    if args.quantization:
+        kbase = await repository.set_quantization(kbase.id, QuantizationRequest(quantization=args.quantization))
+    if not kbase.quantization:
+        raise SystemExit(f"Knowledge base {kbase.name} has no quantization configured; pass --quantization")
+
+    vector_store = PostgresVectorStore.from_kbase(session, kbase)
+    updated = await vector_store.backfill_quantized(batch_size=args.batch_size)
+    print(f"Backfilled {updated} {kbase.quantization} embeddings for {kbase.name}")
+    if kbase.index_type and not args.skip_reindex:
+        await repository.rebuild_vector_index(kbase.id)
+        print(f"Rebuilt {kbase.index_type} index for {kbase.name}")
+
+
+async def export_snapshot(session: AsyncSession, args: argparse.Namespace) -> None:
+    kbase = await _resolve_kbase(KbaseRepository(session), args.kbase)
+    if not kbase:
+        raise SystemExit(f"Knowledge base not found: {args.kbase}")
+    manifest = await export_kbase_snapshot(kbase, args.directory, batch_size=args.batch_size)
+    print(f"Exported {manifest['count']} chunks of {kbase.name} to {args.directory}")
+
+
+async def export_flat_snapshot(session: AsyncSession, args: argparse.Namespace) -> None:
+    kbase = await _resolve_kbase(KbaseRepository(session), args.kbase)
+    if not kbase:
+        raise SystemExit(f"Knowledge base not found: {args.kbase}")
+    directory = flat_store_registry.snapshot_path(kbase.id)
+    if not directory:
+        raise SystemExit("FLAT_VECTOR_STORE_DIR is not configured")
+    manifest = await export_kbase_snapshot(kbase, directory, batch_size=args.batch_size)
+    print(f"Wrote flat store snapshot of {kbase.name} (content_version {manifest['content_version']}) to {directory}")
+
+
+async def import_snapshot(session: AsyncSession, args: argparse.Namespace) -> None:
+    kbase = await import_kbase_snapshot(
+        KbaseRepository(session),
+        args.directory,
+        name=args.name,
+        account_short_code=args.account,
+        keep_ids=args.keep_ids,
+        batch_size=args.batch_size,
+    )
+    print(f"Imported {args.directory} as {kbase.name} ({kbase.id})")
+
+
+async def purge_unsourced_chunks(session: AsyncSession, args: argparse.Namespace) -> None:
+    kbase = await _resolve_kbase(KbaseRepository(session), args.kbase)
+    if not kbase:
+        raise SystemExit(f"Knowledge base not found: {args.kbase}")
+    count = await PostgresVectorStore.from_kbase(session, kbase).delete_unsourced_chunks(dry_run=args.dry_run)
+    print(f"{'Would delete' if args.dry_run else 'Deleted'} {count} chunks of {kbase.name} that belong to no source document")
+
+
+async def vacuum_embedding_cache(session: AsyncSession, args: argparse.Namespace) -> None:
+    deleted = await embedding_cache_store.vacuum(args.unused_days, model=args.model, batch_size=args.batch_size)
+    print(f"Deleted {deleted} embedding cache entries unused for {args.unused_days} days")
+
+
+COMMANDS = {
+    "backfill-quantized": backfill_quantized,
+    "export-snapshot": export_snapshot,
+    "export-flat-snapshot": export_flat_snapshot,
+    "import-snapshot": import_snapshot,
+    "purge-unsourced-chunks": purge_unsourced_chunks,
+    "vacuum-embedding-cache": vacuum_embedding_cache,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill-quantized", help="populate quantized embeddings for existing chunks")
+    backfill.add_argument("kbase", help="knowledge base name or UUID")
+    backfill.add_argument("--quantization", choices=["halfvec", "binary"], help="enable this quantization first")
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    backfill.add_argument("--skip-reindex", action="store_true", help="do not rebuild the kbase's ANN index")
+
+    export = subparsers.add_parser("export-snapshot", help="write a kbase's chunks and embeddings to a snapshot directory")
+    export.add_argument("kbase", help="knowledge base name or UUID")
+    export.add_argument("directory", help="snapshot directory to create")
+    export.add_argument("--batch-size", type=int, default=1000)
+
+    flat = subparsers.add_parser(
+        "export-flat-snapshot",
+        help="write a kbase's snapshot to FLAT_VECTOR_STORE_DIR, where API workers memory-map it for the flat backend",
+    )
+    flat.add_argument("kbase", help="knowledge base name or UUID")
+    flat.add_argument("--batch-size", type=int, default=1000)
+
+    load = subparsers.add_parser("import-snapshot", help="create a kbase from a snapshot directory")
+    load.add_argument("directory", help="snapshot directory written by export-snapshot")
+    load.add_argument("--name", help="name of the new kbase (default: the exported name)")
+    load.add_argument("--account", help="account short code of the new kbase")
+    load.add_argument("--keep-ids", action="store_true", help="keep chunk ids (only when importing into another database)")
+    load.add_argument("--batch-size", type=int, default=1000)
+
+    purge = subparsers.add_parser(
+        "purge-unsourced-chunks",
+        help="delete chunks stored before source tracking that no source document contains; run after re-uploading the kbase's documents",
+    )
+    purge.add_argument("kbase", help="knowledge base name or UUID")
+    purge.add_argument("--dry-run", action="store_true", help="only count the chunks that would be deleted")
+
+    vacuum = subparsers.add_parser("vacuum-embedding-cache", help="delete embedding cache entries that have not been used for a while")
+    vacuum.add_argument("--unused-days", type=int, default=90, help="delete entries not used for this many days")
+    vacuum.add_argument("--model", help="only vacuum this embedding model")
+    vacuum.add_argument("--batch-size", type=int, default=10_000)
+
+    return parser
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with async_session_maker() as session:
+        await COMMANDS[args.command](session, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(build_parser().parse_args()))
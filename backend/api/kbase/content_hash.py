@@ -0,0 +1,26 @@
+"""
+Content hashes for chunk deduplication.
+
+Chunks are compared after Unicode NFKC normalization and whitespace collapsing, so the same
+text extracted with different line breaks or spacing (re-uploads, shared boilerplate pages)
+hashes the same. Case and punctuation are kept: they can change what a chunk means.
+
+Hashes are only ever computed here, in Python (migration 018 backfills existing rows with
+content_hash too): Postgres' normalize() and regex whitespace classes do not match Python's
+for every character, so a SQL version would hash some texts differently.
+"""
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_content(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def content_hash(text: str) -> str:
+    """ Hex SHA-256 of the normalized content. """
+    return hashlib.sha256(normalize_content(text).encode("utf-8")).hexdigest()
+
@@ -0,0 +1,144 @@
+"""
+Pack retrieved chunks into a RAG prompt context under a token budget.
+
+Neighbouring chunks of a document overlap (the Textract loader splits with 200 characters of
+overlap, TextProcessor with 50), so joining them verbatim repeats text. Chunks are taken in
+relevance order; a chunk from the same source that overlaps a span already in the context is
+merged into that span (only its new text costs tokens), one that is contained in a span is
+dropped, and chunks that no longer fit the budget are skipped in favour of smaller ones.
+Tokens are counted with tiktoken for the assistant's model.
+"""
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import tiktoken
+
+from backend.api.kbase.models import Chunk
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+DEFAULT_ENCODING = "cl100k_base"
+CONTEXT_SEPARATOR = "\n\n"
+# Shorter common prefixes/suffixes are coincidence (a repeated word), not splitter overlap.
+MIN_OVERLAP_CHARS = 20
+
+
+@lru_cache(maxsize=16)
+def get_token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """
+    Token counter for a model: its tiktoken encoding, cl100k_base for models tiktoken does not
+    know (e.g. Bedrock models), or about 4 characters per token if no encoding can be loaded.
+    """
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"Could not load a tiktoken encoding for {model}, estimating tokens from length: {str(e)}")
+        return lambda text: (len(text) + 3) // 4
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def merge_overlapping(first: str, second: str, min_overlap: int = MIN_OVERLAP_CHARS) -> Optional[str]:
+    """
+    first + second without the text they share, if a suffix of first is a prefix of second
+    (at least min_overlap characters long); None otherwise.
+    """
+    for length in range(min(len(first), len(second)), min_overlap - 1, -1):
+        if first.endswith(second[:length]):
+            return first + second[length:]
+    return None
+
+
+def _source_key(chunk: Chunk):
+    """ Chunks are only merged with chunks of the same document. """
+    metadata = chunk.metadata or {}
+    document = metadata.get("id") or metadata.get("link")
+    if not document:
+        return None
+    return (chunk.kbase_id, document)
+
+
+def _combine(span: str, text: str) -> Optional[str]:
+    """ span extended by text, or span itself if text is already in it; None if they do not overlap. """
+    if text in span:
+        return span
+    if span in text:
+        return text
+    return merge_overlapping(span, text) or merge_overlapping(text, span)
+
+
+def pack_context(
+    chunks: List[Chunk],
+    max_tokens: int,
+    model: Optional[str] = None,
+    count_tokens: Optional[Callable[[str], int]] = None,
+    separator: str = CONTEXT_SEPARATOR,
+) -> str:
+    """
+    Build the context string from chunks given best first.
+
+    Spans keep the order in which their first chunk was selected, so the most relevant text
+    comes first. The result is at most max_tokens tokens (separators included).
+    """
+    count_tokens = count_tokens or get_token_counter(model)
+    separator_tokens = count_tokens(separator)
+    # Each span: [source key, text, tokens].
+    spans: List[list] = []
+    used = 0
+
+    for chunk in chunks:
+        text = chunk.content.strip()
+        if not text:
+            continue
+        key = _source_key(chunk)
+
+        merged: Optional[Tuple[int, str]] = None
+        if key is not None:
+            for i, span in enumerate(spans):
+                if span[0] == key:
+                    combined = _combine(span[1], text)
+                    if combined is not None:
+                        merged = (i, combined)
+                        break
+
+        if merged is not None:
+            i, combined = merged
+            if combined == spans[i][1]:
+                continue
+            tokens = count_tokens(combined)
+            if used - spans[i][2] + tokens > max_tokens:
+                continue
+            spans[i][1], spans[i][2] = combined, tokens
+            _absorb_neighbours(spans, i, count_tokens)
+            used = sum(span[2] for span in spans) + separator_tokens * (len(spans) - 1)
+            continue
+
+        tokens = count_tokens(text)
+        extra = tokens + (separator_tokens if spans else 0)
+        if used + extra > max_tokens:
+            continue
+        spans.append([key, text, tokens])
+        used += extra
+
+    return separator.join(span[1] for span in spans)
+
+
+def _absorb_neighbours(spans: List[list], i: int, count_tokens: Callable[[str], int]) -> None:
+    """
+    After span i grew, merge any other span of the same source that it now overlaps (a chunk
+    bridged them). The merged span takes the earlier position.
+    """
+    j = 0
+    while j < len(spans):
+        if j != i and spans[j][0] == spans[i][0]:
+            first, second = min(i, j), max(i, j)
+            combined = _combine(spans[first][1], spans[second][1])
+            if combined is not None:
+                spans[first][1], spans[first][2] = combined, count_tokens(combined)
+                del spans[second]
+                i, j = first, 0
+                continue
+        j += 1
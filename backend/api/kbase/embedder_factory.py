@@ -1,14 +1,23 @@
+from typing import Optional
 from backend.api.kbase.base_embedder_gateway import BaseEmbedderGateway
 from backend.api.kbase.embedders.boto3_embedder import Boto3EmbedderGateway
 from backend.api.kbase.embedders.openai_embedder import OpenAIEmbedderGateway
+from backend.api.kbase.models import DEFAULT_EMBEDDING_MODELS, NATIVE_EMBEDDING_DIMS
+from backend.api.kbase.persistent_embedding_cache import CachedEmbedderGateway
+from backend.util.config import get_config_value
 
-def get_embedder(provider: str, **kwargs) -> BaseEmbedderGateway:
+# Serve chunk embeddings from the shared embedding_cache table (persistent_embedding_cache.py).
+EMBEDDING_CACHE_ENABLED = (get_config_value("EMBEDDING_CACHE") or "true") == "true"
+
+def get_embedder(provider: str, cache: Optional[bool] = None, **kwargs) -> BaseEmbedderGateway:
     """
     Factory function to create an embedder gateway instance.
     
     Args:
         provider (str): Either 'boto3' or 'openai'.
-        **kwargs: Additional configuration parameters.
+        cache (bool): Wrap the gateway in the persistent embedding cache; EMBEDDING_CACHE by default.
+        **kwargs: Additional configuration parameters (region_name / model_id for boto3,
+            api_key / model for openai, and dimensions for either).
 
     Returns:
         An instance of BaseEmbedderGateway.
@@ -19,15 +28,30 @@ def get_embedder(provider: str, **kwargs) -> BaseEmbedderGateway:
     provider = provider.lower()
     if provider == "boto3":
         region_name = kwargs.get("region_name")
-        model_id = kwargs.get("model_id", "amazon.titan-embed-text-v2:0")
+        model = kwargs.get("model_id") or DEFAULT_EMBEDDING_MODELS["boto3"]
         if not region_name:
             raise ValueError("`region_name` is required for the boto3 embedder.")
-        return Boto3EmbedderGateway(region_name=region_name, model_id=model_id)
+        embedder = Boto3EmbedderGateway(region_name=region_name, model_id=model, dimensions=_requested_dimensions(model, kwargs))
     elif provider == "openai":
         api_key = kwargs.get("api_key")
-        model = kwargs.get("model", "text-embedding-3-large")
+        model = kwargs.get("model") or DEFAULT_EMBEDDING_MODELS["openai"]
         if not api_key:
             raise ValueError("`api_key` is required for the OpenAI embedder.")
-        return OpenAIEmbedderGateway(api_key=api_key, model=model)
+        embedder = OpenAIEmbedderGateway(api_key=api_key, model=model, dimensions=_requested_dimensions(model, kwargs))
     else:
         raise ValueError(f"Unsupported embedder provider: {provider}")
+
+    if cache is None:
+        cache = EMBEDDING_CACHE_ENABLED
+    if cache:
+        # Cache entries are keyed by the dimensions actually requested (0 for the native size).
+        return CachedEmbedderGateway(embedder, model=model, dimensions=embedder.dimensions)
+    return embedder
+
+
+def _requested_dimensions(model: str, kwargs: dict) -> Optional[int]:
+    """ The dimensions to request; None for the model's native size, so it is cached under one key (0). """
+    dimensions = kwargs.get("dimensions")
+    if dimensions == NATIVE_EMBEDDING_DIMS.get(model):
+        return None
+    return dimensions
@@ -0,0 +1,91 @@
+"""
+Embedder gateways for knowledge bases, resolved from the kbase's own settings.
+
+A kbase's chunks and its queries must be embedded by the same model at the same dimension,
+or searches compare vectors from different spaces. Ingest (IndexService) and retrieval
+(RagAssistant, KbaseService searches) therefore never pick an embedder themselves. They ask
+`embedder_registry` for the one matching the kbase's embedding_provider, embedding_model and
+embedding_dim.
+
+Gateways are created once per (provider, model, dimensions) and reused for every request. The
+connection pools they use are shared through embedder_clients. Credentials come from
+OPENAI_API_KEY (openai) and AWS_REGION (boto3).
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.api.kbase.base_embedder_gateway import BaseEmbedderGateway
+from backend.api.kbase.embedder_factory import get_embedder
+from backend.api.kbase.embedding_cache import query_embedding_cache
+from backend.api.kbase.models import DEFAULT_EMBEDDING_MODELS, NATIVE_EMBEDDING_DIMS, KnowledgeBase
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+EmbedderKey = Tuple[str, str, Optional[int]]
+
+
+def embedder_key(kbase: KnowledgeBase) -> EmbedderKey:
+    """
+    (provider, model, dimensions) the kbase is embedded with. A kbase without an embedding_dim
+    yet gets the model's native dimension, which its first ingest will record, so the key (and
+    the gateway and cache entries behind it) stays the same. dimensions is None only for models
+    of unknown size.
+    """
+    provider = kbase.embedding_provider
+    model = kbase.embedding_model or DEFAULT_EMBEDDING_MODELS[provider]
+    return provider, model, kbase.embedding_dim or NATIVE_EMBEDDING_DIMS.get(model)
+
+
+class EmbedderRegistry:
+    def __init__(self):
+        self._embedders: Dict[EmbedderKey, BaseEmbedderGateway] = {}
+
+    def get(self, kbase: KnowledgeBase) -> BaseEmbedderGateway:
+        """ The long-lived gateway for the kbase's embedder. """
+        return self._get(embedder_key(kbase))
+
+    def shared_key(self, kbases: Iterable[KnowledgeBase]) -> EmbedderKey:
+        """
+        The embedder key shared by several kbases searched with one query embedding.
+        Raises ValueError if they are embedded differently.
+        """
+        keys: List[EmbedderKey] = list(dict.fromkeys(embedder_key(kbase) for kbase in kbases))
+        # A kbase of a model with unknown native size and no recorded dimension matches any.
+        known = list(dict.fromkeys(key for key in keys if key[2] is not None)) or keys
+        if len({key[:2] for key in keys}) > 1 or len(known) > 1:
+            raise ValueError("The knowledge bases use different embedding models and cannot be searched together")
+        return known[0]
+
+    async def embed_query(self, kbase: KnowledgeBase, query: str) -> List[float]:
+        """ Embed a search query for the kbase, served from the query embedding cache when possible. """
+        return await self.embed_query_for_key(embedder_key(kbase), query)
+
+    async def embed_query_for_key(self, key: EmbedderKey, query: str) -> List[float]:
+        provider, model, dimensions = key
+        return await query_embedding_cache.get_or_embed(
+            provider=provider,
+            model=model,
+            text=query,
+            embed_fn=self._get(key).embed_query,
+            dimensions=dimensions,
+        )
+
+    def stats(self) -> dict:
+        return {"cached": [f"{provider}/{model}/{dimensions or 'native'}" for provider, model, dimensions in self._embedders]}
+
+    def _get(self, key: EmbedderKey) -> BaseEmbedderGateway:
+        embedder = self._embedders.get(key)
+        if embedder is None:
+            provider, model, dimensions = key
+            if provider == "boto3":
+                embedder = get_embedder(provider, region_name=os.getenv("AWS_REGION"), model_id=model, dimensions=dimensions)
+            else:
+                embedder = get_embedder(provider, api_key=os.getenv("OPENAI_API_KEY"), model=model, dimensions=dimensions)
+            self._embedders[key] = embedder
+            logger.info(f"Created {provider} embedder for {model} ({dimensions or 'native'} dimensions)")
+        return embedder
+
+
+# Singleton instance
+embedder_registry = EmbedderRegistry()
@@ -1,31 +1,69 @@
 import json
-import boto3
-import asyncio
+from typing import Optional
 from backend.api.kbase.models import Chunk
 from backend.api.kbase.base_embedder_gateway import BaseEmbedderGateway
+from backend.api.kbase.embedders.clients import embedder_clients
+from backend.api.kbase.context_packing import get_token_counter
+from backend.api.kbase.embedding_batches import embed_in_batches
+from backend.util.rate_governor import rate_governor
+
+# Titan v2 can return 256, 512 or 1024 dimensions; earlier models have a fixed size.
+DIMENSIONS_MODEL_PREFIX = "amazon.titan-embed-text-v2"
 
 class Boto3EmbedderGateway(BaseEmbedderGateway):
-    def __init__(self, region_name: str, model_id: str = "amazon.titan-embed-text-v2:0"):
+    """
+    Embeds with Bedrock (Titan). boto3 is blocking, so each call runs on the dedicated Bedrock
+    executor of embedder_clients; its worker count bounds the requests in flight. The
+    bedrock-runtime client is shared per region. Every request goes through rate_governor.
+    dimensions, if given, is requested from models that support it.
+    """
+    def __init__(self, region_name: str, model_id: str = "amazon.titan-embed-text-v2:0", dimensions: Optional[int] = None):
         self.region_name = region_name
         self.model_id = model_id
-        # Initialize the boto3 client for Bedrock Runtime.
-        self.client = boto3.client("bedrock-runtime", region_name=self.region_name)
+        self.dimensions = dimensions if model_id.startswith(DIMENSIONS_MODEL_PREFIX) else None
 
     async def embed_text(self, chunk: Chunk) -> Chunk:
-        embedding = await asyncio.to_thread(self._get_embedding, chunk.content)
-        chunk.embeddings = embedding
+        chunk.embeddings = await self._embed(chunk.content)
         return chunk
 
+    async def embed_texts(self, chunks: list[Chunk]) -> list[Chunk]:
+        embeddings = await self.embed_queries([chunk.content for chunk in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embeddings = embedding
+        return chunks
+
     async def embed_query(self, query: str) -> list[float]:
-        embedding = await asyncio.to_thread(self._get_embedding, query)
-        return embedding
+        return await self._embed(query)
+
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        # Titan has no batch call: one text per request, as many in flight as the executor has workers.
+        return await embed_in_batches(
+            queries,
+            self._embed_batch,
+            max_items=1,
+            max_concurrency=embedder_clients.bedrock_workers,
+        )
+
+    async def _embed_batch(self, texts: list[str], tokens: Optional[int] = None) -> list[list[float]]:
+        return [await self._embed(text) for text in texts]
+
+    async def _embed(self, text: str) -> list[float]:
+        return await rate_governor.call(
+            "bedrock",
+            self.model_id,
+            lambda: embedder_clients.run_bedrock(self._get_embedding, text),
+            tokens=get_token_counter(None)(text),
+        )
 
     def _get_embedding(self, text: str) -> list[float]:
         # Note: Use the expected key "inputText" per the model's JSON schema.
-        response = self.client.invoke_model(
+        body = {"inputText": text}
+        if self.dimensions:
+            body["dimensions"] = self.dimensions
+        response = embedder_clients.bedrock(self.region_name).invoke_model(
             modelId=self.model_id,
             contentType="application/json",
-            body=json.dumps({"inputText": text}).encode("utf-8")
+            body=json.dumps(body).encode("utf-8")
         )
         result = json.loads(response["body"].read())
         return result.get("embedding", [])
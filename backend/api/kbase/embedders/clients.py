@@ -0,0 +1,131 @@
+"""
+Process-wide provider clients shared by the embedder gateways.
+
+get_embedder() is called per request, so gateways must not own their clients: each new client
+would open its own connection pool (and TLS handshakes) and leave it to the garbage collector.
+Instead gateways ask this pool for a client on every call:
+
+- OpenAI: one AsyncOpenAI per API key on a keep-alive httpx pool with explicit timeouts, plus a
+  semaphore bounding the requests in flight for that key across all gateways.
+- Bedrock: boto3 has no asyncio API, so calls run on a dedicated, sized thread pool rather than
+  the default executor that asyncio.to_thread shares with the rest of the app. One client per
+  region, with as many pooled connections as there are workers.
+
+SDK-level retries are off: every call goes through rate_governor, which retries rate-limit
+errors itself and pauses the model for all callers on the first one. SDK retries would hide
+429s from it behind their own backoff and multiply the attempts per call.
+
+Call aclose() on shutdown to close the pooled connections.
+"""
+import asyncio
+import functools
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+import boto3
+import httpx
+from botocore.config import Config as BotoConfig
+from openai import AsyncOpenAI
+
+from backend.util.config import get_config_value
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+T = TypeVar("T")
+
+
+def key_fingerprint(api_key: str) -> str:
+    """ Stable identifier for an API key, used to key shared clients without keeping the key itself as a dict key. """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class EmbedderClientPool:
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_concurrency: int = 16,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        bedrock_workers: int = 8,
+    ):
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.bedrock_workers = bedrock_workers
+        # Keyed by a fingerprint of the API key, so keys are not kept as dict keys.
+        self._openai: Dict[str, Tuple[AsyncOpenAI, asyncio.Semaphore]] = {}
+        self._bedrock: Dict[str, Any] = {}
+        self._bedrock_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def openai(self, api_key: str) -> Tuple[AsyncOpenAI, asyncio.Semaphore]:
+        """ The shared client for an API key and the semaphore bounding its requests in flight. """
+        fingerprint = key_fingerprint(api_key)
+        entry = self._openai.get(fingerprint)
+        if entry is None:
+            timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            http_client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0)
+            entry = self._openai[fingerprint] = (client, asyncio.Semaphore(self.max_concurrency))
+            logger.info(f"Created pooled OpenAI embeddings client ({len(self._openai)} in pool)")
+        return entry
+
+    def bedrock(self, region_name: str):
+        """ The shared bedrock-runtime client for a region (boto3 clients are thread-safe once created). """
+        client = self._bedrock.get(region_name)
+        if client is None:
+            # Creating clients is not thread-safe; creation happens under the lock.
+            with self._lock:
+                client = self._bedrock.get(region_name)
+                if client is None:
+                    client = self._bedrock[region_name] = boto3.client(
+                        "bedrock-runtime",
+                        region_name=region_name,
+                        config=BotoConfig(
+                            max_pool_connections=self.bedrock_workers,
+                            connect_timeout=self.connect_timeout,
+                            read_timeout=self.read_timeout,
+                            retries={"total_max_attempts": 1, "mode": "standard"},
+                        ),
+                    )
+        return client
+
+    async def run_bedrock(self, fn: Callable[..., T], *args) -> T:
+        """ Run a blocking Bedrock call on the dedicated executor; at most bedrock_workers run at once. """
+        if self._bedrock_executor is None:
+            with self._lock:
+                if self._bedrock_executor is None:
+                    self._bedrock_executor = ThreadPoolExecutor(
+                        max_workers=self.bedrock_workers, thread_name_prefix="bedrock-embed"
+                    )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._bedrock_executor, functools.partial(fn, *args))
+
+    async def aclose(self) -> None:
+        for client, _ in self._openai.values():
+            await client.close()
+        self._openai.clear()
+        if self._bedrock_executor is not None:
+            self._bedrock_executor.shutdown(wait=False)
+            self._bedrock_executor = None
+        self._bedrock.clear()
+
+
+# Singleton instance
+embedder_clients = EmbedderClientPool(
+    max_connections=int(get_config_value("EMBED_MAX_CONNECTIONS") or 20),
+    max_concurrency=int(get_config_value("EMBED_MAX_IN_FLIGHT") or 16),
+    connect_timeout=float(get_config_value("EMBED_CONNECT_TIMEOUT_SECONDS") or 5),
+    read_timeout=float(get_config_value("EMBED_READ_TIMEOUT_SECONDS") or 60),
+    bedrock_workers=int(get_config_value("BEDROCK_EMBED_WORKERS") or 8),
+)
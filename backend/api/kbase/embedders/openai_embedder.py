@@ -1,26 +1,72 @@
-import asyncio
+from typing import Optional
 from backend.api.kbase.models import Chunk
 from backend.api.kbase.base_embedder_gateway import BaseEmbedderGateway
-from openai import OpenAI  # New client class
+from backend.api.kbase.context_packing import get_token_counter
+from backend.api.kbase.embedders.clients import embedder_clients
+from backend.api.kbase.embedding_batches import embed_in_batches
+from backend.util.config import get_config_value
+from backend.util.rate_governor import rate_governor
+
+# The embeddings endpoint accepts at most 2048 inputs per request.
+MAX_INPUTS_PER_REQUEST = 2048
+# Batching for embed_texts: inputs and total tokens per request (the endpoint caps a request
+# at 300k tokens), and requests in flight at once.
+EMBED_BATCH_MAX_ITEMS = min(int(get_config_value("EMBED_BATCH_MAX_ITEMS") or 512), MAX_INPUTS_PER_REQUEST)
+EMBED_BATCH_MAX_TOKENS = int(get_config_value("EMBED_BATCH_MAX_TOKENS") or 100_000)
+EMBED_MAX_CONCURRENCY = int(get_config_value("EMBED_MAX_CONCURRENCY") or 4)
+# Models that accept a `dimensions` argument (shortened embeddings).
+DIMENSIONS_MODEL_PREFIX = "text-embedding-3"
 
 class OpenAIEmbedderGateway(BaseEmbedderGateway):
-    def __init__(self, api_key: str, model: str = "text-embedding-3-large"):
+    """
+    Embeds with the async OpenAI client. The client (and its connection pool) is shared per
+    API key through embedder_clients, so creating a gateway per request is cheap. Every request
+    goes through rate_governor. dimensions, if given, is requested from models that support it.
+    """
+    def __init__(self, api_key: str, model: str = "text-embedding-3-large", dimensions: Optional[int] = None):
         self.api_key = api_key
         self.model = model
-        # Instantiate the new OpenAI client with the API key.
-        self.client = OpenAI(api_key=self.api_key)
+        self.dimensions = dimensions if model.startswith(DIMENSIONS_MODEL_PREFIX) else None
 
     async def embed_text(self, chunk: Chunk) -> Chunk:
-        embedding = await asyncio.to_thread(self._get_embedding, chunk.content)
-        chunk.embeddings = embedding
+        chunk.embeddings = (await self._get_embeddings([chunk.content]))[0]
         return chunk
 
+    async def embed_texts(self, chunks: list[Chunk]) -> list[Chunk]:
+        embeddings = await self._embed_in_batches([chunk.content for chunk in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embeddings = embedding
+        return chunks
+
     async def embed_query(self, query: str) -> list[float]:
-        embedding = await asyncio.to_thread(self._get_embedding, query)
-        return embedding
-
-    def _get_embedding(self, text: str) -> list[float]:
-        # Use the new client syntax and access attributes instead of subscripting.
-        response = self.client.embeddings.create(input=[text], model=self.model)
-        embedding = response.data[0].embedding  # Dot notation access
-        return embedding
+        return (await self._get_embeddings([query]))[0]
+
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        return await self._embed_in_batches(queries)
+
+    async def _embed_in_batches(self, texts: list[str]) -> list[list[float]]:
+        return await embed_in_batches(
+            texts,
+            self._get_embeddings,
+            max_items=EMBED_BATCH_MAX_ITEMS,
+            max_tokens=EMBED_BATCH_MAX_TOKENS,
+            max_concurrency=EMBED_MAX_CONCURRENCY,
+            count_tokens=get_token_counter(self.model),
+        )
+
+    async def _get_embeddings(self, texts: list[str], tokens: Optional[int] = None) -> list[list[float]]:
+        """ tokens is the texts' token count if the caller already has it (see embed_in_batches). """
+        client, in_flight = embedder_clients.openai(self.api_key)
+        if tokens is None:
+            count_tokens = get_token_counter(self.model)
+            tokens = sum(count_tokens(text) for text in texts)
+
+        async def create():
+            async with in_flight:
+                if self.dimensions:
+                    return await client.embeddings.create(input=texts, model=self.model, dimensions=self.dimensions)
+                return await client.embeddings.create(input=texts, model=self.model)
+
+        response = await rate_governor.call("openai", self.model, create, tokens=tokens)
+        # Results carry their input index; don't rely on response order.
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
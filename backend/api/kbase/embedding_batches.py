@@ -0,0 +1,82 @@
+"""
+Batch planning for bulk embedding (BaseEmbedderGateway.embed_texts).
+
+Texts are packed, in input order, into contiguous batches bounded by an item count and a
+total token count (the provider's per-request limits), and the batches are sent with a bounded
+number of requests in flight. Because each batch is a contiguous slice and results are
+gathered in batch order, the embeddings line up with the input. When batches are bounded by
+tokens, each batch's token count is handed to embed_batch so it is not counted a second time
+(e.g. for the rate governor).
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from backend.api.kbase.context_packing import get_token_counter
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+# (start, end, tokens): the [start, end) slice of the texts and its token count, or None if not counted.
+Batch = Tuple[int, int, Optional[int]]
+
+
+def plan_batches(
+    texts: List[str],
+    max_items: int,
+    max_tokens: Optional[int] = None,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> List[Batch]:
+    """
+    Split texts into contiguous [start, end) ranges of at most max_items texts and at most
+    max_tokens tokens. A text that alone exceeds max_tokens gets a batch of its own (the
+    provider decides whether to truncate or reject it). Texts are only tokenized when
+    max_tokens is set; otherwise every batch's token count is None.
+    """
+    if max_items < 1:
+        raise ValueError("max_items must be at least 1")
+    if max_tokens is not None and count_tokens is None:
+        count_tokens = get_token_counter(None)
+
+    batches = []
+    start, batch_tokens = 0, 0
+    counted = max_tokens is not None
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text) if counted else 0
+        full = i - start >= max_items or (counted and i > start and batch_tokens + tokens > max_tokens)
+        if full:
+            batches.append((start, i, batch_tokens if counted else None))
+            start, batch_tokens = i, 0
+        batch_tokens += tokens
+    if start < len(texts):
+        batches.append((start, len(texts), batch_tokens if counted else None))
+    return batches
+
+
+async def embed_in_batches(
+    texts: List[str],
+    embed_batch: Callable[[List[str], Optional[int]], Awaitable[List[List[float]]]],
+    max_items: int,
+    max_tokens: Optional[int] = None,
+    max_concurrency: int = 4,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> List[List[float]]:
+    """
+    Embed texts with embed_batch(batch_texts, batch_tokens), one call per planned batch and at
+    most max_concurrency calls in flight. batch_tokens is the batch's token count as planned,
+    or None if texts were not counted. Returns one embedding per text, in input order.
+    """
+    if not texts:
+        return []
+    batches = plan_batches(texts, max_items, max_tokens, count_tokens)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(start: int, end: int, tokens: Optional[int]) -> List[List[float]]:
+        async with semaphore:
+            embeddings = await embed_batch(texts[start:end], tokens)
+        if len(embeddings) != end - start:
+            raise ValueError(f"Embedder returned {len(embeddings)} embeddings for a batch of {end - start} texts")
+        return embeddings
+
+    results = await asyncio.gather(*(run(start, end, tokens) for start, end, tokens in batches))
+    logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches")
+    return [embedding for batch in results for embedding in batch]
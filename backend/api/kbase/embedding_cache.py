@@ -0,0 +1,141 @@
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.util.config import get_config_value
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+CacheKey = Tuple[str, str, Optional[int], str]
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC unicode and collapsed whitespace.
+    Case is kept because embeddings are case-sensitive.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Process-wide async cache of query embeddings keyed by (provider, model, dimensions, normalized text).
+
+    - Entries are evicted least-recently-used first once max_entries or max_bytes is exceeded,
+      and expire ttl_seconds after they were stored.
+    - Vectors are kept as contiguous float32 arrays (4 bytes per dimension).
+    - Concurrent misses for the same key share a single upstream embedding call, which
+      completes (and is cached) even if the caller that started it is cancelled.
+    """
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # Storage format: {key: (expires_at, vector)}; order is recency of use.
+        self._entries: "OrderedDict[CacheKey, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    async def get_or_embed(
+        self,
+        provider: str,
+        model: str,
+        text: str,
+        embed_fn: Callable[[str], Awaitable[List[float]]],
+        dimensions: Optional[int] = None,
+    ) -> List[float]:
+        """
+        Return the cached embedding for text, calling embed_fn(text) on a miss.
+        """
+        key = (provider, model, dimensions, normalize_query_text(text))
+
+        vector = self._get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector.tolist()
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The upstream call runs as its own task that no caller owns: a caller that is
+            # cancelled (client disconnect) stops waiting without cancelling it for the others.
+            task = asyncio.create_task(self._embed(key, text, embed_fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        vector = await asyncio.shield(task)
+        return vector.tolist()
+
+    async def _embed(self, key: CacheKey, text: str, embed_fn: Callable[[str], Awaitable[List[float]]]) -> np.ndarray:
+        vector = np.asarray(await embed_fn(text), dtype=np.float32)
+        self._put(key, vector)
+        return vector
+
+    def _finish(self, key: CacheKey, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark a failure as retrieved in case every caller stopped waiting for it.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _get(self, key: CacheKey) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return vector
+
+    def _put(self, key: CacheKey, vector: np.ndarray) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+        self._bytes += vector.nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey) -> None:
+        _, vector = self._entries.pop(key)
+        self._bytes -= vector.nbytes
+
+
+# Singleton instance
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=int(get_config_value("QUERY_EMBEDDING_CACHE_MAX_ENTRIES") or 10_000),
+    max_bytes=int(get_config_value("QUERY_EMBEDDING_CACHE_MAX_BYTES") or 64 * 1024 * 1024),
+    ttl_seconds=float(get_config_value("QUERY_EMBEDDING_CACHE_TTL_SECONDS") or 3600),
+)
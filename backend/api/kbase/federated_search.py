@@ -0,0 +1,280 @@
+import asyncio
+import heapq
+import time
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Float, any_, literal
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PGUUID
+from sqlalchemy.future import select
+
+from backend.api.kbase.embedder_registry import EmbedderKey, embedder_registry
+from backend.api.kbase.kbase_schema import KbaseDocumentORM
+from backend.api.kbase.math_helpers import distance_to_similarity, mmr, normalize_vector, relevance_cutoff
+from backend.api.kbase.metadata_filter import build_metadata_filter
+from backend.api.kbase.models import Chunk, FederatedRetrievedChunks, KbaseSearchTiming, KnowledgeBase, RetrievedChunks
+from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.vector_index import DISTANCE_OPERATORS
+from backend.util.database import async_session_maker
+from backend.util.logging import SetupLogging
+from backend.util.tracing import stage
+
+logger = SetupLogging()
+
+STRATEGIES = ("fanout", "any")
+
+
+class FederatedVectorSearch:
+    """
+    Search several knowledge bases as one.
+
+    strategy "fanout" runs one search per kbase concurrently, each on its own pooled session so
+    every kbase uses its own ANN index and settings, then merges the per-kbase top-k with a
+    bounded heap on cosine similarity (comparable across kbases because embeddings are
+    unit-normalized). strategy "any" runs a single exact-scan query with kbase_id = ANY(...),
+    which cannot use the per-kbase partial indexes or quantized columns
+    (it always scans full-precision embeddings); it requires all kbases to share a distance
+    metric. Both strategies apply each kbase's relevance cutoffs (max_distance, score_gap) to
+    that kbase's hits. MMR runs once over the merged candidate pool.
+
+    Exposes the same retrieval methods as PostgresVectorStore, so it can be passed to an
+    assistant in place of a single-kbase store. All kbases must share one embedder, since one
+    query embedding serves all of them; queries are embedded with embedder_key.
+    """
+    __slots__ = ("kbases", "session_factory", "strategy", "max_concurrency", "embedder_key")
+
+    def __init__(
+        self,
+        kbases: List[KnowledgeBase],
+        session_factory: Callable = async_session_maker,
+        strategy: str = "fanout",
+        max_concurrency: int = 8,
+    ):
+        if not kbases:
+            raise ValueError("At least one knowledge base is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unsupported federated search strategy: {strategy}")
+        # Raises ValueError if the kbases are embedded by different models or dimensions.
+        self.embedder_key: EmbedderKey = embedder_registry.shared_key(kbases)
+        if strategy == "any" and len({kbase.distance_metric for kbase in kbases}) > 1:
+            raise ValueError('Strategy "any" requires all knowledge bases to use the same distance metric')
+        self.kbases = kbases
+        self.session_factory = session_factory
+        self.strategy = strategy
+        self.max_concurrency = max_concurrency
+
+    async def similarity_search_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> FederatedRetrievedChunks:
+        """
+        Top k chunks across all kbases by cosine similarity.
+        Extra keyword arguments (ef_search, probes, ...) are passed to each per-kbase search.
+        """
+        started = time.perf_counter()
+        candidates, timings = await self._gather_candidates(query_embedding, k, filter, include_embeddings=False, **kwargs)
+        return FederatedRetrievedChunks(
+            chunks=self._merge(candidates, k),
+            timings=timings,
+            total_ms=_elapsed_ms(started),
+        )
+
+    async def mmr_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        lambda_: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> FederatedRetrievedChunks:
+        """
+        MMR over the merged pool: each kbase contributes up to 10*k candidates (after its own
+        relevance cutoffs), the best 10*k overall are kept, and MMR selects k of them once.
+        """
+        started = time.perf_counter()
+        n_candidates = max(k * 10, k)
+        candidates, timings = await self._gather_candidates(query_embedding, n_candidates, filter, include_embeddings=True, **kwargs)
+        pool = self._merge(candidates, n_candidates, keep_embeddings=True)
+        if len(pool) <= k:
+            # Relevance cutoffs already shrank the pool to k or fewer; nothing to diversify.
+            selected = pool
+        else:
+            with stage("mmr"):
+                selected = mmr(
+                    query_embedding,
+                    [chunk.embeddings for chunk in pool],
+                    pool,
+                    k,
+                    lambda_,
+                    query_similarities=[chunk.score for chunk in pool],
+                )
+        return FederatedRetrievedChunks(
+            chunks=[chunk.model_copy(update={"embeddings": None}) for chunk in selected],
+            timings=timings,
+            total_ms=_elapsed_ms(started),
+        )
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        k: int = 4,
+        rrf_k: int = 60,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> FederatedRetrievedChunks:
+        """
+        Hybrid search on every kbase (always fanned out), merged on each chunk's RRF score from its
+        own kbase's lexical + vector fusion. A chunk found by both sides of its kbase therefore
+        outranks one found by a single side anywhere, but the scores are still rank-based: the
+        best hits of two kbases tie however well they match, so ties are broken by cosine
+        similarity (comparable across kbases), with lexical-only hits last.
+        """
+        started = time.perf_counter()
+
+        async def search(store: PostgresVectorStore) -> RetrievedChunks:
+            return await store.hybrid_search(query_text, query_embedding, k=k, rrf_k=rrf_k, filter=filter, **kwargs)
+
+        results, timings = await self._fan_out(search)
+        candidates = [
+            chunk.model_copy(update={"kbase_id": kbase.id})
+            for kbase, result in results
+            for chunk in result.chunks
+        ]
+        top = heapq.nlargest(
+            k,
+            candidates,
+            key=lambda chunk: (chunk.rrf_score or 0.0, chunk.score if chunk.score is not None else float("-inf")),
+        )
+        return FederatedRetrievedChunks(
+            chunks=top,
+            timings=timings,
+            total_ms=_elapsed_ms(started),
+        )
+
+    async def _gather_candidates(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        filter: Optional[dict],
+        include_embeddings: bool,
+        **kwargs,
+    ) -> Tuple[List[Chunk], List[KbaseSearchTiming]]:
+        if self.strategy == "any":
+            return await self._search_any(query_embedding, limit, filter, include_embeddings)
+
+        async def search(store: PostgresVectorStore) -> RetrievedChunks:
+            return await store.similarity_search_by_vector(
+                query_embedding, k=limit, filter=filter, include_embeddings=include_embeddings, **kwargs
+            )
+
+        results, timings = await self._fan_out(search)
+        candidates = [
+            chunk.model_copy(update={"kbase_id": kbase.id})
+            for kbase, result in results
+            for chunk in result.chunks
+        ]
+        return candidates, timings
+
+    async def _fan_out(self, search) -> Tuple[List[Tuple[KnowledgeBase, RetrievedChunks]], List[KbaseSearchTiming]]:
+        """
+        Run search(store) for every kbase concurrently, each on its own session.
+        A failing kbase is logged and reported in its timing; the search fails only if all kbases fail.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(kbase: KnowledgeBase):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with self.session_factory() as session:
+                        result = await search(PostgresVectorStore.from_kbase(session, kbase))
+                    return result, KbaseSearchTiming(kbase_id=kbase.id, elapsed_ms=_elapsed_ms(started), num_results=len(result.chunks))
+                except Exception as e:
+                    logger.error(f"Federated search failed for KnowledgeBase with UUID: {kbase.id}: {str(e)}", exc_info=True)
+                    return None, KbaseSearchTiming(kbase_id=kbase.id, elapsed_ms=_elapsed_ms(started), error=str(e))
+
+        outcomes = await asyncio.gather(*(run(kbase) for kbase in self.kbases))
+        results = [(kbase, result) for kbase, (result, _) in zip(self.kbases, outcomes) if result is not None]
+        if not results:
+            raise RuntimeError("Federated search failed for every knowledge base")
+        return results, [timing for _, timing in outcomes]
+
+    async def _search_any(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        filter: Optional[dict],
+        include_embeddings: bool,
+    ) -> Tuple[List[Chunk], List[KbaseSearchTiming]]:
+        """
+        A single exact-scan query over all kbases with kbase_id = ANY(:kbase_ids), then each kbase's
+        relevance cutoffs applied to its own hits, as its own store would.
+        """
+        started = time.perf_counter()
+        table = KbaseDocumentORM.__table__
+        metric = self.kbases[0].distance_metric
+        distance = table.c.embedding.op(DISTANCE_OPERATORS[metric], return_type=Float)(normalize_vector(query_embedding))
+        kbase_ids = literal([kbase.id for kbase in self.kbases], type_=ARRAY(PGUUID(as_uuid=True)))
+
+        columns = [table.c.id, table.c.kbase_id, table.c.content, table.c.metadata, distance.label("distance")]
+        if include_embeddings:
+            columns.append(table.c.embedding)
+        stmt = (
+            select(*columns)
+            .where(table.c.kbase_id == any_(kbase_ids), build_metadata_filter(table.c.metadata, filter))
+            .order_by(distance)
+            .limit(limit)
+        )
+        with stage("vector_search"):
+            async with self.session_factory() as session:
+                rows = (await session.execute(stmt)).all()
+
+        hits = {kbase.id: [] for kbase in self.kbases}
+        for row in rows:
+            hits[row.kbase_id].append(
+                Chunk(
+                    id=row.id,
+                    kbase_id=row.kbase_id,
+                    content=row.content,
+                    metadata=row.metadata,
+                    embeddings=row.embedding if include_embeddings else None,
+                    distance=row.distance,
+                    score=distance_to_similarity(row.distance, metric),
+                )
+            )
+        chunks = []
+        for kbase in self.kbases:
+            kbase_hits = hits[kbase.id]
+            index_params = kbase.index_params or {}
+            keep = relevance_cutoff(
+                [chunk.distance for chunk in kbase_hits],
+                [chunk.score for chunk in kbase_hits],
+                index_params.get("max_distance"),
+                index_params.get("score_gap"),
+            )
+            chunks.extend(kbase_hits[:keep])
+        elapsed = _elapsed_ms(started)
+        timings = [
+            KbaseSearchTiming(
+                kbase_id=kbase.id,
+                elapsed_ms=elapsed,
+                num_results=sum(1 for chunk in chunks if chunk.kbase_id == kbase.id),
+            )
+            for kbase in self.kbases
+        ]
+        return chunks, timings
+
+    @staticmethod
+    def _merge(candidates: List[Chunk], limit: int, keep_embeddings: bool = False) -> List[Chunk]:
+        """ Best `limit` chunks by score, using a bounded heap rather than sorting the whole pool. """
+        top = heapq.nlargest(limit, candidates, key=lambda chunk: chunk.score if chunk.score is not None else float("-inf"))
+        if keep_embeddings:
+            return top
+        return [chunk.model_copy(update={"embeddings": None}) if chunk.embeddings is not None else chunk for chunk in top]
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
@@ -0,0 +1,345 @@
+"""
+Brute-force vector store over a contiguous float32 matrix held in process memory.
+
+For small and medium kbases one matrix-vector product is cheaper than a Postgres round trip
+plus row decoding. A kbase's store can be loaded from a snapshot directory (embeddings.npy +
+chunks.jsonl), memory-mapped read-only so that several worker processes share the same pages,
+or pulled from kbase_documents once per process. Either copy records the kbase's content_version
+it was built from, and is replaced as soon as a request sees a newer one. It needs no database at all when built
+directly, which also makes it a stand-in for PostgresVectorStore in tests.
+"""
+import asyncio
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.api.kbase.base_vector_store import BaseVectorStore
+from backend.api.kbase.kbase_schema import KbaseDocumentORM
+from backend.api.kbase.math_helpers import mmr, normalize_rows, relevance_cutoff, similarity_to_distance
+from backend.api.kbase.metadata_filter import matches_metadata_filter, validate_metadata_filter
+from backend.api.kbase.models import Chunk, Document, KnowledgeBase, RetrievedChunks
+from backend.api.kbase.vector_index import DISTANCE_OPERATORS
+from backend.util.config import get_config_value
+from backend.util.tracing import stage
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+SNAPSHOT_EMBEDDINGS = "embeddings.npy"
+SNAPSHOT_CHUNKS = "chunks.jsonl"
+# The kbase content_version the snapshot was written from.
+SNAPSHOT_VERSION = "content_version"
+
+
+class FlatVectorStore(BaseVectorStore):
+    __slots__ = ("kbase_id", "embedding_dim", "distance_metric", "index_params", "content_version", "_matrix", "_chunks")
+
+    def __init__(
+        self,
+        kbase_id: uuid.UUID,
+        embedding_dim: Optional[int] = None,
+        distance_metric: str = "l2",
+        matrix: Optional[np.ndarray] = None,
+        chunks: Optional[List[Chunk]] = None,
+        index_params: Optional[dict] = None,
+        content_version: int = 0,
+    ):
+        """
+        Args:
+            kbase_id (uuid.UUID): The knowledge base identifier.
+            embedding_dim (int): Embedding dimension; inferred from the first document if not set.
+            distance_metric (str): Only affects the reported distance; ranking is by cosine similarity
+                because rows are unit-normalized, as in PostgresVectorStore.
+            matrix (np.ndarray): Unit-normalized float32 embeddings, one row per chunk (may be a memmap).
+            chunks (List[Chunk]): Chunks without embeddings, aligned with the matrix rows.
+            index_params (dict): Kbase search settings; only "max_distance" / "score_gap" apply here.
+            content_version (int): The kbase content_version the chunks were loaded at.
+        """
+        if distance_metric not in DISTANCE_OPERATORS:
+            raise ValueError(f"Unsupported distance metric: {distance_metric}")
+        chunks = chunks or []
+        if matrix is None:
+            matrix = np.empty((0, embedding_dim or 0), dtype=np.float32)
+        if len(matrix) != len(chunks):
+            raise ValueError(f"Snapshot has {len(matrix)} embeddings but {len(chunks)} chunks")
+        self.kbase_id = kbase_id
+        self.embedding_dim = embedding_dim or (matrix.shape[1] if len(matrix) else None)
+        self.distance_metric = distance_metric
+        self.index_params = index_params or {}
+        self.content_version = content_version
+        self._matrix = matrix
+        self._chunks = chunks
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    @classmethod
+    def from_kbase(cls, kbase: KnowledgeBase) -> "FlatVectorStore":
+        """ An empty store with the kbase's vector settings. """
+        return cls(
+            kbase_id=kbase.id,
+            embedding_dim=kbase.embedding_dim,
+            distance_metric=kbase.distance_metric,
+            index_params=kbase.index_params,
+        )
+
+    @classmethod
+    def load(cls, directory: str, kbase: KnowledgeBase, mmap: bool = True) -> "FlatVectorStore":
+        """
+        Load a snapshot written by save(). With mmap the matrix is mapped read-only and
+        shared through the page cache; adding documents then copies it into process memory.
+        """
+        matrix = np.load(os.path.join(directory, SNAPSHOT_EMBEDDINGS), mmap_mode="r" if mmap else None)
+        chunks = []
+        with open(os.path.join(directory, SNAPSHOT_CHUNKS), "r", encoding="utf-8") as f:
+            for line in f:
+                chunks.append(Chunk.model_validate_json(line))
+        return cls(
+            kbase_id=kbase.id,
+            embedding_dim=kbase.embedding_dim,
+            distance_metric=kbase.distance_metric,
+            matrix=matrix,
+            chunks=chunks,
+            index_params=kbase.index_params,
+            content_version=read_snapshot_version(directory),
+        )
+
+    @classmethod
+    async def from_postgres(cls, session: AsyncSession, kbase: KnowledgeBase, batch_size: int = 5000) -> "FlatVectorStore":
+        """
+        Load every chunk of a kbase from kbase_documents, streaming rows in batches. The store is
+        stamped with kbase.content_version as read before the load; a write during the load
+        leaves it looking older than it is, so it is reloaded rather than kept stale.
+        """
+        table = KbaseDocumentORM.__table__
+        stmt = (
+            select(table.c.id, table.c.content, table.c.metadata, table.c.embedding)
+            .where(table.c.kbase_id == kbase.id)
+            .execution_options(yield_per=batch_size)
+        )
+        rows, chunks = [], []
+        result = await session.stream(stmt)
+        async for row in result:
+            rows.append(np.asarray(row.embedding, dtype=np.float32))
+            chunks.append(Chunk(id=row.id, content=row.content, metadata=row.metadata))
+        matrix = normalize_rows(np.vstack(rows)) if rows else None
+        logger.info(f"Loaded {len(chunks)} chunks into a flat vector store for KnowledgeBase with UUID: {kbase.id}")
+        return cls(
+            kbase_id=kbase.id,
+            embedding_dim=kbase.embedding_dim,
+            distance_metric=kbase.distance_metric,
+            matrix=matrix,
+            chunks=chunks,
+            index_params=kbase.index_params,
+            content_version=kbase.content_version,
+        )
+
+    def save(self, directory: str) -> None:
+        """
+        Write the snapshot (embeddings.npy + chunks.jsonl + content_version). Files are written
+        under temporary names and renamed, so processes mapping an older snapshot keep a
+        consistent view. The version file is replaced last: until then the snapshot reads as
+        the old version, which is never newer than the files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        embeddings_path = os.path.join(directory, SNAPSHOT_EMBEDDINGS)
+        chunks_path = os.path.join(directory, SNAPSHOT_CHUNKS)
+        with open(embeddings_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self._matrix, dtype=np.float32))
+        with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+            for chunk in self._chunks:
+                f.write(chunk.model_dump_json(include={"id", "content", "metadata"}) + "\n")
+        version_path = os.path.join(directory, SNAPSHOT_VERSION)
+        with open(version_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(self.content_version))
+        # Mark the snapshot as unversioned while its files are swapped.
+        if os.path.exists(version_path):
+            os.remove(version_path)
+        os.replace(chunks_path + ".tmp", chunks_path)
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+        os.replace(version_path + ".tmp", version_path)
+
+    async def add_document(self, document: Document) -> int:
+        """
+        Append a document's chunks. Embeddings are stored unit-normalized, as in PostgresVectorStore.
+        """
+        vectors = []
+        for chunk in document.chunks:
+            if chunk.embeddings is None:
+                raise ValueError("Chunk must have embeddings")
+            if self.embedding_dim and len(chunk.embeddings) != self.embedding_dim:
+                raise ValueError(
+                    f"Chunk embedding has {len(chunk.embeddings)} dimensions, kbase expects {self.embedding_dim}"
+                )
+            self.embedding_dim = self.embedding_dim or len(chunk.embeddings)
+            vectors.append(chunk.embeddings)
+        if not vectors:
+            return 0
+        new_rows = normalize_rows(np.array(vectors, dtype=np.float32))
+        self._matrix = new_rows if not len(self._matrix) else np.concatenate([self._matrix, new_rows])
+        self._chunks.extend(
+            Chunk(id=chunk.id, content=chunk.content, metadata=chunk.metadata) for chunk in document.chunks
+        )
+        return len(vectors)
+
+    async def similarity_search_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        include_embeddings: bool = False,
+        max_distance: Optional[float] = None,
+        score_gap: Optional[float] = None,
+        **kwargs,
+    ) -> RetrievedChunks:
+        """
+        Top k chunks by cosine similarity; index tuning arguments (ef_search, probes) are ignored.
+        Relevance cutoffs work as in PostgresVectorStore.similarity_search_by_vector.
+        """
+        with stage("vector_search"):
+            indices, scores = self._top_k(query_embedding, k, filter)
+        chunks = [self._to_chunk(i, score, include_embeddings) for i, score in zip(indices, scores)]
+        return RetrievedChunks(chunks=chunks[:self._relevance_cutoff(chunks, max_distance, score_gap)])
+
+    async def mmr_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        lambda_: float = 0.5,
+        filter: Optional[dict] = None,
+        max_distance: Optional[float] = None,
+        score_gap: Optional[float] = None,
+        **kwargs,
+    ) -> RetrievedChunks:
+        """
+        MMR over the top 10*k candidates, as in PostgresVectorStore.mmr_by_vector.
+        """
+        with stage("vector_search"):
+            indices, scores = self._top_k(query_embedding, max(k * 10, k), filter)
+        candidate_chunks = [self._to_chunk(i, score) for i, score in zip(indices, scores)]
+        keep = self._relevance_cutoff(candidate_chunks, max_distance, score_gap)
+        candidate_chunks, indices, scores = candidate_chunks[:keep], indices[:keep], scores[:keep]
+        if len(candidate_chunks) <= k:
+            return RetrievedChunks(chunks=candidate_chunks)
+        with stage("mmr"):
+            selected = mmr(
+                query_embedding,
+                self._matrix[indices],
+                candidate_chunks,
+                k,
+                lambda_,
+                query_similarities=scores,
+            )
+        return RetrievedChunks(chunks=selected)
+
+    def _relevance_cutoff(self, chunks: List[Chunk], max_distance: Optional[float], score_gap: Optional[float]) -> int:
+        """ relevance_cutoff with the kbase's settings as defaults. """
+        return relevance_cutoff(
+            [chunk.distance for chunk in chunks],
+            [chunk.score for chunk in chunks],
+            max_distance if max_distance is not None else self.index_params.get("max_distance"),
+            score_gap if score_gap is not None else self.index_params.get("score_gap"),
+        )
+
+    def _top_k(self, query_embedding: List[float], k: int, filter: Optional[dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices and cosine similarities of the k best rows, best first:
+        one matrix-vector product, then argpartition so only the top k are sorted.
+        """
+        validate_metadata_filter(filter)
+        if not len(self._chunks):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        if len(query_embedding) != self._matrix.shape[1]:
+            raise ValueError(
+                f"Query embedding has {len(query_embedding)} dimensions, kbase expects {self._matrix.shape[1]}"
+            )
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm != 0:
+            query = query / norm
+        scores = self._matrix @ query
+
+        if filter:
+            mask = np.fromiter(
+                (matches_metadata_filter(chunk.metadata, filter) for chunk in self._chunks),
+                dtype=bool,
+                count=len(self._chunks),
+            )
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def _to_chunk(self, index: int, score: float, include_embeddings: bool = False) -> Chunk:
+        chunk = self._chunks[index]
+        score = float(score)
+        return chunk.model_copy(update={
+            "embeddings": self._matrix[index].tolist() if include_embeddings else None,
+            "score": score,
+            "distance": similarity_to_distance(score, self.distance_metric),
+        })
+
+
+def read_snapshot_version(directory: str) -> Optional[int]:
+    """ The content_version a snapshot was written from; None if unknown. """
+    try:
+        with open(os.path.join(directory, SNAPSHOT_VERSION), "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class FlatVectorStoreRegistry:
+    """
+    Process-wide flat stores, loaded once per kbase: from `<FLAT_VECTOR_STORE_DIR>/<kbase_id>/`
+    (memory-mapped) when a snapshot of the kbase's current content_version exists there,
+    otherwise from Postgres. The kbase passed to get() is read per request, so a store (or
+    snapshot) built before another process wrote to the kbase is replaced on the next request
+    in every process, and after restarts. invalidate(kbase_id) drops the local copy early.
+    """
+    def __init__(self, snapshot_dir: Optional[str] = None):
+        self.snapshot_dir = snapshot_dir
+        self._stores: Dict[uuid.UUID, FlatVectorStore] = {}
+        self._locks: Dict[uuid.UUID, asyncio.Lock] = {}
+
+    async def get(self, session: AsyncSession, kbase: KnowledgeBase) -> FlatVectorStore:
+        store = self._stores.get(kbase.id)
+        # A copy at least as new as the caller's view of the kbase is current.
+        if store is not None and store.content_version >= kbase.content_version:
+            # Search settings can change without the data changing; take the caller's current ones.
+            store.index_params = kbase.index_params or {}
+            store.distance_metric = kbase.distance_metric
+            return store
+        lock = self._locks.setdefault(kbase.id, asyncio.Lock())
+        async with lock:
+            store = self._stores.get(kbase.id)
+            if store is None or store.content_version < kbase.content_version:
+                directory = self.snapshot_path(kbase.id)
+                snapshot_version = read_snapshot_version(directory) if directory else None
+                if snapshot_version is not None and snapshot_version >= kbase.content_version:
+                    store = FlatVectorStore.load(directory, kbase)
+                else:
+                    store = await FlatVectorStore.from_postgres(session, kbase)
+                self._stores[kbase.id] = store
+        return store
+
+    def snapshot_path(self, kbase_id: uuid.UUID) -> Optional[str]:
+        if not self.snapshot_dir:
+            return None
+        return os.path.join(self.snapshot_dir, str(kbase_id))
+
+    def invalidate(self, kbase_id: uuid.UUID) -> None:
+        self._stores.pop(kbase_id, None)
+
+
+# Singleton instance
+flat_store_registry = FlatVectorStoreRegistry(snapshot_dir=get_config_value("FLAT_VECTOR_STORE_DIR"))
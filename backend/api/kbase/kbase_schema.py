@@ -1,13 +1,18 @@
 import uuid
-from sqlalchemy import Column, String, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Integer, Computed, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR, BIT as PGBIT
 from sqlalchemy import Text
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+class VARBIT(BIT):
+    """ pgvector's BIT type stored as `bit varying`; a bare `bit` column is bit(1). """
+    impl = PGBIT(varying=True)
+    cache_ok = True
+
 class KnowledgeBaseORM(Base):
     __tablename__ = "kbase"
 
@@ -15,6 +20,22 @@ class KnowledgeBaseORM(Base):
     name = Column(String(255), nullable=False)
     description = Column(String, nullable=True)
     account_short_code = Column(String, nullable=True)
+    # Embedder used for the kbase's chunks and queries; see backend/api/kbase/embedder_registry.py.
+    embedding_provider = Column(String(32), nullable=False, server_default="openai")
+    embedding_model = Column(String(255), nullable=False, server_default="text-embedding-3-large")
+    # Vector settings. embedding_dim is recorded on first ingest if not set up front.
+    embedding_dim = Column(Integer, nullable=True)
+    distance_metric = Column(String(16), nullable=False, server_default="l2")
+    # ANN index ("hnsw", "ivfflat" or NULL for exact search) and its build/search parameters.
+    index_type = Column(String(16), nullable=True)
+    index_params = Column(JSONB, nullable=True)
+    # Optional quantized copy of the embeddings ("halfvec" or "binary") for two-stage search.
+    quantization = Column(String(16), nullable=True)
+    # Search backend: "postgres" (PostgresVectorStore) or "flat" (FlatVectorStore).
+    vector_backend = Column(String(16), nullable=False, server_default="postgres")
+    # Bumped in the same transaction as every write to the kbase's chunks; processes compare it
+    # with the version their in-memory copy (flat store, snapshot) was built from.
+    content_version = Column(Integer, nullable=False, server_default="0")
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -24,8 +45,63 @@ class KbaseDocumentORM(Base):
     # Primary key and foreign key to the KnowledgeBase table
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     kbase_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    # Source document of the chunk (S3 URI); a re-upload of the same source replaces its chunks.
+    source_uri = Column(Text, nullable=True)
     content = Column(Text, nullable=False)
-    # For production, set the dimension to the expected value (e.g. 1536)
-    # openai text-large is 3072
-    # bedrock text is 1024
-    embedding = Column(Vector, nullable=False)
\ No newline at end of file
+    # Full-text search vector for hybrid search; GIN-indexed, maintained by Postgres.
+    content_tsv = Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))
+    # Untyped so that kbases with different embedding models can share the table
+    # (openai text-large is 3072, bedrock titan is 1024). ANN indexes are built per
+    # kbase on a typed cast of this column; see backend/api/kbase/vector_index.py.
+    embedding = Column(Vector, nullable=False)
+    # Quantized copies, populated for kbases with quantization enabled (at ingest or by backfill).
+    embedding_half = Column(HALFVEC, nullable=True)
+    embedding_bq = Column(VARBIT, nullable=True)
+    # Chunk metadata (title, link, document id, chunk_id, ...), GIN-indexed with jsonb_path_ops
+    # for containment filters. Renamed attribute because `metadata` is reserved by declarative.
+    chunk_metadata = Column("metadata", JSONB, nullable=True)
+    # SHA-256 of the normalized content (backend/api/kbase/content_hash.py). Unique per kbase, so a
+    # chunk already in the kbase is skipped at ingest instead of being embedded and stored again.
+    content_hash = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("kbase_id", "content_hash", name="uq_kbase_documents_kbase_id_content_hash"),
+        Index("ix_kbase_documents_kbase_id_source_uri", "kbase_id", "source_uri"),
+    )
+
+class KbaseDocumentSourceORM(Base):
+    """
+    Which source documents of a kbase contain which chunk content. kbase_documents stores each
+    content once per kbase, so a row can be shared by several sources; it is deleted only when
+    no source references its content_hash any more (see backend/api/index/chunk_diff.py).
+    """
+    __tablename__ = "kbase_document_sources"
+
+    kbase_id = Column(UUID(as_uuid=True), primary_key=True)
+    source_uri = Column(Text, primary_key=True)
+    content_hash = Column(String(64), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_kbase_document_sources_kbase_id_content_hash", "kbase_id", "content_hash"),
+    )
+
+class EmbeddingCacheORM(Base):
+    """
+    Content-addressed embeddings shared by all kbases: one vector per (model, dimensions, text).
+    See backend/api/kbase/persistent_embedding_cache.py.
+    """
+    __tablename__ = "embedding_cache"
+
+    model = Column(String(255), primary_key=True)
+    # Requested output dimensions; 0 for the model's native size.
+    dimensions = Column(Integer, primary_key=True)
+    # SHA-256 of the exact text sent to the provider.
+    text_hash = Column(String(64), primary_key=True)
+    embedding = Column(Vector, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    # Bumped on hits (at most hourly per entry); the vacuum command evicts entries unused for a while.
+    last_used_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_embedding_cache_last_used_at", "last_used_at"),
+    )
@@ -1,5 +1,7 @@
 import math
-from typing import List
+from typing import List, Optional, Sequence
+
+import numpy as np
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Compute cosine similarity between two vectors."""
@@ -10,35 +12,155 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         return 0.0
     return dot_product / (norm1 * norm2)
 
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale each row of a 2-D array to unit length.
+    Zero rows are left as zeros so they score 0.0 against everything,
+    matching cosine_similarity's behaviour.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms != 0)
+    return matrix
+
+def normalize_vector(vec: Sequence[float]) -> List[float]:
+    """Return vec scaled to unit length (zero vectors are returned unchanged)."""
+    arr = np.asarray(vec, dtype=np.float64)
+    norm = np.linalg.norm(arr)
+    if norm == 0:
+        return arr.tolist()
+    return (arr / norm).tolist()
+
+def binary_quantize(vec: Sequence[float]) -> str:
+    """Sign-bit quantization as a bit string, matching pgvector's binary_quantize (x > 0 -> 1)."""
+    return "".join("1" if x > 0 else "0" for x in vec)
+
+def distance_to_similarity(distance: float, metric: str) -> float:
+    """
+    Convert a pgvector distance into cosine similarity, assuming unit-length vectors.
+
+    cosine (<=>) is 1 - cos and inner product (<#>) is -dot. L2 (<->) is the Euclidean
+    distance d, whose square for unit vectors is 2 - 2 * cos, so cos = 1 - d^2 / 2.
+    """
+    if metric == "cosine":
+        return 1.0 - distance
+    if metric == "ip":
+        return -distance
+    if metric == "l2":
+        return 1.0 - (distance * distance) / 2.0
+    raise ValueError(f"Unsupported distance metric: {metric}")
+
+def similarity_to_distance(similarity: float, metric: str) -> float:
+    """ Inverse of distance_to_similarity: the pgvector distance for a cosine similarity of unit vectors. """
+    if metric == "cosine":
+        return 1.0 - similarity
+    if metric == "ip":
+        return -similarity
+    if metric == "l2":
+        return math.sqrt(max(0.0, 2.0 - 2.0 * similarity))
+    raise ValueError(f"Unsupported distance metric: {metric}")
+
+def relevance_cutoff(
+    distances: Sequence[Optional[float]],
+    scores: Sequence[Optional[float]],
+    max_distance: Optional[float] = None,
+    score_gap: Optional[float] = None,
+) -> int:
+    """
+    How many of a best-first result list are worth keeping.
+
+    Stops at the first hit farther than max_distance, and at the first drop in similarity of
+    at least score_gap between consecutive hits: when the best few hits are clearly separated
+    from the rest, the rest is weak context. Hits without a distance / score never cut the list.
+    """
+    for i, distance in enumerate(distances):
+        if max_distance is not None and distance is not None and distance > max_distance:
+            return i
+        if score_gap is not None and i > 0 and scores[i - 1] is not None and scores[i] is not None:
+            if scores[i - 1] - scores[i] >= score_gap:
+                return i
+    return len(distances)
+
 def mmr(
-    query: List[float],
-    candidate_vectors: List[List[float]],
+    query: Sequence[float],
+    candidate_vectors: Sequence[Sequence[float]],
     candidate_chunks: List,
     k: int,
-    lambda_: float = 0.5
+    lambda_: float = 0.5,
+    query_similarities: Optional[Sequence[float]] = None,
 ) -> List:
     """
     Maximal Marginal Relevance (MMR) selection.
-    
+
+    Works on a row-normalized candidate matrix: query similarities are computed
+    once with a single matrix-vector product, and the max-similarity-to-selected
+    vector is updated incrementally after each pick, so every round costs one
+    extra matrix-vector product instead of re-scoring all selected pairs.
+
     Args:
         query: The query embedding.
-        candidate_vectors: List of candidate embedding vectors.
+        candidate_vectors: List of candidate embedding vectors (lists or numpy arrays).
         candidate_chunks: List of candidate chunks (or documents) corresponding to the candidate_vectors.
         k: Number of results to select.
         lambda_: Trade-off parameter between relevance and diversity.
-    
+        query_similarities: Precomputed cosine similarity of each candidate to the query
+            (e.g. scores returned by the vector store). Computed here when omitted.
+
     Returns:
-        A list of k candidate chunks selected using MMR.
+        A list of k candidate chunks selected using MMR, in selection order.
+        The order is identical to mmr_python.
+    """
+    if len(candidate_vectors) == 0:
+        return []
+
+    matrix = normalize_rows(np.array(candidate_vectors, dtype=np.float64))
+    if query_similarities is not None:
+        sims_to_query = np.array(query_similarities, dtype=np.float64)
+    else:
+        query_vec = np.array(query, dtype=np.float64)
+        query_norm = np.linalg.norm(query_vec)
+        if query_norm != 0:
+            query_vec /= query_norm
+        # Cosine similarity between the query and every candidate, computed once.
+        sims_to_query = matrix @ query_vec
+    # Initialize the selected set with the most relevant candidate.
+    best_i = int(np.argmax(sims_to_query))
+    selected = [best_i]
+    available = np.ones(len(matrix), dtype=bool)
+    available[best_i] = False
+    # Running max similarity of each candidate to anything already selected.
+    max_sim_to_selected = matrix @ matrix[best_i]
+
+    while len(selected) < k and available.any():
+        mmr_scores = lambda_ * sims_to_query - (1 - lambda_) * max_sim_to_selected
+        mmr_scores[~available] = -np.inf
+        best_i = int(np.argmax(mmr_scores))
+        selected.append(best_i)
+        available[best_i] = False
+        np.maximum(max_sim_to_selected, matrix @ matrix[best_i], out=max_sim_to_selected)
+    # Return the selected candidate chunks in the order they were selected.
+    return [candidate_chunks[i] for i in selected]
+
+def mmr_python(
+    query: List[float],
+    candidate_vectors: List[List[float]],
+    candidate_chunks: List,
+    k: int,
+    lambda_: float = 0.5
+) -> List:
+    """
+    Pure-Python reference implementation of MMR.
+
+    Kept for benchmarking and for checking mmr against; use mmr in application code.
     """
     if not candidate_vectors:
         return []
-    
+
     # Compute cosine similarities between query and each candidate.
     sims_to_query = [cosine_similarity(query, vec) for vec in candidate_vectors]
     # Initialize the selected set with the most relevant candidate.
     selected = [max(range(len(sims_to_query)), key=lambda i: sims_to_query[i])]
     remaining = set(range(len(candidate_vectors))) - set(selected)
-    
+
     while len(selected) < k and remaining:
         mmr_scores = {}
         for i in remaining:
@@ -0,0 +1,110 @@
+"""
+Translate a chunk-metadata filter into a SQL predicate on kbase_documents.metadata.
+
+Filter syntax (all conditions are ANDed):
+    {"title": "handbook.pdf"}                   equality, served by the GIN (jsonb_path_ops) index via @>
+    {"id": {"$in": ["<doc uuid>", "<doc uuid>"]}} any of the values, OR of @> containments
+    {"link": {"$prefix": "s3://bucket/hr/"}}    string prefix on the value (metadata->>'link' LIKE 'prefix%')
+"""
+import json
+from typing import Any, Optional
+
+from sqlalchemy import and_, literal, or_, true
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.elements import ColumnElement
+
+FILTER_OPERATORS = ("$in", "$prefix")
+
+
+def validate_metadata_filter(filter: Optional[dict]) -> None:
+    """ Raise ValueError for filters build_metadata_filter cannot translate. """
+    if filter is None:
+        return
+    if not isinstance(filter, dict):
+        raise ValueError("Metadata filter must be an object")
+    for key, condition in filter.items():
+        if not isinstance(condition, dict):
+            continue
+        if len(condition) != 1 or next(iter(condition)) not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter on '{key}'; expected a value or one of {', '.join(FILTER_OPERATORS)}")
+        operator, value = next(iter(condition.items()))
+        if operator == "$in" and not isinstance(value, list):
+            raise ValueError(f"$in filter on '{key}' must be a list")
+        if operator == "$prefix" and not isinstance(value, str):
+            raise ValueError(f"$prefix filter on '{key}' must be a string")
+
+
+def build_metadata_filter(column, filter: Optional[dict]) -> ColumnElement:
+    """
+    Build the WHERE clause for a metadata filter against a JSONB column.
+    Plain equality conditions are merged into a single @> so Postgres does one GIN lookup.
+    """
+    validate_metadata_filter(filter)
+    if not filter:
+        return true()
+
+    equalities = {}
+    clauses = []
+    for key, condition in filter.items():
+        if not isinstance(condition, dict):
+            equalities[key] = condition
+            continue
+        operator, value = next(iter(condition.items()))
+        if operator == "$in":
+            clauses.append(or_(*[_contains(column, {key: item}) for item in value]) if value else literal(False))
+        else:
+            clauses.append(column[key].astext.like(_escape_like(value) + "%", escape="\\"))
+
+    if equalities:
+        clauses.insert(0, _contains(column, equalities))
+    return and_(*clauses)
+
+
+def matches_metadata_filter(metadata: Optional[dict], filter: Optional[dict]) -> bool:
+    """ Evaluate a filter in Python, with the same semantics as build_metadata_filter. """
+    if not filter:
+        return True
+    metadata = metadata or {}
+    for key, condition in filter.items():
+        if not isinstance(condition, dict):
+            if key not in metadata or not _json_contains(metadata[key], condition):
+                return False
+            continue
+        operator, value = next(iter(condition.items()))
+        if operator == "$in":
+            if key not in metadata or not any(_json_contains(metadata[key], item) for item in value):
+                return False
+        elif not isinstance(metadata.get(key), str) or not metadata[key].startswith(value):
+            return False
+    return True
+
+
+def filter_cache_key(filter: Optional[dict]) -> Optional[str]:
+    """ Stable, hashable representation of a filter for cache signatures. """
+    if not filter:
+        return None
+    return json.dumps(filter, sort_keys=True, default=str)
+
+
+def _contains(column, value: Any) -> ColumnElement:
+    return column.op("@>")(literal(value, type_=JSONB))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _json_contains(value: Any, expected: Any) -> bool:
+    """ JSONB @> for a single value: objects match on a subset of keys, arrays on a subset of elements. """
+    if isinstance(expected, dict):
+        return isinstance(value, dict) and all(
+            key in value and _json_contains(value[key], item) for key, item in expected.items()
+        )
+    if isinstance(expected, list):
+        if not isinstance(value, list):
+            return False
+        return all(any(_json_contains(element, item) for element in value) for item in expected)
+    # Postgres only lets an array contain a bare scalar at the top level, never under a key.
+    if isinstance(value, (dict, list)) or isinstance(value, bool) != isinstance(expected, bool):
+        return False
+    return value == expected
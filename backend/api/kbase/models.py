@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from uuid import UUID, uuid4
 from pydantic import BaseModel, Field
 
@@ -8,18 +8,95 @@ class Chunk(BaseModel):
     content: str
     embeddings: Optional[List[float]] = None
     metadata: Optional[dict] = None
+    # Set on retrieval: raw distance from the kbase's operator, and the equivalent
+    # cosine similarity (embeddings are unit-normalized at ingest).
+    distance: Optional[float] = None
+    score: Optional[float] = None
+    # Set by hybrid search: the chunk's reciprocal-rank fusion score within its kbase.
+    rrf_score: Optional[float] = None
+    # Set by a reranker; scale depends on the reranker.
+    rerank_score: Optional[float] = None
+    # Set by federated search so callers can tell which kbase a chunk came from.
+    kbase_id: Optional[UUID] = None
 
 class Document(BaseModel):
     chunks: List[Chunk]
+    # Where the document came from (e.g. its S3 URI). Chunks are stored with it, so a
+    # re-upload of the same source can replace the previous version.
+    source_uri: Optional[str] = None
 
 class RetrievedChunks(BaseModel):
     chunks: List[Chunk]
 
+class KbaseSearchTiming(BaseModel):
+    kbase_id: UUID
+    elapsed_ms: float
+    num_results: int = 0
+    error: Optional[str] = None
+
+class FederatedRetrievedChunks(RetrievedChunks):
+    # Per-kbase diagnostics; with strategy "any" there is a single combined query.
+    timings: List[KbaseSearchTiming] = []
+    total_ms: Optional[float] = None
+
+class FederatedSearchRequest(BaseModel):
+    kbase_ids: List[UUID] = Field(..., min_length=1)
+    query: str
+    k: int = Field(default=4, ge=1, le=100)
+    mode: Literal["mmr", "similarity", "hybrid"] = "mmr"
+    lambda_: float = Field(default=0.5, ge=0.0, le=1.0)
+    filter: Optional[dict] = None
+    # "fanout": concurrent per-kbase searches (uses each kbase's ANN index);
+    # "any": one exact-scan query with kbase_id = ANY(...).
+    strategy: Literal["fanout", "any"] = "fanout"
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    k: int = Field(default=4, ge=1, le=100)
+    filter: Optional[dict] = None
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    probes: Optional[int] = Field(default=None, ge=1)
+
+class BatchSearchResponse(BaseModel):
+    # One entry per query, in request order.
+    results: List[RetrievedChunks]
+
+# Embedding model used when a kbase does not name one.
+DEFAULT_EMBEDDING_MODELS = {
+    "openai": "text-embedding-3-large",
+    "boto3": "amazon.titan-embed-text-v2:0",
+}
+
+# Output dimension of each known model when no dimensions are requested. A kbase that has not
+# recorded its embedding_dim yet will be indexed at this size.
+NATIVE_EMBEDDING_DIMS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+    "amazon.titan-embed-text-v2:0": 1024,
+    "amazon.titan-embed-text-v1": 1536,
+}
+
 class KnowledgeBase(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     name: str
     description: Optional[str] = None
     account_short_code: Optional[str] = None
+    # Embedder for both ingest and queries, fixed at creation (backend/api/kbase/embedder_registry.py).
+    # embedding_model defaults per provider (DEFAULT_EMBEDDING_MODELS). embedding_dim, if set up
+    # front, is requested from models that can shorten their output; otherwise it is recorded on
+    # first ingest.
+    embedding_provider: Literal["openai", "boto3"] = "openai"
+    embedding_model: Optional[str] = None
+    embedding_dim: Optional[int] = Field(default=None, ge=1)
+    distance_metric: Literal["l2", "cosine", "ip"] = "l2"
+    index_type: Optional[Literal["hnsw", "ivfflat"]] = None
+    index_params: Optional[dict] = None
+    quantization: Optional[Literal["halfvec", "binary"]] = None
+    # "flat" serves searches from an in-process NumPy matrix instead of Postgres (small/medium kbases).
+    vector_backend: Literal["postgres", "flat"] = "postgres"
+    # Maintained by the database (bumped on every chunk write); ignored on create and update.
+    content_version: int = 0
     
     # Change from 'date' to 'datetime'
     created_at: Optional[datetime] = None
@@ -27,4 +104,43 @@ class KnowledgeBase(BaseModel):
 
 
 class KnowledgeBaseList(BaseModel):
-    kbases: List[KnowledgeBase]
\ No newline at end of file
+    kbases: List[KnowledgeBase]
+
+class QuantizationRequest(BaseModel):
+    """ Quantized representation for two-stage search; None turns it off. """
+    quantization: Optional[Literal["halfvec", "binary"]] = None
+    oversample: Optional[int] = Field(default=None, ge=1, le=100)
+
+class RetrievalSettingsRequest(BaseModel):
+    """
+    Relevance cutoffs applied to a kbase's vector and MMR searches; None turns a cutoff off.
+    max_distance is in the units of the kbase's distance metric: results farther than it are
+    dropped. score_gap cuts the results (and the MMR candidate pool) at the first drop in
+    cosine similarity of at least this much between consecutive hits.
+    """
+    max_distance: Optional[float] = None
+    score_gap: Optional[float] = Field(default=None, gt=0.0, le=2.0)
+
+    def to_index_params(self) -> dict:
+        return {"max_distance": self.max_distance, "score_gap": self.score_gap}
+
+class VectorIndexRequest(BaseModel):
+    """
+    ANN index settings for a kbase. Build parameters are only read for the matching index type:
+    m / ef_construction for hnsw, lists for ivfflat. ef_search / probes are the per-query
+    defaults used when a search does not pass its own.
+    """
+    index_type: Literal["hnsw", "ivfflat"] = "hnsw"
+    distance_metric: Optional[Literal["l2", "cosine", "ip"]] = None
+    m: int = Field(default=16, ge=2, le=100)
+    ef_construction: int = Field(default=64, ge=4, le=1000)
+    lists: int = Field(default=100, ge=1, le=32768)
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    probes: Optional[int] = Field(default=None, ge=1, le=32768)
+
+    def to_index_params(self) -> dict:
+        if self.index_type == "hnsw":
+            params = {"m": self.m, "ef_construction": self.ef_construction, "ef_search": self.ef_search}
+        else:
+            params = {"lists": self.lists, "probes": self.probes}
+        return {key: value for key, value in params.items() if value is not None}
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Postgres-backed, content-addressed embedding cache shared by all knowledge bases.
+
+The same text (legal boilerplate, policy headers, a file uploaded into a second kbase) always
+gets the same embedding from the same model, so it is stored once in `embedding_cache`, keyed
+by (model, requested dimensions, sha256(text)), and reused instead of being embedded again.
+Unlike QueryEmbeddingCache (backend/api/kbase/embedding_cache.py) it survives restarts and is
+shared by every process.
+
+CachedEmbedderGateway wraps a provider gateway: embed_texts looks all texts up in one query
+per batch, sends only the misses to the provider, and writes the new vectors back in batched
+INSERT ... ON CONFLICT DO NOTHING statements. Cache failures are logged and fall back to the
+provider, so the cache can never make an ingest fail.
+
+Entries carry last_used_at, and the `vacuum-embedding-cache` CLI command deletes the ones
+that have not been used for a while.
+"""
+import hashlib
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from backend.api.kbase.base_embedder_gateway import BaseEmbedderGateway
+from backend.api.kbase.kbase_schema import EmbeddingCacheORM
+from backend.api.kbase.models import Chunk
+from backend.util.database import async_session_maker
+from backend.util.logging import SetupLogging
+from backend.util.tracing import stage
+
+logger = SetupLogging()
+
+LOOKUP_BATCH_SIZE = 1000
+INSERT_BATCH_SIZE = 500
+# last_used_at is bumped at most this often per entry, so hot entries don't cost a write per hit.
+TOUCH_INTERVAL = literal_column("interval '1 hour'")
+
+VACUUM_SQL = text("""
+    DELETE FROM embedding_cache
+    WHERE ctid IN (
+        SELECT ctid FROM embedding_cache
+        WHERE last_used_at < now() - make_interval(days => :days)
+          AND (CAST(:model AS text) IS NULL OR model = :model)
+        LIMIT :batch_size
+    )
+""")
+
+
+def text_hash(value: str) -> str:
+    """ SHA-256 of the exact text; unlike content_hash nothing is normalized, since embeddings see every character. """
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheStore:
+    """ Bulk access to the embedding_cache table, each operation on its own pooled session. """
+    def __init__(self, session_factory: Callable = async_session_maker):
+        self.session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.errors = 0
+
+    async def lookup(self, model: str, dimensions: int, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """ Cached vectors for the given text hashes; missing hashes are absent from the result. """
+        hashes = list(dict.fromkeys(hashes))
+        table = EmbeddingCacheORM.__table__
+        found: Dict[str, List[float]] = {}
+        try:
+            async with self.session_factory() as session:
+                for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+                    batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+                    key = (table.c.model == model, table.c.dimensions == dimensions)
+                    result = await session.execute(
+                        select(table.c.text_hash, table.c.embedding).where(*key, table.c.text_hash.in_(batch))
+                    )
+                    rows = result.all()
+                    found.update((row.text_hash, row.embedding.tolist()) for row in rows)
+                    if rows:
+                        # Rows another transaction is touching are skipped rather than waited for.
+                        stale = (
+                            select(table.c.text_hash)
+                            .where(
+                                *key,
+                                table.c.text_hash.in_([row.text_hash for row in rows]),
+                                table.c.last_used_at < func.now() - TOUCH_INTERVAL,
+                            )
+                            .with_for_update(skip_locked=True)
+                        )
+                        await session.execute(
+                            update(table)
+                            .where(*key, table.c.text_hash.in_(stale))
+                            .values(last_used_at=func.now())
+                        )
+                await session.commit()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Embedding cache lookup failed, embedding without it: {str(e)}")
+            found = {}
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    async def store(self, model: str, dimensions: int, vectors: Dict[str, List[float]]) -> None:
+        """ Insert new entries; entries that already exist (e.g. written concurrently) are left alone. """
+        if not vectors:
+            return
+        rows = [
+            {"model": model, "dimensions": dimensions, "text_hash": digest, "embedding": vector}
+            for digest, vector in vectors.items()
+        ]
+        try:
+            async with self.session_factory() as session:
+                for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                    await session.execute(
+                        pg_insert(EmbeddingCacheORM.__table__)
+                        .values(rows[start:start + INSERT_BATCH_SIZE])
+                        .on_conflict_do_nothing()
+                    )
+                await session.commit()
+            self.stored += len(rows)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not write {len(rows)} embeddings to the embedding cache: {str(e)}")
+
+    async def vacuum(self, unused_days: int, model: Optional[str] = None, batch_size: int = 10_000) -> int:
+        """
+        Delete entries not used for unused_days days (of one model, if given) and return how many
+        were deleted. Deletes in batches, each in its own transaction, so locks stay short.
+        """
+        deleted = 0
+        async with self.session_factory() as session:
+            while True:
+                result = await session.execute(VACUUM_SQL, {"days": unused_days, "model": model, "batch_size": batch_size})
+                await session.commit()
+                deleted += result.rowcount
+                if result.rowcount < batch_size:
+                    break
+        logger.info(f"Vacuumed {deleted} embedding cache entries unused for {unused_days} days")
+        return deleted
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Singleton instance
+embedding_cache_store = EmbeddingCacheStore()
+
+
+class CachedEmbedderGateway(BaseEmbedderGateway):
+    """
+    Embedder gateway that serves chunk embeddings from the embedding_cache table and embeds
+    only the misses with the wrapped gateway. Queries are passed straight through; they are
+    cached in memory by QueryEmbeddingCache.
+    """
+    def __init__(
+        self,
+        embedder: BaseEmbedderGateway,
+        model: str,
+        dimensions: Optional[int] = None,
+        cache: EmbeddingCacheStore = embedding_cache_store,
+    ):
+        self.embedder = embedder
+        self.model = model
+        self.dimensions = dimensions or 0
+        self.cache = cache
+
+    async def embed_text(self, chunk: Chunk) -> Chunk:
+        await self.embed_texts([chunk])
+        return chunk
+
+    async def embed_texts(self, chunks: list[Chunk]) -> list[Chunk]:
+        hashes = [text_hash(chunk.content) for chunk in chunks]
+        with stage("embedding_cache_lookup"):
+            vectors = await self.cache.lookup(self.model, self.dimensions, hashes)
+
+        # Texts repeated within the batch are embedded once.
+        misses: Dict[str, Chunk] = {}
+        for chunk, digest in zip(chunks, hashes):
+            if digest not in vectors and digest not in misses:
+                misses[digest] = chunk
+        if misses:
+            await self.embedder.embed_texts(list(misses.values()))
+            new_vectors = {digest: chunk.embeddings for digest, chunk in misses.items()}
+            await self.cache.store(self.model, self.dimensions, new_vectors)
+            vectors.update(new_vectors)
+
+        for chunk, digest in zip(chunks, hashes):
+            chunk.embeddings = vectors[digest]
+        logger.info(
+            f"Embedded {len(chunks)} chunks with {len(misses)} provider embeddings "
+            f"(the rest from the embedding cache or repeated text)"
+        )
+        return chunks
+
+    async def embed_query(self, query: str) -> list[float]:
+        return await self.embedder.embed_query(query)
+
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        return await self.embedder.embed_queries(queries)
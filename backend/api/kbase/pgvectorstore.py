@@ -1,88 +1,724 @@
 import uuid
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from asyncpg import BitString
+from pgvector.sqlalchemy import HALFVEC, Vector
+from sqlalchemy import Float, Text, bindparam, cast, column, func, literal_column, text, true, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.future import select
-from backend.api.kbase.kbase_schema import KbaseDocumentORM
-from backend.api.kbase.models import Document, Chunk, RetrievedChunks
-from backend.api.kbase.math_helpers import mmr
+from backend.api.kbase.kbase_schema import KbaseDocumentORM, KbaseDocumentSourceORM, KnowledgeBaseORM
+from backend.api.kbase.base_vector_store import BaseVectorStore
+from backend.api.kbase.models import Document, Chunk, RetrievedChunks, KnowledgeBase
+from backend.api.kbase.math_helpers import mmr, normalize_vector, distance_to_similarity, binary_quantize, relevance_cutoff
+from backend.api.kbase.retrieval_cache import retrieval_cache
+from backend.api.kbase.content_hash import content_hash
+from backend.api.kbase.bulk_copy import DEFAULT_COPY_BATCH_SIZE, copy_kbase_documents, metadata_json
+from backend.util.tracing import stage
+from backend.api.kbase.metadata_filter import build_metadata_filter, filter_cache_key, validate_metadata_filter
+from backend.api.kbase.vector_index import (
+    DEFAULT_OVERSAMPLE,
+    DISTANCE_OPERATORS,
+    QUANTIZATIONS,
+    embedding_expression,
+    quantized_distance,
+)
 
-class PostgresVectorStore:
-    __slots__ = ("session", "kbase_id", "orm_model")
-    def __init__(self, session: AsyncSession, kbase_id: uuid.UUID):
+# pgvector's defaults, set explicitly when a search does not ask for a value (see _apply_search_params).
+HNSW_DEFAULT_EF_SEARCH = 40
+IVFFLAT_DEFAULT_PROBES = 1
+
+# Iterative index scans (hnsw/ivfflat.iterative_scan) keep scanning the index until enough rows
+# pass the WHERE clause; without them a filtered ANN search can return fewer than k rows.
+ITERATIVE_SCAN_MIN_VERSION = (0, 8)
+_pgvector_version: Optional[tuple] = None
+
+# Must match the expression of the generated kbase_documents.content_tsv column.
+TEXT_SEARCH_CONFIG = "english"
+
+class PostgresVectorStore(BaseVectorStore):
+    __slots__ = (
+        "session",
+        "kbase_id",
+        "orm_model",
+        "embedding_dim",
+        "distance_metric",
+        "index_type",
+        "index_params",
+        "quantization",
+        "content_version",
+    )
+    def __init__(
+        self,
+        session: AsyncSession,
+        kbase_id: uuid.UUID,
+        embedding_dim: Optional[int] = None,
+        distance_metric: str = "l2",
+        index_type: Optional[str] = None,
+        index_params: Optional[dict] = None,
+        quantization: Optional[str] = None,
+        content_version: Optional[int] = None,
+    ):
         """
         Args:
             session (AsyncSession): An async SQLAlchemy session.
             kbase_id (uuid.UUID): The knowledge base identifier. All documents added will be associated with this KB.
-            orm_model (type): The ORM model class to use. Defaults to KbaseDocumentORM.
+            embedding_dim (int): Embedding dimension of the kbase; required for indexed search.
+            distance_metric (str): "l2", "cosine" or "ip"; must match the operator class of the kbase's index.
+                Embeddings are unit-normalized on the way in, so all three rank identically.
+            index_type (str): "hnsw", "ivfflat" or None for an exact scan.
+            index_params (dict): Index settings; "ef_search" / "probes" are used as per-query defaults,
+                "oversample" sets the coarse candidate multiplier for quantized search and
+                "max_distance" / "score_gap" are the default relevance cutoffs (see relevance_cutoff).
+            quantization (str): "halfvec" or "binary" to search a quantized copy first and
+                rerank the oversampled candidates with full-precision vectors; None for single-stage.
+            content_version (int): The kbase's content_version when it was read; part of retrieval
+                cache signatures, so a write made by any process makes earlier results miss.
         """
+        if distance_metric not in DISTANCE_OPERATORS:
+            raise ValueError(f"Unsupported distance metric: {distance_metric}")
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
         self.session = session
         self.kbase_id = kbase_id
         self.orm_model = KbaseDocumentORM
+        self.embedding_dim = embedding_dim
+        self.distance_metric = distance_metric
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.quantization = quantization
+        self.content_version = content_version
 
-    async def add_document(self, document: Document) -> None:
+    @classmethod
+    def from_kbase(cls, session: AsyncSession, kbase: KnowledgeBase) -> "PostgresVectorStore":
+        """ Build a vector store that honours the kbase's vector settings. """
+        return cls(
+            session=session,
+            kbase_id=kbase.id,
+            embedding_dim=kbase.embedding_dim,
+            distance_metric=kbase.distance_metric,
+            index_type=kbase.index_type,
+            index_params=kbase.index_params,
+            quantization=kbase.quantization,
+            content_version=kbase.content_version,
+        )
+
+    async def add_document(
+        self,
+        document: Document,
+        batch_size: Optional[int] = None,
+        replace_ids: Optional[List[uuid.UUID]] = None,
+        source_hashes: Optional[List[str]] = None,
+    ) -> int:
         """
-        Insert a document into the vector store.
+        Insert a document into the vector store and return the number of chunks stored.
         The document is a collection of chunks (each with an embedding).
+        Embeddings are stored unit-normalized so that inner product equals cosine similarity.
+
+        Rows are streamed with binary COPY in batches of batch_size (KBASE_COPY_BATCH_SIZE by default),
+        in one transaction per document. See add_document_orm for the unit-of-work path.
+        Chunks whose content is already in the kbase (same content hash) are skipped.
+        With source_hashes (the content hashes of the whole new version of document.source_uri,
+        including chunks not passed because they are already stored), the kbase_document_sources
+        entries of the source are replaced in the same transaction. Chunks with replace_ids are
+        deleted there too, unless another source still contains their content (see
+        backend/api/index/chunk_diff.py).
+        """
+        self._validate_chunks(document)
+        if source_hashes is not None and not document.source_uri:
+            raise ValueError("source_hashes requires the document's source_uri")
+
+        def rows():
+            for chunk in document.chunks:
+                embedding = np.asarray(normalize_vector(chunk.embeddings), dtype=np.float32)
+                yield (
+                    chunk.id,
+                    self.kbase_id,
+                    document.source_uri,
+                    chunk.content,
+                    content_hash(chunk.content),
+                    metadata_json(chunk.metadata),
+                    embedding,
+                    embedding if self.quantization == "halfvec" else None,
+                    BitString(binary_quantize(embedding)) if self.quantization == "binary" else None,
+                )
+
+        stored = await copy_kbase_documents(
+            rows(),
+            batch_size=batch_size or DEFAULT_COPY_BATCH_SIZE,
+            skip_duplicates=True,
+            delete_ids=replace_ids,
+            source=(document.source_uri, source_hashes) if source_hashes is not None else None,
+            kbase_id=self.kbase_id,
+        )
+        retrieval_cache.invalidate(self.kbase_id)
+        return stored
+
+    async def add_document_orm(self, document: Document) -> int:
         """
+        Insert a document through the ORM session (one object per chunk, committed together).
+        Slower than add_document for large documents; kept as a reference and for callers
+        that need the insert to share the session's transaction. Duplicate content is not
+        skipped here: it fails the commit on the (kbase_id, content_hash) constraint.
+        """
+        self._validate_chunks(document)
         orm_objects = []
         for chunk in document.chunks:
-            if chunk.embeddings is None:
-                raise ValueError("Chunk must have embeddings")
+            embedding = normalize_vector(chunk.embeddings)
             orm_obj = self.orm_model(
                 id=chunk.id,
                 kbase_id=self.kbase_id,
+                source_uri=document.source_uri,
                 content=chunk.content,
-                embedding=chunk.embeddings  # Uses the embedding dimension as defined in the schema.
+                content_hash=content_hash(chunk.content),
+                embedding=embedding,
+                chunk_metadata=chunk.metadata,
             )
+            if self.quantization == "halfvec":
+                orm_obj.embedding_half = embedding
+            elif self.quantization == "binary":
+                orm_obj.embedding_bq = binary_quantize(embedding)
             orm_objects.append(orm_obj)
         self.session.add_all(orm_objects)
+        await self.session.execute(
+            update(KnowledgeBaseORM)
+            .where(KnowledgeBaseORM.id == self.kbase_id)
+            .values(content_version=KnowledgeBaseORM.content_version + 1)
+        )
+        await self.session.commit()
+        retrieval_cache.invalidate(self.kbase_id)
+        return len(orm_objects)
+
+    async def existing_content_hashes(self, hashes: List[str]) -> Set[str]:
+        """ The subset of the given content hashes already stored in this kbase. """
+        if not hashes:
+            return set()
+        stmt = select(self.orm_model.content_hash).where(
+            self.orm_model.kbase_id == self.kbase_id,
+            self.orm_model.content_hash.in_(set(hashes)),
+        )
+        return set((await self.session.execute(stmt)).scalars())
+
+    async def source_content_hashes(self, source_uri: str) -> Set[str]:
+        """
+        Content hashes the source document contained when it was last indexed, whether its chunks
+        were stored for it or deduplicated against rows of other sources.
+        """
+        sources = KbaseDocumentSourceORM
+        stmt = select(sources.content_hash).where(sources.kbase_id == self.kbase_id, sources.source_uri == source_uri)
+        return set((await self.session.execute(stmt)).scalars())
+
+    async def hashes_in_other_sources(self, hashes: Set[str], source_uri: str) -> Set[str]:
+        """ The subset of the given content hashes that sources other than source_uri contain. """
+        if not hashes:
+            return set()
+        sources = KbaseDocumentSourceORM
+        stmt = select(sources.content_hash).distinct().where(
+            sources.kbase_id == self.kbase_id,
+            sources.source_uri != source_uri,
+            sources.content_hash.in_(hashes),
+        )
+        return set((await self.session.execute(stmt)).scalars())
+
+    async def chunk_ids_by_hash(self, hashes: Set[str]) -> List[uuid.UUID]:
+        """ Ids of the stored chunks with the given content hashes, whichever source stored them. """
+        if not hashes:
+            return []
+        stmt = select(self.orm_model.id).where(
+            self.orm_model.kbase_id == self.kbase_id,
+            self.orm_model.content_hash.in_(hashes),
+        )
+        return list((await self.session.execute(stmt)).scalars())
+
+    async def backfill_sources(self) -> int:
+        """
+        Record every stored chunk as contained in the source it was stored for (after a bulk load
+        that bypassed add_document's source bookkeeping, e.g. a snapshot import).
+        """
+        result = await self.session.execute(
+            text("""
+                INSERT INTO kbase_document_sources (kbase_id, source_uri, content_hash)
+                SELECT kbase_id, source_uri, content_hash FROM kbase_documents
+                WHERE kbase_id = :kbase_id AND source_uri IS NOT NULL AND content_hash IS NOT NULL
+                ON CONFLICT DO NOTHING
+            """),
+            {"kbase_id": self.kbase_id},
+        )
+        await self.session.commit()
+        return result.rowcount
+
+    async def delete_unsourced_chunks(self, dry_run: bool = False) -> int:
+        """
+        Delete chunks that belong to no source document: rows stored before chunk metadata
+        existed (migration 016) have no source_uri and no kbase_document_sources entry, so
+        re-uploading their document can neither replace nor delete them. Run it after the
+        kbase's documents have been re-uploaded: rows whose content a re-uploaded source still
+        contains were adopted by that source and are kept. Returns the number of rows deleted
+        (or that would be, with dry_run).
+        """
+        table = self.orm_model.__table__
+        sources = KbaseDocumentSourceORM.__table__
+        referenced = (
+            select(sources.c.content_hash)
+            .where(sources.c.kbase_id == table.c.kbase_id, sources.c.content_hash == table.c.content_hash)
+            .exists()
+        )
+        condition = (table.c.kbase_id == self.kbase_id) & table.c.source_uri.is_(None) & ~referenced
+        if dry_run:
+            return (await self.session.execute(select(func.count()).select_from(table).where(condition))).scalar_one()
+        result = await self.session.execute(table.delete().where(condition))
+        if result.rowcount:
+            await self.session.execute(
+                update(KnowledgeBaseORM)
+                .where(KnowledgeBaseORM.id == self.kbase_id)
+                .values(content_version=KnowledgeBaseORM.content_version + 1)
+            )
         await self.session.commit()
+        retrieval_cache.invalidate(self.kbase_id)
+        return result.rowcount
 
-    async def similarity_search_by_vector(self, query_embedding: List[float], k: int = 4) -> RetrievedChunks:
+    def _validate_chunks(self, document: Document) -> None:
+        for chunk in document.chunks:
+            if chunk.embeddings is None:
+                raise ValueError("Chunk must have embeddings")
+            if self.embedding_dim and len(chunk.embeddings) != self.embedding_dim:
+                raise ValueError(
+                    f"Chunk embedding has {len(chunk.embeddings)} dimensions, kbase expects {self.embedding_dim}"
+                )
+
+    async def similarity_search_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        include_embeddings: bool = False,
+        filter: Optional[dict] = None,
+        use_cache: bool = True,
+        max_distance: Optional[float] = None,
+        score_gap: Optional[float] = None,
+    ) -> RetrievedChunks:
         """
-        Perform a similarity search using the vector distance operator (<->).
-        Returns a RetrievedChunks object with the top k similar chunks.
+        Perform a similarity search using the kbase's distance operator.
+        Returns a RetrievedChunks object with the top k similar chunks,
+        each carrying its distance and cosine-similarity score.
+
+        Only id, content and distance are fetched by default; pass include_embeddings=True
+        if the caller needs the vectors (each one is 4-12 KB on the wire and to decode).
+        ef_search / probes tune the HNSW / IVFFlat index for this search (see _apply_search_params).
+        filter restricts the search to chunks whose metadata matches (see metadata_filter), inside the SQL.
+        With use_cache, a near-identical earlier query on this kbase is answered from the retrieval cache.
+        max_distance / score_gap (the kbase's settings by default) drop weak hits, so fewer than k
+        chunks, or none, may be returned.
         """
+        validate_metadata_filter(filter)
+        max_distance, score_gap = self._relevance_cutoffs(max_distance, score_gap)
+        signature = ("similarity", k, ef_search, probes, include_embeddings, filter_cache_key(filter), max_distance, score_gap, *self._search_settings())
+        if use_cache:
+            cached = retrieval_cache.get(self.kbase_id, signature, query_embedding)
+            if cached is not None:
+                return cached
+        generation = retrieval_cache.generation(self.kbase_id)
+
+        rows = await self._search(query_embedding, k, ef_search, probes, include_embeddings, filter)
+        chunks = [self._to_chunk(row, include_embeddings) for row in rows]
+        keep = relevance_cutoff([chunk.distance for chunk in chunks], [chunk.score for chunk in chunks], max_distance, score_gap)
+        result = RetrievedChunks(chunks=chunks[:keep])
+        if use_cache:
+            retrieval_cache.put(self.kbase_id, signature, query_embedding, result, generation)
+        return result
+
+    async def batch_similarity_search(
+        self,
+        query_embeddings: List[List[float]],
+        k: int = 4,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[dict] = None,
+    ) -> List[RetrievedChunks]:
+        """
+        Run many similarity searches in one SQL statement and one round trip.
+
+        The query vectors are sent as a single vector[] parameter, unnested WITH ORDINALITY,
+        and each one drives a LATERAL top-k subquery (the same single- or two-stage search as
+        similarity_search_by_vector, so the ANN index is used per query).
+        Returns one RetrievedChunks per query, in input order. Results are not cached.
+        """
+        if not query_embeddings:
+            return []
+        validate_metadata_filter(filter)
+        for query_embedding in query_embeddings:
+            if self.embedding_dim and len(query_embedding) != self.embedding_dim:
+                raise ValueError(
+                    f"Query embedding has {len(query_embedding)} dimensions, kbase expects {self.embedding_dim}"
+                )
+
+        indexed, n_coarse, kbase_filter = await self._prepare_search(k, ef_search, probes, filter)
+        # One text parameter in Postgres array-literal form, cast to vector[]; avoids needing
+        # a vector[] codec on the driver.
+        queries_literal = "{" + ",".join(
+            '"[' + ",".join(repr(float(x)) for x in normalize_vector(query_embedding)) + ']"'
+            for query_embedding in query_embeddings
+        ) + "}"
+        queries = (
+            func.unnest(cast(bindparam("queries", queries_literal, type_=Text), ARRAY(Vector)))
+            .table_valued(column("q", Vector), with_ordinality="ord")
+            .render_derived(name="queries")
+        )
+        hits = self._vector_search_select(queries.c.q, k, n_coarse, kbase_filter, indexed, False).lateral("hits")
         stmt = (
-            select(self.orm_model)
-            .where(self.orm_model.kbase_id == self.kbase_id)
-            .order_by(self.orm_model.embedding.op("<->")(query_embedding))
-            .limit(k)
+            select(queries.c.ord, hits.c.id, hits.c.content, hits.c.metadata, hits.c.distance)
+            .select_from(queries.join(hits, true()))
+            .order_by(queries.c.ord, hits.c.distance)
         )
-        result = await self.session.execute(stmt)
-        rows = result.scalars().all()
-        chunks = [
-            Chunk(id=row.id, content=row.content, embeddings=row.embedding)
-            for row in rows
-        ]
-        return RetrievedChunks(chunks=chunks)
+        with stage("batch_search"):
+            result = await self.session.execute(stmt)
 
-    async def mmr_by_vector(self, query_embedding: List[float], k: int = 4, lambda_: float = 0.5) -> RetrievedChunks:
+        results = [RetrievedChunks(chunks=[]) for _ in query_embeddings]
+        for row in result.all():
+            results[row.ord - 1].chunks.append(self._to_chunk(row))
+        return results
+
+    async def mmr_by_vector(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        lambda_: float = 0.5,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[dict] = None,
+        use_cache: bool = True,
+        max_distance: Optional[float] = None,
+        score_gap: Optional[float] = None,
+    ) -> RetrievedChunks:
         """
         Perform a search using max marginal relevance (MMR) to re-rank the candidate documents.
-        
+
         The method first retrieves a larger candidate set (10*k candidates), then uses the MMR formula
-        to select k results that balance relevance and diversity.
-        
+        to select k results that balance relevance and diversity. The candidate pool is first cut
+        with the relevance cutoffs; if no more than k candidates are left, they are returned as they
+        are and MMR is skipped.
+
         Args:
             query_embedding (List[float]): The query embedding.
             k (int): Number of documents to return.
             lambda_ (float): Trade-off parameter between relevance and diversity.
-            
+            ef_search (int): HNSW ef_search for this search; should be at least the candidate count.
+            probes (int): IVFFlat probes for this search.
+            filter (dict): Only consider chunks whose metadata matches this filter.
+            use_cache (bool): Serve near-identical earlier queries on this kbase from the retrieval cache,
+                skipping both the database round trip and the MMR computation.
+            max_distance (float): Drop candidates farther than this; the kbase's setting by default.
+            score_gap (float): Cut the candidates at the first similarity drop this large; the kbase's setting by default.
+
         Returns:
             RetrievedChunks: A Pydantic model containing a list of Chunk objects.
         """
+        validate_metadata_filter(filter)
+        max_distance, score_gap = self._relevance_cutoffs(max_distance, score_gap)
+        signature = ("mmr", k, lambda_, ef_search, probes, filter_cache_key(filter), max_distance, score_gap, *self._search_settings())
+        if use_cache:
+            cached = retrieval_cache.get(self.kbase_id, signature, query_embedding)
+            if cached is not None:
+                return cached
+        generation = retrieval_cache.generation(self.kbase_id)
+
         n_candidates = max(k * 10, k)
-        stmt = (
-            select(self.orm_model)
-            .where(self.orm_model.kbase_id == self.kbase_id)
-            .order_by(self.orm_model.embedding.op("<->")(query_embedding))
+        rows = await self._search(query_embedding, n_candidates, ef_search, probes, include_embeddings=True, filter=filter)
+        # The vectors are only needed for the diversity term; keep them off the returned chunks.
+        candidate_chunks = [self._to_chunk(row) for row in rows]
+        keep = relevance_cutoff(
+            [chunk.distance for chunk in candidate_chunks], [chunk.score for chunk in candidate_chunks], max_distance, score_gap
+        )
+        candidate_chunks = candidate_chunks[:keep]
+        candidate_vectors = [row.embedding for row in rows[:keep]]
+
+        if len(candidate_chunks) <= k:
+            selected_chunks = candidate_chunks
+        else:
+            # Reuse the database's scores rather than recomputing query similarity in Python.
+            with stage("mmr"):
+                selected_chunks = mmr(
+                    query_embedding,
+                    candidate_vectors,
+                    candidate_chunks,
+                    k,
+                    lambda_,
+                    query_similarities=[chunk.score for chunk in candidate_chunks],
+                )
+        result = RetrievedChunks(chunks=selected_chunks)
+        if use_cache:
+            retrieval_cache.put(self.kbase_id, signature, query_embedding, result, generation)
+        return result
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        k: int = 4,
+        n_candidates: Optional[int] = None,
+        rrf_k: int = 60,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[dict] = None,
+    ) -> RetrievedChunks:
+        """
+        Hybrid lexical + vector search fused with reciprocal-rank fusion (RRF), in one round trip.
+
+        The vector side is the regular (indexed / quantized) vector search; the lexical side is a
+        full-text match of websearch_to_tsquery(query_text) against the GIN-indexed content_tsv
+        column, ranked by ts_rank_cd. Each side contributes its top n_candidates (default 10*k)
+        and a chunk's fused score is sum(1 / (rrf_k + rank)) over the sides it appears in.
+
+        Chunks carry their fused score as rrf_score; chunks found only by the lexical side have
+        no distance / score. filter applies to both sides.
+        """
+        n_candidates = n_candidates or max(k * 10, k)
+        table = self.orm_model.__table__
+
+        vector_hits = (
+            await self._build_search_stmt(query_embedding, n_candidates, ef_search, probes, filter=filter)
+        ).subquery("vector_hits")
+        vector_ranked = select(
+            vector_hits.c.id,
+            vector_hits.c.distance,
+            func.row_number().over(order_by=vector_hits.c.distance).label("rank"),
+        ).cte("vector_ranked")
+
+        ts_query = func.websearch_to_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'"), query_text)
+        text_rank = func.ts_rank_cd(table.c.content_tsv, ts_query)
+        text_hits = (
+            select(table.c.id, text_rank.label("text_rank"))
+            .where(
+                table.c.kbase_id == self.kbase_id,
+                table.c.content_tsv.op("@@")(ts_query),
+                build_metadata_filter(table.c.metadata, filter),
+            )
+            .order_by(text_rank.desc())
             .limit(n_candidates)
+            .subquery("text_hits")
         )
-        result = await self.session.execute(stmt)
-        rows = result.scalars().all()
-        candidate_chunks = [Chunk(id=row.id, content=row.content, embeddings=row.embedding) for row in rows]
-        candidate_vectors = [chunk.embeddings for chunk in candidate_chunks]
-        
-        selected_chunks = mmr(query_embedding, candidate_vectors, candidate_chunks, k, lambda_)
-        return RetrievedChunks(chunks=selected_chunks)
+        text_ranked = select(
+            text_hits.c.id,
+            func.row_number().over(order_by=text_hits.c.text_rank.desc()).label("rank"),
+        ).cte("text_ranked")
+
+        fused_id = func.coalesce(vector_ranked.c.id, text_ranked.c.id)
+        rrf_score = (
+            func.coalesce(1.0 / (rrf_k + vector_ranked.c.rank), 0.0)
+            + func.coalesce(1.0 / (rrf_k + text_ranked.c.rank), 0.0)
+        ).label("rrf_score")
+        fused = (
+            select(fused_id.label("id"), vector_ranked.c.distance, rrf_score)
+            .select_from(vector_ranked.join(text_ranked, vector_ranked.c.id == text_ranked.c.id, full=True))
+            .order_by(rrf_score.desc())
+            .limit(k)
+            .subquery("fused")
+        )
+        stmt = (
+            select(table.c.id, table.c.content, table.c.metadata, fused.c.distance, fused.c.rrf_score)
+            .join(fused, fused.c.id == table.c.id)
+            .order_by(fused.c.rrf_score.desc())
+        )
+        with stage("hybrid_search"):
+            result = await self.session.execute(stmt)
+        return RetrievedChunks(
+            chunks=[self._to_chunk(row).model_copy(update={"rrf_score": row.rrf_score}) for row in result.all()]
+        )
+
+    async def backfill_quantized(self, batch_size: int = 1000) -> int:
+        """
+        Populate the quantized column for rows ingested before quantization was enabled.
+        Works in batches with a commit after each, so it can run against a live kbase.
+        Returns the number of rows updated.
+        """
+        if not self.quantization:
+            raise ValueError("Quantization is not enabled for this kbase")
+        table = self.orm_model.__table__
+        if self.quantization == "halfvec":
+            column, value = table.c.embedding_half, cast(table.c.embedding, HALFVEC)
+        else:
+            column, value = table.c.embedding_bq, func.binary_quantize(table.c.embedding)
+
+        total = 0
+        while True:
+            batch = (
+                select(table.c.id)
+                .where(table.c.kbase_id == self.kbase_id, column.is_(None))
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = await self.session.execute(
+                update(table).where(table.c.id.in_(batch)).values({column: value})
+            )
+            await self.session.commit()
+            if not result.rowcount:
+                return total
+            total += result.rowcount
+
+    def _search_settings(self) -> Tuple[str, Optional[str], Optional[int]]:
+        """
+        Kbase state that changes results, part of every retrieval cache signature. Writes and
+        reconfigures invalidate this process's cache; other processes see the new settings and
+        content_version here, so their older entries no longer match.
+        """
+        return self.distance_metric, self.quantization, self.content_version
+
+    def _relevance_cutoffs(self, max_distance: Optional[float], score_gap: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+        """ The given cutoffs, falling back to the kbase's settings. """
+        if max_distance is None:
+            max_distance = self.index_params.get("max_distance")
+        if score_gap is None:
+            score_gap = self.index_params.get("score_gap")
+        return max_distance, score_gap
+
+    async def _search(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        include_embeddings: bool = False,
+        filter: Optional[dict] = None,
+    ):
+        """
+        Run the vector search as a column-projected Core query.
+        Rows are plain tuples (no ORM identity map) with id, content, metadata, distance and optionally embedding.
+        """
+        with stage("vector_search"):
+            stmt = await self._build_search_stmt(query_embedding, limit, ef_search, probes, include_embeddings, filter)
+            result = await self.session.execute(stmt)
+            rows = result.all()
+        if filter and self.index_type == "ivfflat" and not self.quantization:
+            # IVFFlat iterative scans only support relaxed ordering.
+            rows.sort(key=lambda row: row.distance)
+        return rows
+
+    async def _build_search_stmt(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        include_embeddings: bool = False,
+        filter: Optional[dict] = None,
+    ) -> Select:
+        """
+        Build the vector search statement (and apply index search parameters to the transaction).
+
+        For quantized kbases this is two-stage in one statement: an (indexed) coarse search
+        over the quantized column picks limit * oversample candidates, and the outer query
+        reranks them by exact full-precision distance.
+
+        A metadata filter is part of the WHERE clause of the (coarse) index scan, with iterative
+        index scans enabled where pgvector supports them so the filter cannot starve the result.
+        """
+        indexed, n_coarse, kbase_filter = await self._prepare_search(limit, ef_search, probes, filter)
+        return self._vector_search_select(
+            normalize_vector(query_embedding), limit, n_coarse, kbase_filter, indexed, include_embeddings
+        )
+
+    async def _prepare_search(self, limit: int, ef_search: Optional[int], probes: Optional[int], filter: Optional[dict]):
+        """
+        Work out whether the ANN index is used and how many coarse candidates to fetch,
+        apply index search parameters, and build the WHERE clause for this kbase.
+        """
+        table = self.orm_model.__table__
+        indexed = self.index_type is not None and bool(self.embedding_dim)
+        n_coarse = limit
+        if self.quantization:
+            oversample = self.index_params.get("oversample") or DEFAULT_OVERSAMPLE[self.quantization]
+            n_coarse = limit * int(oversample)
+        if indexed:
+            await self._apply_search_params(ef_search, probes, n_coarse, filtered=bool(filter))
+            # A partial index is only usable when the planner can see the kbase_id value,
+            # so inline it rather than sending it as a (generic-plan) bind parameter.
+            kbase_filter = table.c.kbase_id == bindparam(
+                "kbase_id", self.kbase_id, type_=table.c.kbase_id.type, literal_execute=True
+            )
+        else:
+            kbase_filter = table.c.kbase_id == self.kbase_id
+        if filter:
+            kbase_filter = kbase_filter & build_metadata_filter(table.c.metadata, filter)
+        return indexed, n_coarse, kbase_filter
+
+    def _vector_search_select(self, query, limit: int, n_coarse: int, kbase_filter, indexed: bool, include_embeddings: bool) -> Select:
+        """
+        The (optionally two-stage) top-`limit` select for one query.
+        query is a normalized list of floats, or a SQL vector expression when used inside a LATERAL join.
+        """
+        table = self.orm_model.__table__
+        operator = DISTANCE_OPERATORS[self.distance_metric]
+        if self.quantization:
+            coarse_distance = quantized_distance(
+                table, query, self.embedding_dim, self.quantization, self.distance_metric, indexed
+            )
+            source = (
+                select(table.c.id, table.c.content, table.c.metadata, table.c.embedding)
+                .where(kbase_filter)
+                .order_by(coarse_distance)
+                .limit(n_coarse)
+                .subquery("coarse")
+            )
+            distance = source.c.embedding.op(operator, return_type=Float)(query)
+        else:
+            source = table
+            embedding = embedding_expression(table.c.embedding, self.embedding_dim, indexed)
+            if isinstance(query, ColumnElement):
+                # Both sides of the operator must be the type the index was built on.
+                query = embedding_expression(query, self.embedding_dim, indexed)
+            distance = embedding.op(operator, return_type=Float)(query)
+
+        columns = [source.c.id, source.c.content, source.c.metadata, distance.label("distance")]
+        if include_embeddings:
+            columns.append(source.c.embedding)
+        stmt = select(*columns).order_by(distance).limit(limit)
+        if source is table:
+            stmt = stmt.where(kbase_filter)
+        return stmt
+
+    def _to_chunk(self, row, include_embeddings: bool = False) -> Chunk:
+        return Chunk(
+            id=row.id,
+            content=row.content,
+            embeddings=row.embedding if include_embeddings else None,
+            metadata=row.metadata,
+            distance=row.distance,
+            score=distance_to_similarity(row.distance, self.distance_metric) if row.distance is not None else None,
+        )
+
+    async def _apply_search_params(self, ef_search: Optional[int], probes: Optional[int], limit: int, filtered: bool = False) -> None:
+        """
+        Set the index search parameters with set_config(..., is_local=true), in one round trip.
+
+        Local settings last until the end of the session's current transaction, not just the
+        next statement, so every search sets all of them (pgvector's defaults where it asks for
+        nothing): a search never runs with the ef_search, probes or iterative scan mode of an
+        earlier search in the same transaction. Other statements ignore these settings.
+        Filtered searches enable iterative index scans on pgvector >= 0.8.
+        """
+        settings = {}
+        if await self._supports_iterative_scan():
+            # HNSW can keep exact ordering; IVFFlat only supports relaxed ordering (re-sorted in _search).
+            order = "strict_order" if self.index_type == "hnsw" else "relaxed_order"
+            settings[f"{self.index_type}.iterative_scan"] = order if filtered else "off"
+        if self.index_type == "hnsw":
+            value = ef_search or self.index_params.get("ef_search") or HNSW_DEFAULT_EF_SEARCH
+            # An HNSW scan returns at most ef_search rows, so raise it to the limit.
+            settings["hnsw.ef_search"] = max(int(value), limit)
+        else:
+            settings["ivfflat.probes"] = int(probes or self.index_params.get("probes") or IVFFLAT_DEFAULT_PROBES)
+        await self.session.execute(
+            select(*[func.set_config(setting, str(value), True) for setting, value in settings.items()])
+        )
+
+    async def _supports_iterative_scan(self) -> bool:
+        """ Whether the installed pgvector has iterative index scans; looked up once per process. """
+        global _pgvector_version
+        if _pgvector_version is None:
+            result = await self.session.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+            version = result.scalar() or "0"
+            _pgvector_version = tuple(int(part) for part in version.split(".")[:2] if part.isdigit())
+        return _pgvector_version >= ITERATIVE_SCAN_MIN_VERSION
@@ -1,14 +1,26 @@
 from typing import Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, text
 from sqlalchemy.exc import IntegrityError
-from backend.api.kbase.kbase_schema import KnowledgeBaseORM
-from backend.api.kbase.models import KnowledgeBase, KnowledgeBaseList
+from backend.api.kbase.kbase_schema import KnowledgeBaseORM, KbaseDocumentSourceORM
+from backend.api.kbase.models import (
+    DEFAULT_EMBEDDING_MODELS,
+    KnowledgeBase,
+    KnowledgeBaseList,
+    VectorIndexRequest,
+    QuantizationRequest,
+    RetrievalSettingsRequest,
+)
+from backend.api.kbase.vector_index import build_create_index_sql, build_drop_index_sql
 from backend.util.logging import SetupLogging
 
 logger = SetupLogging()
 
+# index_params keys that are not part of the index definition (quantization oversampling,
+# relevance cutoffs); they survive an index reconfigure.
+SEARCH_TIME_PARAMS = ("oversample", "max_distance", "score_gap")
+
 class KbaseRepository:
     """
     Repository to handle direct DB operations for the KnowledgeBase.
@@ -26,7 +38,13 @@ class KbaseRepository:
                 id=kbase_in.id,
                 name=kbase_in.name,
                 description=kbase_in.description,
-                account_short_code=kbase_in.account_short_code
+                account_short_code=kbase_in.account_short_code,
+                embedding_provider=kbase_in.embedding_provider,
+                embedding_model=kbase_in.embedding_model or DEFAULT_EMBEDDING_MODELS[kbase_in.embedding_provider],
+                embedding_dim=kbase_in.embedding_dim,
+                distance_metric=kbase_in.distance_metric,
+                quantization=kbase_in.quantization,
+                vector_backend=kbase_in.vector_backend,
             )
             self.session.add(new_orm)
             await self.session.commit()
@@ -45,15 +63,17 @@ class KbaseRepository:
     async def update_kbase(self, kbase_in: KnowledgeBase) -> Optional[KnowledgeBase]:
         """
         Update an existing knowledge base.
+        vector_backend is only changed when the request sets it; its default must not switch
+        a flat kbase back to Postgres on a name or description update.
         """
         try:
+            values = {"name": kbase_in.name, "description": kbase_in.description}
+            if "vector_backend" in kbase_in.model_fields_set:
+                values["vector_backend"] = kbase_in.vector_backend
             stmt = (
                 update(KnowledgeBaseORM)
                 .where(KnowledgeBaseORM.id == kbase_in.id)
-                .values(
-                    name=kbase_in.name,
-                    description=kbase_in.description
-                )
+                .values(**values)
                 .returning(KnowledgeBaseORM)
             )
             result = await self.session.execute(stmt)
@@ -123,6 +143,8 @@ class KbaseRepository:
         Delete the KnowledgeBase by UUID.
         """
         try:
+            await self.session.execute(text(build_drop_index_sql(id)))
+            await self.session.execute(delete(KbaseDocumentSourceORM).where(KbaseDocumentSourceORM.kbase_id == id))
             stmt = delete(KnowledgeBaseORM).where(KnowledgeBaseORM.id == id)
             result = await self.session.execute(stmt)
             await self.session.commit()
@@ -136,6 +158,181 @@ class KbaseRepository:
             logger.error(f"Unexpected error deleting KnowledgeBase: {str(e)}", exc_info=True)
             return False
 
+    async def set_embedding_dim(self, id: UUID, embedding_dim: int) -> None:
+        """
+        Record the embedding dimension for a kbase that does not have one yet.
+        """
+        stmt = (
+            update(KnowledgeBaseORM)
+            .where(KnowledgeBaseORM.id == id, KnowledgeBaseORM.embedding_dim.is_(None))
+            .values(embedding_dim=embedding_dim)
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def configure_vector_index(self, id: UUID, index_in: VectorIndexRequest) -> Optional[KnowledgeBase]:
+        """
+        (Re)build a kbase's partial ANN index and store its settings.
+        The index is built first (see _build_vector_index), so the settings are only changed once
+        it exists. If the build fails, the kbase is left without an index and searches fall back
+        to an exact scan until the index is rebuilt.
+        Raises ValueError if the kbase has no known embedding dimension yet.
+        """
+        kbase = await self.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        if not kbase.embedding_dim:
+            raise ValueError("KnowledgeBase has no embedding dimension yet; index a document first")
+
+        kbase.index_type = index_in.index_type
+        # Search-time settings that are not part of the index definition survive a reconfigure.
+        preserved = {key: value for key, value in (kbase.index_params or {}).items() if key in SEARCH_TIME_PARAMS}
+        kbase.index_params = {**preserved, **index_in.to_index_params()}
+        if index_in.distance_metric:
+            kbase.distance_metric = index_in.distance_metric
+        try:
+            await self._build_vector_index(kbase)
+            stmt = (
+                update(KnowledgeBaseORM)
+                .where(KnowledgeBaseORM.id == id)
+                .values(
+                    index_type=kbase.index_type,
+                    index_params=kbase.index_params,
+                    distance_metric=kbase.distance_metric,
+                )
+            )
+            await self.session.execute(stmt)
+            await self.session.commit()
+            logger.info(f"Built {kbase.index_type} index for KnowledgeBase with UUID: {id}")
+            return kbase
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Unexpected error building vector index: {str(e)}", exc_info=True)
+            return None
+
+    async def rebuild_vector_index(self, id: UUID) -> Optional[KnowledgeBase]:
+        """
+        Drop and recreate the ANN index for a kbase from its stored settings,
+        e.g. after a bulk load that skewed IVFFlat list centroids.
+        """
+        kbase = await self.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        if not kbase.index_type:
+            raise ValueError("KnowledgeBase has no vector index configured")
+        try:
+            await self._build_vector_index(kbase)
+            logger.info(f"Rebuilt {kbase.index_type} index for KnowledgeBase with UUID: {id}")
+            return kbase
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Unexpected error rebuilding vector index: {str(e)}", exc_info=True)
+            return None
+
+    async def set_quantization(self, id: UUID, quantization_in: QuantizationRequest) -> Optional[KnowledgeBase]:
+        """
+        Store the quantization settings for a kbase. The quantized column still has to be
+        backfilled and the ANN index rebuilt; see KbaseService.configure_quantization.
+        """
+        kbase = await self.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        index_params = dict(kbase.index_params or {})
+        if quantization_in.oversample:
+            index_params["oversample"] = quantization_in.oversample
+        try:
+            stmt = (
+                update(KnowledgeBaseORM)
+                .where(KnowledgeBaseORM.id == id)
+                .values(quantization=quantization_in.quantization, index_params=index_params)
+            )
+            await self.session.execute(stmt)
+            await self.session.commit()
+            kbase.quantization = quantization_in.quantization
+            kbase.index_params = index_params
+            logger.info(f"Set quantization '{kbase.quantization}' for KnowledgeBase with UUID: {id}")
+            return kbase
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Unexpected error setting quantization: {str(e)}", exc_info=True)
+            return None
+
+    async def set_retrieval_settings(self, id: UUID, settings_in: RetrievalSettingsRequest) -> Optional[KnowledgeBase]:
+        """
+        Store the relevance cutoffs for a kbase in its index_params; unset cutoffs are removed.
+        """
+        kbase = await self.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        index_params = dict(kbase.index_params or {})
+        for key, value in settings_in.to_index_params().items():
+            if value is None:
+                index_params.pop(key, None)
+            else:
+                index_params[key] = value
+        try:
+            stmt = (
+                update(KnowledgeBaseORM)
+                .where(KnowledgeBaseORM.id == id)
+                .values(index_params=index_params)
+            )
+            await self.session.execute(stmt)
+            await self.session.commit()
+            kbase.index_params = index_params
+            logger.info(f"Set retrieval settings {settings_in.model_dump()} for KnowledgeBase with UUID: {id}")
+            return kbase
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Unexpected error setting retrieval settings: {str(e)}", exc_info=True)
+            return None
+
+    async def drop_vector_index(self, id: UUID) -> Optional[KnowledgeBase]:
+        """
+        Drop the ANN index for a kbase; searches fall back to an exact scan.
+        """
+        kbase = await self.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        try:
+            await self.session.execute(text(build_drop_index_sql(id)))
+            await self.session.execute(
+                update(KnowledgeBaseORM).where(KnowledgeBaseORM.id == id).values(index_type=None)
+            )
+            await self.session.commit()
+            kbase.index_type = None
+            logger.info(f"Dropped vector index for KnowledgeBase with UUID: {id}")
+            return kbase
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Unexpected error dropping vector index: {str(e)}", exc_info=True)
+            return None
+
+    async def _build_vector_index(self, kbase: KnowledgeBase) -> None:
+        """
+        Drop and recreate the kbase's ANN index with CONCURRENTLY. A plain CREATE INDEX holds a
+        SHARE lock on kbase_documents for the whole build, which blocks ingest into every kbase.
+        CONCURRENTLY cannot run inside a transaction (and waits for open ones), so the session's
+        transaction is ended first and the DDL runs on its own autocommit connection. A failed
+        concurrent build leaves an INVALID index behind, which is dropped.
+        """
+        await self.session.commit()
+        async with self.session.bind.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(build_drop_index_sql(kbase.id, concurrently=True)))
+            try:
+                await conn.execute(text(build_create_index_sql(
+                    kbase_id=kbase.id,
+                    embedding_dim=kbase.embedding_dim,
+                    distance_metric=kbase.distance_metric,
+                    index_type=kbase.index_type,
+                    index_params=kbase.index_params,
+                    quantization=kbase.quantization,
+                    concurrently=True,
+                )))
+            except Exception:
+                await conn.execute(text(build_drop_index_sql(kbase.id, concurrently=True)))
+                raise
+
     def _to_pydantic(self, orm_obj: KnowledgeBaseORM) -> KnowledgeBase:
         """
         Convert an ORM object into a Pydantic KnowledgeBase model.
@@ -145,6 +342,15 @@ class KbaseRepository:
             name=orm_obj.name,
             description=orm_obj.description,
             account_short_code=orm_obj.account_short_code,
+            embedding_provider=orm_obj.embedding_provider,
+            embedding_model=orm_obj.embedding_model,
+            embedding_dim=orm_obj.embedding_dim,
+            distance_metric=orm_obj.distance_metric,
+            index_type=orm_obj.index_type,
+            index_params=orm_obj.index_params,
+            quantization=orm_obj.quantization,
+            vector_backend=orm_obj.vector_backend,
+            content_version=orm_obj.content_version,
             created_at=orm_obj.created_at,
             updated_at=orm_obj.updated_at
         )
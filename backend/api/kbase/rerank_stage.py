@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import FrozenSet, List, Optional, Tuple
+
+from backend.api.kbase.base_reranker_gateway import BaseRerankerGateway
+from backend.api.kbase.embedding_cache import normalize_query_text
+from backend.api.kbase.models import Chunk
+from backend.util.config import get_config_value
+from backend.util.logging import SetupLogging
+from backend.util.tracing import record_stage, stage
+
+logger = SetupLogging()
+
+RerankKey = Tuple[str, str, FrozenSet[str], int]
+
+
+class RerankCache:
+    """
+    Process-wide cache of rerank results keyed by (reranker, normalized query, candidate id set, top_n).
+
+    Only the ranking is stored (chunk ids and scores), so an entry is small and the chunks are
+    rebuilt from the current candidates. Keyed on the id set rather than the order, since the
+    reranker's answer does not depend on the order candidates arrive in.
+    Entries are evicted least-recently-used first and expire ttl_seconds after they were stored.
+    """
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Storage format: {key: (expires_at, [(chunk_id, rerank_score), ...])}; order is recency of use.
+        self._entries: "OrderedDict[RerankKey, Tuple[float, List[Tuple[str, Optional[float]]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(reranker: str, query: str, chunks: List[Chunk], top_n: int) -> RerankKey:
+        return (reranker, normalize_query_text(query), frozenset(str(chunk.id) for chunk in chunks), top_n)
+
+    def get(self, key: RerankKey, chunks: List[Chunk]) -> Optional[List[Chunk]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        by_id = {str(chunk.id): chunk for chunk in chunks}
+        return [by_id[chunk_id].model_copy(update={"rerank_score": score}) for chunk_id, score in entry[1]]
+
+    def put(self, key: RerankKey, ranked: List[Chunk]) -> None:
+        self._entries[key] = (
+            time.monotonic() + self.ttl_seconds,
+            [(str(chunk.id), chunk.rerank_score) for chunk in ranked],
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Singleton instance
+rerank_cache = RerankCache(
+    max_entries=int(get_config_value("RERANK_CACHE_MAX_ENTRIES") or 5000),
+    ttl_seconds=float(get_config_value("RERANK_CACHE_TTL_SECONDS") or 600),
+)
+
+
+class RerankStage:
+    """
+    Rerank vector-search candidates within a latency budget.
+
+    A reranker that errors or does not answer within budget_ms is cancelled and the
+    candidates are returned in vector order, so enabling reranking can never make a
+    request fail or wait longer than the budget. Successful rankings are cached.
+    """
+    __slots__ = ("reranker", "budget_ms", "cache")
+
+    def __init__(
+        self,
+        reranker: BaseRerankerGateway,
+        budget_ms: float = 300,
+        cache: Optional[RerankCache] = rerank_cache,
+    ):
+        self.reranker = reranker
+        self.budget_ms = budget_ms
+        self.cache = cache
+
+    async def rerank(self, query: str, chunks: List[Chunk], top_n: int) -> List[Chunk]:
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+        key = RerankCache.key(self.reranker.name, query, chunks, top_n)
+        if self.cache is not None:
+            cached = self.cache.get(key, chunks)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        try:
+            with stage("rerank"):
+                ranked = await asyncio.wait_for(
+                    self.reranker.rerank(query, chunks, top_n),
+                    timeout=self.budget_ms / 1000,
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Reranker {self.reranker.name} exceeded its {self.budget_ms} ms budget; using vector order")
+            record_stage("rerank_fallback", (time.perf_counter() - started) * 1000)
+            return chunks[:top_n]
+        except Exception as e:
+            logger.error(f"Reranker {self.reranker.name} failed; using vector order: {str(e)}", exc_info=True)
+            record_stage("rerank_fallback", (time.perf_counter() - started) * 1000)
+            return chunks[:top_n]
+
+        if self.cache is not None:
+            self.cache.put(key, ranked)
+        return ranked
@@ -0,0 +1,48 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+from backend.api.kbase.base_reranker_gateway import BaseRerankerGateway
+from backend.api.kbase.embedders.clients import key_fingerprint
+from backend.api.kbase.rerankers.lexical_reranker import LexicalRerankerGateway
+
+# Gateways keyed by (provider, model, key fingerprint). get_reranker() is called per chat request,
+# and each Cohere gateway owns an AsyncClient with its own connection pool; sharing one per key
+# keeps those connections alive across requests instead of leaving a pool per request to the GC.
+_rerankers: Dict[Tuple[str, str, str], BaseRerankerGateway] = {}
+_lock = threading.Lock()
+
+def get_reranker(provider: str, **kwargs) -> BaseRerankerGateway:
+    """
+    Factory function returning the shared reranker gateway for a provider, model and API key.
+
+    Args:
+        provider (str): Either 'cohere' or 'lexical'.
+        **kwargs: Additional configuration parameters.
+
+    Returns:
+        An instance of BaseRerankerGateway, shared by every caller with the same settings.
+
+    Raises:
+        ValueError: If the provider is unsupported or required parameters are missing.
+    """
+    provider = provider.lower()
+    if provider == "cohere":
+        api_key = kwargs.get("api_key")
+        model = kwargs.get("model") or "rerank-english-v3.0"
+        if not api_key:
+            raise ValueError("`api_key` is required for the Cohere reranker.")
+        # Imported here so that the cohere SDK is only needed when it is used.
+        from backend.api.kbase.rerankers.cohere_reranker import CohereRerankerGateway
+        return _shared((provider, model, key_fingerprint(api_key)), lambda: CohereRerankerGateway(api_key=api_key, model=model))
+    elif provider == "lexical":
+        return _shared((provider, "", ""), LexicalRerankerGateway)
+    else:
+        raise ValueError(f"Unsupported reranker provider: {provider}")
+
+
+def _shared(key: Tuple[str, str, str], create: Callable[[], BaseRerankerGateway]) -> BaseRerankerGateway:
+    with _lock:
+        reranker = _rerankers.get(key)
+        if reranker is None:
+            reranker = _rerankers[key] = create()
+        return reranker
@@ -0,0 +1,38 @@
+from typing import List
+import cohere
+from backend.api.kbase.base_reranker_gateway import BaseRerankerGateway
+from backend.api.kbase.models import Chunk
+from backend.util.rate_governor import rate_governor
+
+class CohereRerankerGateway(BaseRerankerGateway):
+    __slots__ = ("model", "client")
+
+    def __init__(self, api_key: str, model: str = "rerank-english-v3.0", timeout: float = 10.0):
+        self.model = model
+        # Async client, so a rerank cancelled by the latency budget releases its connection
+        # instead of blocking a worker thread.
+        self.client = cohere.AsyncClient(api_key=api_key, timeout=timeout)
+
+    @property
+    def name(self) -> str:
+        return f"cohere:{self.model}"
+
+    async def rerank(self, query: str, chunks: List[Chunk], top_n: int) -> List[Chunk]:
+        if not chunks:
+            return []
+        # rate_governor retries 429s (and pauses the model for every caller); the SDK must not.
+        response = await rate_governor.call(
+            "cohere",
+            self.model,
+            lambda: self.client.rerank(
+                query=query,
+                documents=[chunk.content for chunk in chunks],
+                top_n=min(top_n, len(chunks)),
+                model=self.model,
+                request_options={"max_retries": 0},
+            ),
+        )
+        return [
+            chunks[result.index].model_copy(update={"rerank_score": result.relevance_score})
+            for result in response.results
+        ]
@@ -0,0 +1,58 @@
+import math
+import re
+from collections import Counter
+from typing import List
+from backend.api.kbase.base_reranker_gateway import BaseRerankerGateway
+from backend.api.kbase.models import Chunk
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Words too common to say anything about relevance.
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the this to was what when where "
+    "which who why will with you your".split()
+)
+
+class LexicalRerankerGateway(BaseRerankerGateway):
+    """
+    Local reranker: BM25 of the query terms over the candidate set, with the candidates
+    themselves as the corpus. No network call, so it fits in any latency budget; useful when
+    the vector search misses exact terms (product codes, names) that the query contains.
+    Ties keep the vector-search order.
+    """
+    __slots__ = ("k1", "b")
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    @property
+    def name(self) -> str:
+        return "lexical:bm25"
+
+    async def rerank(self, query: str, chunks: List[Chunk], top_n: int) -> List[Chunk]:
+        if not chunks:
+            return []
+        query_terms = set(tokenize(query))
+        documents = [Counter(tokenize(chunk.content)) for chunk in chunks]
+        avg_length = sum(sum(document.values()) for document in documents) / len(documents) or 1.0
+        document_frequency = Counter(term for document in documents for term in query_terms if term in document)
+
+        scores = []
+        for document in documents:
+            length = sum(document.values())
+            score = 0.0
+            for term in query_terms:
+                tf = document.get(term, 0)
+                if not tf:
+                    continue
+                idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+            scores.append(score)
+
+        # sorted() is stable, so equal scores keep the vector order.
+        order = sorted(range(len(chunks)), key=lambda i: -scores[i])[:top_n]
+        return [chunks[i].model_copy(update={"rerank_score": scores[i]}) for i in order]
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
@@ -0,0 +1,240 @@
+import itertools
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.api.kbase.models import RetrievedChunks
+from backend.util.config import get_config_value
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+
+GroupKey = Tuple[uuid.UUID, Hashable, int]
+
+
+class _CacheEntry:
+    __slots__ = ("kbase_id", "group_key", "position", "result", "nbytes", "expires_at")
+
+    def __init__(self, kbase_id: uuid.UUID, group_key: GroupKey, vector: np.ndarray, result: RetrievedChunks, expires_at: float):
+        self.kbase_id = kbase_id
+        self.group_key = group_key
+        # Row of the entry's query vector in its group's matrix.
+        self.position = 0
+        self.result = result
+        self.expires_at = expires_at
+        self.nbytes = vector.nbytes + _estimate_result_bytes(result)
+
+
+class _Group:
+    """
+    The cached query vectors of one (kbase, signature, dimension), kept as rows of one float32
+    matrix so a lookup is a single matrix-vector product. Rows are appended into spare capacity
+    and a removed row is filled with the last one.
+    """
+    __slots__ = ("entry_ids", "vectors", "expires_at")
+
+    def __init__(self, dim: int, capacity: int = 8):
+        self.entry_ids: List[int] = []
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.expires_at = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def add(self, entry_id: int, vector: np.ndarray, expires_at: float) -> int:
+        position = len(self.entry_ids)
+        if position == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+            self.expires_at = np.concatenate([self.expires_at, np.empty_like(self.expires_at)])
+        self.vectors[position] = vector
+        self.expires_at[position] = expires_at
+        self.entry_ids.append(entry_id)
+        return position
+
+    def remove(self, position: int) -> Optional[int]:
+        """ Remove a row; returns the id of the entry moved into its place, if any. """
+        last = len(self.entry_ids) - 1
+        moved = None
+        if position != last:
+            moved = self.entry_ids[last]
+            self.vectors[position] = self.vectors[last]
+            self.expires_at[position] = self.expires_at[last]
+            self.entry_ids[position] = moved
+        self.entry_ids.pop()
+        return moved
+
+
+def _estimate_result_bytes(result: RetrievedChunks) -> int:
+    """ Rough in-memory size of a cached result: chunk text plus any embeddings (Python floats). """
+    size = 0
+    for chunk in result.chunks:
+        size += len(chunk.content) + 64
+        if chunk.embeddings is not None:
+            size += len(chunk.embeddings) * 32
+    return size
+
+
+class RetrievalCache:
+    """
+    Process-wide semantic cache of vector search results, scoped per knowledge base.
+
+    A lookup is a hit when a cached entry for the same kbase and the same search parameters
+    (the signature, e.g. ("mmr", k, lambda_)) has a query embedding whose cosine similarity
+    to the new query is at least similarity_threshold.
+
+    - Entries are evicted least-recently-used first once max_entries or max_bytes is exceeded,
+      and expire ttl_seconds after they were stored (other processes may write to the kbase).
+    - invalidate(kbase_id) drops every entry for a kbase and bumps its generation, so a search
+      that started before the write cannot store its (stale) result afterwards. It only reaches
+      this process; callers put the kbase's content_version in the signature so that writes
+      made by other processes miss too.
+    - The query vectors of each (kbase, signature) are kept as one matrix, updated on put and
+      removal, so a lookup does not rebuild it.
+    """
+    def __init__(
+        self,
+        similarity_threshold: float = 0.98,
+        max_entries: int = 2_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 600,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._groups: Dict[GroupKey, _Group] = {}
+        self._by_kbase: Dict[uuid.UUID, Set[int]] = {}
+        self._generations: Dict[uuid.UUID, int] = {}
+        self._ids = itertools.count()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def generation(self, kbase_id: uuid.UUID) -> int:
+        """ Current write generation of a kbase; pass it back to put(). """
+        return self._generations.get(kbase_id, 0)
+
+    def get(self, kbase_id: uuid.UUID, signature: Hashable, query_embedding: List[float]) -> Optional[RetrievedChunks]:
+        """
+        Return the cached result of the most similar cached query, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        query = _unit_float32(query_embedding)
+        group = self._groups.get((kbase_id, signature, len(query)))
+        if group is not None:
+            expired = np.flatnonzero(group.expires_at[:len(group)] < time.monotonic())
+            # Highest rows first: removing a row only moves the last one.
+            for position in expired[::-1]:
+                self._remove(group.entry_ids[position])
+            group = self._groups.get((kbase_id, signature, len(query)))
+        if group is None:
+            self.misses += 1
+            return None
+
+        similarities = group.vectors[:len(group)] @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry_id = group.entry_ids[best]
+        self._entries.move_to_end(entry_id)
+        # Shallow copy so callers can reorder / trim the list without touching the cache.
+        return RetrievedChunks(chunks=list(self._entries[entry_id].result.chunks))
+
+    def put(self, kbase_id: uuid.UUID, signature: Hashable, query_embedding: List[float], result: RetrievedChunks, generation: int) -> None:
+        """
+        Store a search result unless the kbase was written to since `generation` was read.
+        """
+        if not self.enabled or generation != self.generation(kbase_id):
+            return
+        vector = _unit_float32(query_embedding)
+        group_key = (kbase_id, signature, len(vector))
+        entry = _CacheEntry(
+            kbase_id=kbase_id,
+            group_key=group_key,
+            vector=vector,
+            result=result,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        entry_id = next(self._ids)
+        group = self._groups.get(group_key)
+        if group is None:
+            group = self._groups[group_key] = _Group(len(vector))
+        entry.position = group.add(entry_id, vector, entry.expires_at)
+        self._entries[entry_id] = entry
+        self._by_kbase.setdefault(kbase_id, set()).add(entry_id)
+        self._bytes += entry.nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, kbase_id: uuid.UUID) -> None:
+        """ Drop every cached result for a kbase; call after any write to its documents. """
+        self._generations[kbase_id] = self.generation(kbase_id) + 1
+        entry_ids = self._by_kbase.get(kbase_id)
+        if entry_ids:
+            for entry_id in list(entry_ids):
+                self._remove(entry_id)
+            self.invalidations += 1
+            logger.debug(f"Invalidated retrieval cache for KnowledgeBase with UUID: {kbase_id}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._groups.clear()
+        self._by_kbase.clear()
+        self._bytes = 0
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._bytes -= entry.nbytes
+        group = self._groups[entry.group_key]
+        moved = group.remove(entry.position)
+        if moved is not None:
+            self._entries[moved].position = entry.position
+        if not group:
+            del self._groups[entry.group_key]
+        kbase_entries = self._by_kbase[entry.kbase_id]
+        kbase_entries.discard(entry_id)
+        if not kbase_entries:
+            del self._by_kbase[entry.kbase_id]
+
+
+def _unit_float32(vec: List[float]) -> np.ndarray:
+    arr = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm != 0 else arr
+
+
+# Singleton instance
+retrieval_cache = RetrievalCache(
+    similarity_threshold=float(get_config_value("RETRIEVAL_CACHE_SIMILARITY_THRESHOLD") or 0.98),
+    max_entries=int(get_config_value("RETRIEVAL_CACHE_MAX_ENTRIES") or 2_000),
+    max_bytes=int(get_config_value("RETRIEVAL_CACHE_MAX_BYTES") or 64 * 1024 * 1024),
+    ttl_seconds=float(get_config_value("RETRIEVAL_CACHE_TTL_SECONDS") or 600),
+)
@@ -1,7 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+import asyncio
+import shutil
+import tarfile
+import tempfile
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, File, UploadFile, Form
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from uuid import UUID
-from backend.api.kbase.models import KnowledgeBase, KnowledgeBaseList
+from backend.api.kbase.models import (
+    KnowledgeBase,
+    KnowledgeBaseList,
+    VectorIndexRequest,
+    QuantizationRequest,
+    RetrievalSettingsRequest,
+    FederatedSearchRequest,
+    FederatedRetrievedChunks,
+    BatchSearchRequest,
+    BatchSearchResponse,
+)
 from backend.api.kbase.services import KbaseService
+from backend.api.kbase.snapshot import iter_snapshot_tar, extract_snapshot_tar
 from backend.api.kbase.repository import KbaseRepository
 from backend.util.auth_utils import validate_user, TokenData
 from backend.util.logging import SetupLogging
@@ -94,3 +112,235 @@ async def delete_kbase(
     except Exception as e:
         logger.error(f"Error in delete_kbase endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.put("/{uuid}/index", response_model=KnowledgeBase)
+async def configure_vector_index(
+    uuid: UUID,
+    index_in: VectorIndexRequest,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Create (or replace) the ANN index for a knowledge base.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        if not await service.get_kbase(uuid):
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        result = await service.configure_vector_index(uuid, index_in)
+        if not result:
+            raise HTTPException(status_code=500, detail="Failed to build vector index")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in configure_vector_index endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/{uuid}/index/rebuild", response_model=KnowledgeBase)
+async def rebuild_vector_index(
+    uuid: UUID,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Rebuild the ANN index for a knowledge base from its stored settings.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        if not await service.get_kbase(uuid):
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        result = await service.rebuild_vector_index(uuid)
+        if not result:
+            raise HTTPException(status_code=500, detail="Failed to rebuild vector index")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in rebuild_vector_index endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.put("/{uuid}/quantization", response_model=KnowledgeBase)
+async def configure_quantization(
+    uuid: UUID,
+    quantization_in: QuantizationRequest,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Enable or disable two-stage quantized search for a knowledge base.
+    Existing rows are backfilled and the ANN index is rebuilt over the quantized column.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        if not await service.get_kbase(uuid):
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        result = await service.configure_quantization(uuid, quantization_in)
+        if not result:
+            raise HTTPException(status_code=500, detail="Failed to configure quantization")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in configure_quantization endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.put("/{uuid}/retrieval", response_model=KnowledgeBase)
+async def configure_retrieval(
+    uuid: UUID,
+    settings_in: RetrievalSettingsRequest,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Set the relevance cutoffs for a knowledge base: searches stop at hits farther than
+    max_distance and at the first similarity drop of score_gap, returning fewer (or no) chunks.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        if not await service.get_kbase(uuid):
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        result = await service.configure_retrieval(uuid, settings_in)
+        if not result:
+            raise HTTPException(status_code=500, detail="Failed to configure retrieval settings")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except Exception as e:
+        logger.error(f"Error in configure_retrieval endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/{uuid}/index", response_model=KnowledgeBase)
+async def drop_vector_index(
+    uuid: UUID,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Drop the ANN index for a knowledge base. Searches fall back to an exact scan.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        result = await service.drop_vector_index(uuid)
+        if not result:
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except Exception as e:
+        logger.error(f"Error in drop_vector_index endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/search", response_model=FederatedRetrievedChunks)
+async def federated_search(
+    search_in: FederatedSearchRequest,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Search several knowledge bases at once and merge the results.
+    The response includes per-kbase timings for diagnostics.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        result = await service.federated_search(search_in)
+        if result is None:
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in federated_search endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/{uuid}/search/batch", response_model=BatchSearchResponse)
+async def batch_search(
+    uuid: UUID,
+    search_in: BatchSearchRequest,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Run many similarity searches against one knowledge base in a single round trip.
+    """
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        result = await service.batch_search(uuid, search_in)
+        if result is None:
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        return result
+    except HTTPException as http_ex:
+        raise http_ex
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in batch_search endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/{uuid}/snapshot")
+async def export_snapshot(
+    uuid: UUID,
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Download a knowledge base as a portable snapshot (tar of manifest.json, embeddings.npy, chunks.jsonl).
+    """
+    directory = tempfile.mkdtemp(prefix="kbase-snapshot-")
+    try:
+        service = KbaseService(repository=KbaseRepository(session))
+        kbase = await service.get_kbase(uuid)
+        if not kbase:
+            raise HTTPException(status_code=404, detail="KnowledgeBase not found")
+        await service.export_snapshot(uuid, directory)
+        return StreamingResponse(
+            iter_snapshot_tar(directory),
+            media_type="application/x-tar",
+            headers={"Content-Disposition": f'attachment; filename="{kbase.id}.kbase.tar"'},
+            background=BackgroundTask(shutil.rmtree, directory, ignore_errors=True),
+        )
+    except HTTPException as http_ex:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise http_ex
+    except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        logger.error(f"Error in export_snapshot endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/snapshot", response_model=KnowledgeBase)
+async def import_snapshot(
+    request: Request,
+    file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    keep_ids: bool = Form(False),
+    current_user: TokenData = Depends(validate_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Create a knowledge base from an uploaded snapshot tar, without re-embedding its documents.
+    """
+    directory = tempfile.mkdtemp(prefix="kbase-snapshot-")
+    try:
+        await asyncio.to_thread(extract_snapshot_tar, file.file, directory)
+        service = KbaseService(repository=KbaseRepository(session))
+        return await service.import_snapshot(
+            directory,
+            name=name,
+            account_short_code=extract_subdomain(request),
+            keep_ids=keep_ids,
+        )
+    except (ValueError, tarfile.TarError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in import_snapshot endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -1,6 +1,22 @@
 from typing import Optional
 from uuid import UUID
-from backend.api.kbase.models import KnowledgeBase, KnowledgeBaseList
+from backend.api.kbase.models import (
+    KnowledgeBase,
+    KnowledgeBaseList,
+    VectorIndexRequest,
+    QuantizationRequest,
+    RetrievalSettingsRequest,
+    FederatedSearchRequest,
+    FederatedRetrievedChunks,
+    BatchSearchRequest,
+    BatchSearchResponse,
+)
+from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.retrieval_cache import retrieval_cache
+from backend.api.kbase.flat_vector_store import flat_store_registry
+from backend.api.kbase.federated_search import FederatedVectorSearch
+from backend.api.kbase.embedder_registry import embedder_registry
+from backend.api.kbase.snapshot import export_kbase_snapshot, import_kbase_snapshot
 from .repository import KbaseRepository
 from backend.util.logging import SetupLogging
 
@@ -24,7 +40,120 @@ class KbaseService:
         return await self.repository.get_kbase_by_name(name)
 
     async def update_kbase(self, kbase_in: KnowledgeBase) -> Optional[KnowledgeBase]:
-        return await self.repository.update_kbase(kbase_in)
+        kbase = await self.repository.update_kbase(kbase_in)
+        if kbase and "vector_backend" in kbase_in.model_fields_set:
+            # A flat store loaded before the switch must not outlive it.
+            flat_store_registry.invalidate(kbase.id)
+        return kbase
 
     async def delete_kbase(self, id: UUID) -> bool:
-        return await self.repository.delete_kbase(id)
+        deleted = await self.repository.delete_kbase(id)
+        if deleted:
+            retrieval_cache.invalidate(id)
+            flat_store_registry.invalidate(id)
+        return deleted
+
+    async def configure_vector_index(self, id: UUID, index_in: VectorIndexRequest) -> Optional[KnowledgeBase]:
+        kbase = await self.repository.configure_vector_index(id, index_in)
+        if kbase:
+            # The distance metric may have changed, which changes every ranking and score.
+            retrieval_cache.invalidate(id)
+            flat_store_registry.invalidate(id)
+        return kbase
+
+    async def rebuild_vector_index(self, id: UUID) -> Optional[KnowledgeBase]:
+        return await self.repository.rebuild_vector_index(id)
+
+    async def drop_vector_index(self, id: UUID) -> Optional[KnowledgeBase]:
+        return await self.repository.drop_vector_index(id)
+
+    async def configure_quantization(self, id: UUID, quantization_in: QuantizationRequest) -> Optional[KnowledgeBase]:
+        """
+        Enable (or disable) two-stage quantized search for a kbase: store the setting,
+        backfill the quantized column for existing rows and rebuild the ANN index over it.
+        For very large kbases prefer the `backfill-quantized` CLI command.
+        """
+        kbase = await self.repository.set_quantization(id, quantization_in)
+        if not kbase:
+            return None
+        if kbase.quantization:
+            vector_store = PostgresVectorStore.from_kbase(self.repository.session, kbase)
+            updated = await vector_store.backfill_quantized()
+            logger.info(f"Backfilled {updated} quantized embeddings for KnowledgeBase with UUID: {id}")
+        if kbase.index_type:
+            kbase = await self.repository.rebuild_vector_index(id)
+        # Quantized search picks a different candidate set; don't serve results from the old one.
+        retrieval_cache.invalidate(id)
+        return kbase
+
+    async def configure_retrieval(self, id: UUID, settings_in: RetrievalSettingsRequest) -> Optional[KnowledgeBase]:
+        """
+        Set the relevance cutoffs (max_distance, score_gap) applied to a kbase's searches.
+        """
+        return await self.repository.set_retrieval_settings(id, settings_in)
+
+    async def federated_search(self, search_in: FederatedSearchRequest) -> Optional[FederatedRetrievedChunks]:
+        """
+        Search several knowledge bases at once. Returns None if any of them does not exist.
+        """
+        kbases = []
+        for kbase_id in dict.fromkeys(search_in.kbase_ids):
+            kbase = await self.repository.get_kbase_by_id(kbase_id)
+            if not kbase:
+                logger.error(f"KnowledgeBase with UUID: {kbase_id} not found for federated search.")
+                return None
+            kbases.append(kbase)
+
+        # One query embedding serves every kbase, so they must share an embedder (ValueError otherwise).
+        search = FederatedVectorSearch(kbases, strategy=search_in.strategy)
+        query_embedding = await embedder_registry.embed_query_for_key(search.embedder_key, search_in.query)
+        if search_in.mode == "hybrid":
+            return await search.hybrid_search(search_in.query, query_embedding, k=search_in.k, filter=search_in.filter)
+        if search_in.mode == "similarity":
+            return await search.similarity_search_by_vector(query_embedding, k=search_in.k, filter=search_in.filter)
+        return await search.mmr_by_vector(query_embedding, k=search_in.k, lambda_=search_in.lambda_, filter=search_in.filter)
+
+    async def batch_search(self, id: UUID, search_in: BatchSearchRequest) -> Optional[BatchSearchResponse]:
+        """
+        Embed all queries in one batched embedder call and search them in one SQL statement.
+        """
+        kbase = await self.repository.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        query_embeddings = await embedder_registry.get(kbase).embed_queries(search_in.queries)
+        vector_store = PostgresVectorStore.from_kbase(self.repository.session, kbase)
+        results = await vector_store.batch_similarity_search(
+            query_embeddings,
+            k=search_in.k,
+            ef_search=search_in.ef_search,
+            probes=search_in.probes,
+            filter=search_in.filter,
+        )
+        return BatchSearchResponse(results=results)
+
+    async def export_snapshot(self, id: UUID, directory: str) -> Optional[dict]:
+        """
+        Write the kbase's chunks to a snapshot directory; returns the manifest, or None if the kbase does not exist.
+        """
+        kbase = await self.repository.get_kbase_by_id(id)
+        if not kbase:
+            return None
+        return await export_kbase_snapshot(kbase, directory)
+
+    async def import_snapshot(
+        self,
+        directory: str,
+        name: Optional[str] = None,
+        account_short_code: Optional[str] = None,
+        keep_ids: bool = False,
+    ) -> KnowledgeBase:
+        """
+        Create a new kbase from a snapshot directory.
+        """
+        return await import_kbase_snapshot(
+            self.repository,
+            directory,
+            name=name,
+            account_short_code=account_short_code,
+            keep_ids=keep_ids,
+        )
@@ -0,0 +1,290 @@
+"""
+Portable kbase snapshots: move a knowledge base between environments without re-running
+upload, Textract, chunking and embedding.
+
+A snapshot is a directory (or a tar of it) with:
+
+    manifest.json    kbase settings, embedding dimension, row count, format version
+    embeddings.npy   float32 matrix, one unit-normalized row per chunk
+    chunks.jsonl     one {"id", "source_uri", "content", "metadata"} object per line, aligned with the rows
+    content_version  the kbase content_version the rows were read at, written last
+
+The export is also a flat store snapshot: FlatVectorStore.load reads it, and the flat store
+registry memory-maps it from `<FLAT_VECTOR_STORE_DIR>/<kbase_id>/` while its content_version
+is current (the `export-flat-snapshot` CLI command writes it there). Export and import stream
+in batches: memory use is bounded by the batch size, not the kbase size.
+"""
+import json
+import os
+import tarfile
+import uuid
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from backend.api.kbase.bulk_copy import copy_kbase_documents, metadata_json
+from backend.api.kbase.content_hash import content_hash
+from backend.api.kbase.flat_vector_store import SNAPSHOT_CHUNKS, SNAPSHOT_EMBEDDINGS, SNAPSHOT_VERSION
+from backend.api.kbase.kbase_schema import KbaseDocumentORM, KnowledgeBaseORM
+from backend.api.kbase.models import KnowledgeBase, QuantizationRequest, RetrievalSettingsRequest, VectorIndexRequest
+from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.repository import KbaseRepository
+from backend.util.database import engine
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+SNAPSHOT_MANIFEST = "manifest.json"
+SNAPSHOT_FILES = (SNAPSHOT_MANIFEST, SNAPSHOT_EMBEDDINGS, SNAPSHOT_CHUNKS)
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Index settings that VectorIndexRequest accepts; anything else in index_params is search-time only.
+INDEX_REQUEST_PARAMS = ("m", "ef_construction", "lists", "ef_search", "probes")
+RETRIEVAL_PARAMS = ("max_distance", "score_gap")
+
+TAR_BLOCK_SIZE = 512
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+async def export_kbase_snapshot(kbase: KnowledgeBase, directory: str, batch_size: int = 1000) -> dict:
+    """
+    Write a kbase's chunks to a snapshot directory and return its manifest.
+
+    Runs on its own REPEATABLE READ connection so the content_version, the row count in the
+    .npy header and the streamed rows come from the same snapshot of the table, even while
+    ingest is running. Files are written under temporary names and renamed, and the
+    content_version file is removed first and written last (as in FlatVectorStore.save), so
+    workers mapping an earlier export of the directory keep a consistent view.
+    """
+    os.makedirs(directory, exist_ok=True)
+    table = KbaseDocumentORM.__table__
+    embeddings_path = os.path.join(directory, SNAPSHOT_EMBEDDINGS)
+    chunks_path = os.path.join(directory, SNAPSHOT_CHUNKS)
+    version_path = os.path.join(directory, SNAPSHOT_VERSION)
+    if os.path.exists(version_path):
+        os.remove(version_path)
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="REPEATABLE READ")
+        content_version = (await conn.execute(
+            select(KnowledgeBaseORM.content_version).where(KnowledgeBaseORM.id == kbase.id)
+        )).scalar_one()
+        count = (await conn.execute(
+            select(func.count()).select_from(table).where(table.c.kbase_id == kbase.id)
+        )).scalar_one()
+        embedding_dim = kbase.embedding_dim
+        if not embedding_dim and count:
+            embedding_dim = (await conn.execute(
+                select(func.vector_dims(table.c.embedding)).where(table.c.kbase_id == kbase.id).limit(1)
+            )).scalar_one()
+
+        stmt = (
+            select(table.c.id, table.c.source_uri, table.c.content, table.c.metadata, table.c.embedding)
+            .where(table.c.kbase_id == kbase.id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=batch_size)
+        )
+        written = 0
+        with open(embeddings_path + ".tmp", "wb") as embeddings_file, open(chunks_path + ".tmp", "w", encoding="utf-8") as chunks_file:
+            # The .npy header carries the shape, so it can be written before the rows are streamed.
+            np.lib.format.write_array_header_1_0(embeddings_file, {
+                "descr": np.lib.format.dtype_to_descr(np.dtype("<f4")),
+                "fortran_order": False,
+                "shape": (count, embedding_dim or 0),
+            })
+            result = await conn.stream(stmt)
+            async for rows in result.partitions(batch_size):
+                matrix = np.asarray([np.asarray(row.embedding, dtype="<f4") for row in rows], dtype="<f4")
+                if matrix.shape[1] != embedding_dim:
+                    raise ValueError(f"Chunk embedding has {matrix.shape[1]} dimensions, kbase expects {embedding_dim}")
+                embeddings_file.write(matrix.tobytes())
+                for row in rows:
+                    chunks_file.write(json.dumps({
+                        "id": str(row.id),
+                        "source_uri": row.source_uri,
+                        "content": row.content,
+                        "metadata": row.metadata,
+                    }) + "\n")
+                written += len(rows)
+    os.replace(chunks_path + ".tmp", chunks_path)
+    os.replace(embeddings_path + ".tmp", embeddings_path)
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "count": written,
+        "content_version": content_version,
+        "kbase": {
+            "id": str(kbase.id),
+            "name": kbase.name,
+            "description": kbase.description,
+            "embedding_provider": kbase.embedding_provider,
+            "embedding_model": kbase.embedding_model,
+            "embedding_dim": embedding_dim,
+            "distance_metric": kbase.distance_metric,
+            "index_type": kbase.index_type,
+            "index_params": kbase.index_params,
+            "quantization": kbase.quantization,
+            "vector_backend": kbase.vector_backend,
+        },
+    }
+    with open(os.path.join(directory, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    with open(version_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(str(content_version))
+    os.replace(version_path + ".tmp", version_path)
+    logger.info(f"Exported {written} chunks of KnowledgeBase with UUID: {kbase.id} to {directory}")
+    return manifest
+
+
+async def import_kbase_snapshot(
+    repository: KbaseRepository,
+    directory: str,
+    name: Optional[str] = None,
+    account_short_code: Optional[str] = None,
+    keep_ids: bool = False,
+    batch_size: int = 1000,
+) -> KnowledgeBase:
+    """
+    Create a new kbase from a snapshot directory and bulk-load its chunks with COPY.
+
+    Chunk ids are regenerated unless keep_ids is set (they are globally unique, so keeping
+    them only works when importing into a different database). Quantized columns are
+    backfilled and the ANN index is built after the load, which is faster than maintaining
+    them row by row. The new kbase is deleted again if the load fails.
+    """
+    manifest = read_snapshot_manifest(directory)
+    settings = manifest["kbase"]
+    embeddings = np.load(os.path.join(directory, SNAPSHOT_EMBEDDINGS), mmap_mode="r")
+    if embeddings.shape[0] != manifest["count"]:
+        raise ValueError(f"Snapshot manifest lists {manifest['count']} chunks but embeddings.npy has {embeddings.shape[0]} rows")
+
+    kbase = await repository.create_kbase(KnowledgeBase(
+        name=name or settings["name"],
+        description=settings.get("description"),
+        account_short_code=account_short_code,
+        # Snapshots from before per-kbase embedders were all embedded with the OpenAI default.
+        embedding_provider=settings.get("embedding_provider") or "openai",
+        embedding_model=settings.get("embedding_model"),
+        embedding_dim=settings.get("embedding_dim"),
+        distance_metric=settings.get("distance_metric") or "l2",
+        vector_backend=settings.get("vector_backend") or "postgres",
+    ))
+    if not kbase:
+        raise RuntimeError("Failed to create KnowledgeBase for snapshot import")
+
+    try:
+        loaded = await _copy_snapshot_rows(kbase.id, directory, embeddings, keep_ids, batch_size)
+    except Exception:
+        await repository.delete_kbase(kbase.id)
+        raise
+    logger.info(f"Imported {loaded} chunks into KnowledgeBase with UUID: {kbase.id}")
+    # Each imported chunk belongs to the source it was exported with.
+    await PostgresVectorStore.from_kbase(repository.session, kbase).backfill_sources()
+
+    index_params = settings.get("index_params") or {}
+    if settings.get("quantization"):
+        kbase = await repository.set_quantization(kbase.id, QuantizationRequest(
+            quantization=settings["quantization"],
+            oversample=index_params.get("oversample"),
+        ))
+        await PostgresVectorStore.from_kbase(repository.session, kbase).backfill_quantized(batch_size=batch_size)
+    if any(index_params.get(key) is not None for key in RETRIEVAL_PARAMS):
+        kbase = await repository.set_retrieval_settings(kbase.id, RetrievalSettingsRequest(
+            **{key: index_params.get(key) for key in RETRIEVAL_PARAMS}
+        ))
+    if settings.get("index_type"):
+        kbase = await repository.configure_vector_index(kbase.id, VectorIndexRequest(
+            index_type=settings["index_type"],
+            **{key: index_params[key] for key in INDEX_REQUEST_PARAMS if index_params.get(key) is not None},
+        ))
+    return kbase
+
+
+def read_snapshot_manifest(directory: str) -> dict:
+    path = os.path.join(directory, SNAPSHOT_MANIFEST)
+    if not os.path.exists(path):
+        raise ValueError("Snapshot has no manifest.json")
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+    return manifest
+
+
+async def _copy_snapshot_rows(kbase_id: uuid.UUID, directory: str, embeddings: np.ndarray, keep_ids: bool, batch_size: int) -> int:
+    """ COPY the snapshot rows into kbase_documents in one transaction; duplicate content is stored once. """
+    def rows() -> Iterator[tuple]:
+        count = 0
+        with open(os.path.join(directory, SNAPSHOT_CHUNKS), "r", encoding="utf-8") as chunks_file:
+            for line in chunks_file:
+                if count >= len(embeddings):
+                    raise ValueError("Snapshot has more chunks than embeddings")
+                chunk = json.loads(line)
+                yield (
+                    uuid.UUID(chunk["id"]) if keep_ids else uuid.uuid4(),
+                    kbase_id,
+                    chunk.get("source_uri"),
+                    chunk["content"],
+                    content_hash(chunk["content"]),
+                    metadata_json(chunk.get("metadata")),
+                    np.asarray(embeddings[count], dtype=np.float32),
+                )
+                count += 1
+        if count != len(embeddings):
+            raise ValueError(f"Snapshot has {len(embeddings)} embeddings but {count} chunks")
+
+    return await copy_kbase_documents(
+        rows(),
+        batch_size=batch_size,
+        columns=("id", "kbase_id", "source_uri", "content", "content_hash", "metadata", "embedding"),
+        skip_duplicates=True,
+        kbase_id=kbase_id,
+    )
+
+
+def iter_snapshot_tar(directory: str) -> Iterator[bytes]:
+    """
+    Stream a snapshot directory as an uncompressed tar, one bounded chunk at a time.
+    The tar is assembled by hand because tarfile buffers each member in full when writing to a stream.
+    """
+    for name in SNAPSHOT_FILES:
+        path = os.path.join(directory, name)
+        size = os.path.getsize(path)
+        info = tarfile.TarInfo(name=name)
+        info.size = size
+        info.mtime = int(os.path.getmtime(path))
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+        if size % TAR_BLOCK_SIZE:
+            yield b"\0" * (TAR_BLOCK_SIZE - size % TAR_BLOCK_SIZE)
+    # End-of-archive marker.
+    yield b"\0" * (TAR_BLOCK_SIZE * 2)
+
+
+def extract_snapshot_tar(fileobj: BinaryIO, directory: str) -> None:
+    """
+    Extract a snapshot tar from a (non-seekable) stream. Only the known snapshot files are
+    accepted, so a crafted archive cannot write outside the directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+        for member in tar:
+            if member.name not in SNAPSHOT_FILES or not member.isfile():
+                raise ValueError(f"Unexpected entry in snapshot archive: {member.name}")
+            source = tar.extractfile(member)
+            with open(os.path.join(directory, member.name), "wb") as target:
+                while True:
+                    data = source.read(STREAM_CHUNK_SIZE)
+                    if not data:
+                        break
+                    target.write(data)
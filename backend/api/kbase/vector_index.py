@@ -0,0 +1,157 @@
+"""
+Helpers for per-kbase approximate nearest neighbour (ANN) indexes on kbase_documents.
+
+kbase_documents.embedding is an untyped `vector` column because different knowledge
+bases use different embedding models. pgvector can only index typed columns, so each
+kbase gets a partial expression index over `embedding::vector(<dim>)` restricted to
+its own rows. Queries must use the exact same expression (see embedding_expression)
+and an inlined kbase_id for the planner to pick the index.
+"""
+import uuid
+from typing import Optional
+
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import Float, cast, func
+from sqlalchemy.sql.elements import ColumnElement
+from backend.api.kbase.math_helpers import binary_quantize
+
+# pgvector distance operators per metric.
+DISTANCE_OPERATORS = {
+    "l2": "<->",
+    "cosine": "<=>",
+    "ip": "<#>",
+}
+
+# Operator class suffix per metric; prefixed with the storage type (vector_/halfvec_).
+OPERATOR_CLASSES = {
+    "l2": "l2_ops",
+    "cosine": "cosine_ops",
+    "ip": "ip_ops",
+}
+
+INDEX_TYPES = ("hnsw", "ivfflat")
+
+# Optional compact copies of the embedding used for a coarse first-stage search.
+QUANTIZATIONS = ("halfvec", "binary")
+
+# How many coarse candidates to fetch per requested result before the
+# full-precision rerank; binary quantization loses far more ranking signal.
+DEFAULT_OVERSAMPLE = {
+    "halfvec": 2,
+    "binary": 10,
+}
+
+# pgvector refuses to build HNSW/IVFFlat indexes on vector columns above 2000
+# dimensions; halfvec raises that ceiling to 4000 (enough for text-embedding-3-large).
+MAX_VECTOR_INDEX_DIMS = 2000
+MAX_HALFVEC_INDEX_DIMS = 4000
+
+
+def index_name(kbase_id: uuid.UUID) -> str:
+    """ Name of the ANN index for a kbase. Postgres identifiers are capped at 63 chars. """
+    return f"ix_kbase_documents_embedding_{kbase_id.hex}"
+
+
+def index_storage_type(embedding_dim: int) -> str:
+    """ The vector type the index is built over: 'vector' when possible, otherwise 'halfvec'. """
+    if embedding_dim <= MAX_VECTOR_INDEX_DIMS:
+        return "vector"
+    if embedding_dim <= MAX_HALFVEC_INDEX_DIMS:
+        return "halfvec"
+    raise ValueError(
+        f"Embeddings with {embedding_dim} dimensions exceed the {MAX_HALFVEC_INDEX_DIMS} dimension limit for ANN indexes"
+    )
+
+
+def embedding_expression(column, embedding_dim: Optional[int], indexed: bool) -> ColumnElement:
+    """
+    Expression to order by for a vector search.
+
+    For an indexed kbase this is the typed cast the partial index was built on,
+    otherwise the raw column (exact scan).
+    """
+    if not indexed or not embedding_dim:
+        return column
+    if index_storage_type(embedding_dim) == "halfvec":
+        return cast(column, HALFVEC(embedding_dim))
+    return cast(column, Vector(embedding_dim))
+
+
+def quantized_distance(table, query_embedding, embedding_dim: Optional[int], quantization: str, distance_metric: str, indexed: bool) -> ColumnElement:
+    """
+    Coarse-stage distance over the quantized column of kbase_documents.
+
+    halfvec keeps the kbase's metric; binary uses Hamming distance (<~>) against
+    the sign bits of the query, mirroring pgvector's binary_quantize.
+    query_embedding is either a list of floats or a SQL vector expression (batched search).
+    """
+    typed = indexed and bool(embedding_dim)
+    is_expression = isinstance(query_embedding, ColumnElement)
+    if quantization == "halfvec":
+        column = cast(table.c.embedding_half, HALFVEC(embedding_dim)) if typed else table.c.embedding_half
+        if is_expression:
+            query_embedding = cast(query_embedding, HALFVEC(embedding_dim) if embedding_dim else HALFVEC)
+        return column.op(DISTANCE_OPERATORS[distance_metric], return_type=Float)(query_embedding)
+    if quantization == "binary":
+        # Stored as bit varying; Hamming distance needs a fixed-length bit(dim) on both sides.
+        column = cast(table.c.embedding_bq, BIT(embedding_dim)) if embedding_dim else table.c.embedding_bq
+        if is_expression:
+            query_bits = func.binary_quantize(query_embedding)
+            query_bits = cast(query_bits, BIT(embedding_dim)) if embedding_dim else query_bits
+        else:
+            query_bits = binary_quantize(query_embedding)
+        return column.op("<~>", return_type=Float)(query_bits)
+    raise ValueError(f"Unsupported quantization: {quantization}")
+
+
+def build_create_index_sql(
+    kbase_id: uuid.UUID,
+    embedding_dim: int,
+    distance_metric: str,
+    index_type: str,
+    index_params: Optional[dict] = None,
+    quantization: Optional[str] = None,
+    concurrently: bool = False,
+) -> str:
+    """
+    Build the CREATE INDEX statement for a kbase's partial ANN index.
+    With quantization set, the index covers the quantized column used by the coarse search.
+    concurrently builds without blocking writes to kbase_documents; it cannot run in a transaction.
+
+    All values are validated or typed (UUID, int) before being inlined; DDL cannot take bind parameters.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    if distance_metric not in OPERATOR_CLASSES:
+        raise ValueError(f"Unsupported distance metric: {distance_metric}")
+
+    embedding_dim = int(embedding_dim)
+    if quantization == "binary":
+        # Hamming-distance indexes on bit columns allow up to 64000 dimensions.
+        column, opclass = f"embedding_bq::bit({embedding_dim})", "bit_hamming_ops"
+    elif quantization == "halfvec":
+        if embedding_dim > MAX_HALFVEC_INDEX_DIMS:
+            raise ValueError(f"halfvec indexes support at most {MAX_HALFVEC_INDEX_DIMS} dimensions")
+        column, opclass = f"embedding_half::halfvec({embedding_dim})", f"halfvec_{OPERATOR_CLASSES[distance_metric]}"
+    elif quantization is None:
+        storage = index_storage_type(embedding_dim)
+        column, opclass = f"embedding::{storage}({embedding_dim})", f"{storage}_{OPERATOR_CLASSES[distance_metric]}"
+    else:
+        raise ValueError(f"Unsupported quantization: {quantization}")
+    params = index_params or {}
+
+    if index_type == "hnsw":
+        with_clause = f"m = {int(params.get('m', 16))}, ef_construction = {int(params.get('ef_construction', 64))}"
+    else:
+        with_clause = f"lists = {int(params.get('lists', 100))}"
+
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name(kbase_id)} ON kbase_documents "
+        f"USING {index_type} (({column}) {opclass}) "
+        f"WITH ({with_clause}) "
+        f"WHERE kbase_id = '{uuid.UUID(str(kbase_id))}'"
+    )
+
+
+def build_drop_index_sql(kbase_id: uuid.UUID, concurrently: bool = False) -> str:
+    return f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {index_name(kbase_id)}"
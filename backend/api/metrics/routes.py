@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.api.kbase.embedder_registry import embedder_registry
+from backend.api.kbase.embedding_cache import query_embedding_cache
+from backend.api.kbase.persistent_embedding_cache import embedding_cache_store
+from backend.api.kbase.retrieval_cache import retrieval_cache
+from backend.api.kbase.rerank_stage import rerank_cache
+from backend.util.auth_utils import validate_admin, TokenData
+from backend.util.logging import SetupLogging
+from backend.util.rate_governor import rate_governor
+from backend.util.tracing import latency_histograms
+
+router = APIRouter()
+logger = SetupLogging()
+
+@router.get("")
+async def get_metrics(
+    current_user: TokenData = Depends(validate_admin),
+):
+    """
+    Per-stage latency histograms of this process (see backend/util/tracing.py),
+    the query-embedding / persistent embedding / retrieval / rerank cache counters, the embedders in use
+    and the provider rate-limit state.
+    """
+    try:
+        return {
+            "latency": latency_histograms.snapshot(),
+            "caches": {
+                "query_embedding": query_embedding_cache.stats(),
+                "embedding_store": embedding_cache_store.stats(),
+                "retrieval": retrieval_cache.stats(),
+                "rerank": rerank_cache.stats(),
+            },
+            "embedders": embedder_registry.stats(),
+            "rate_limits": rate_governor.stats(),
+        }
+    except Exception as e:
+        logger.error(f"Error in get_metrics endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/latency")
+async def reset_latency_metrics(
+    current_user: TokenData = Depends(validate_admin),
+):
+    """
+    Clear the latency histograms, e.g. before a load test.
+    """
+    latency_histograms.reset()
+    return {"status": "success"}
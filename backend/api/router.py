@@ -7,6 +7,7 @@ from backend.api.session.routes import router as session_router
 from backend.api.assistant.routes import router as assistant_router
 from backend.api.account.routes import router as account_router
 from backend.api.index.routes import router as index_router
+from backend.api.metrics.routes import router as metrics_router
 
 
 router = APIRouter(prefix="/opsloom-api/v1")
@@ -54,4 +55,10 @@ router.include_router(
     index_router,
     prefix="/index",
     tags=["Index"],
-)
\ No newline at end of file
+)
+
+router.include_router(
+    metrics_router,
+    prefix="/metrics",
+    tags=["Metrics"],
+)
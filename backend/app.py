@@ -15,6 +15,7 @@ from slowapi.util import get_remote_address
 from slowapi import _rate_limit_exceeded_handler
 
 from backend.api.router import router
+from backend.api.kbase.embedders.clients import embedder_clients
 
 from backend.lib.exceptions import (
     account_not_found_exception_handler,
@@ -46,6 +47,7 @@ async def lifespan(app: FastAPI):
     # INITIAL ROUTINES
     yield
     # CLOSING ROUTINES
+    await embedder_clients.aclose()
 
 # handle static files
 if get_config_value("STATIC") == "true":
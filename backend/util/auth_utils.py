@@ -164,6 +164,19 @@ async def validate_user(
         logger.error(f"Error decoding token: {e}")
         return None
 
+async def validate_admin(current_user: Optional[TokenData] = Depends(validate_user)) -> TokenData:
+    """
+    Allow only users of the accounts listed in ADMIN_ACCOUNT_SHORT_CODES (comma-separated).
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    admin_accounts = {
+        code.strip() for code in (get_config_value("ADMIN_ACCOUNT_SHORT_CODES") or "").split(",") if code.strip()
+    }
+    if current_user.account_short_code not in admin_accounts:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return current_user
+
 class PasswordService:
     def __init__(self):
         self.ph = PasswordHasher()
@@ -14,6 +14,15 @@ engine = create_async_engine(
     # max_overflow=10
 )
 
+# Session factory for code that needs its own session outside a request
+# (CLI commands, concurrent fan-out). Same settings as the request dependency.
+async_session_maker = sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """
     FastAPI dependency that provides an AsyncSession.
@@ -21,13 +30,7 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """
     # print(f"Creating new session for request")
 
-    async_session = sessionmaker(
-        bind=engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-        autoflush=False,
-    )
-    async with async_session() as session:
+    async with async_session_maker() as session:
         try:
             yield session
         finally:
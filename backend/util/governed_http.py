@@ -0,0 +1,76 @@
+"""
+httpx transport that sends every request through rate_governor.
+
+For provider clients whose calls are made inside a library rather than by our code (the
+pydantic-ai agent, the LangChain/LangGraph deep-research chains), wrapping each call site in
+rate_governor.call is not possible. Instead their SDK client is given an httpx client built on
+this transport:
+
+    AsyncOpenAI(http_client=governed_http_client("openai"), max_retries=0)
+
+Each request is held back while its model would exceed the configured limits. A 429 response
+is turned into a retry by the governor, which honours Retry-After and pauses the model for
+every caller. The SDK's own retries should be disabled, so 429s are not retried twice.
+
+The model is read from the JSON body. The token cost is estimated from the body size plus
+CHAT_COMPLETION_TOKENS_ESTIMATE, since the prompt is not tokenized here.
+"""
+import json
+from typing import Optional, Tuple
+
+import httpx
+
+from backend.util.config import get_config_value
+from backend.util.rate_governor import rate_governor
+
+COMPLETION_TOKENS_ESTIMATE = int(get_config_value("CHAT_COMPLETION_TOKENS_ESTIMATE") or 512)
+# Rough bytes of request JSON per prompt token.
+BYTES_PER_TOKEN = 4
+
+
+class RateLimitedResponse(Exception):
+    """ A 429 response, raised so that rate_governor retries it (see rate_limit_retry_after). """
+
+    def __init__(self, request: httpx.Request, response: httpx.Response):
+        super().__init__(f"HTTP 429 from {request.url}")
+        self.response = response
+        self.status_code = response.status_code
+
+
+class RateGovernedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, provider: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.provider = provider
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = _model_and_tokens(request)
+
+        async def send() -> httpx.Response:
+            response = await self._transport.handle_async_request(request)
+            if response.status_code == 429:
+                await response.aread()
+                await response.aclose()
+                raise RateLimitedResponse(request, response)
+            return response
+
+        return await rate_governor.call(self.provider, model, send, tokens=tokens)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def governed_http_client(provider: str, timeout: float = 60.0) -> httpx.AsyncClient:
+    """ An httpx.AsyncClient whose requests are rate-governed under provider. """
+    return httpx.AsyncClient(transport=RateGovernedTransport(provider), timeout=timeout)
+
+
+def _model_and_tokens(request: httpx.Request) -> Tuple[str, int]:
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        return "unknown", 0
+    try:
+        model = json.loads(body).get("model") or "unknown"
+    except (ValueError, AttributeError):
+        model = "unknown"
+    return model, len(body) // BYTES_PER_TOKEN + COMPLETION_TOKENS_ESTIMATE
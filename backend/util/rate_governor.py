@@ -0,0 +1,302 @@
+"""
+Client-side rate limiting for model providers (embeddings and chat).
+
+Every provider call goes through the process-wide `rate_governor`, which keeps a sliding
+60-second window of the requests and tokens sent per (provider, model) and holds callers back
+while another call would exceed the configured requests-per-minute / tokens-per-minute:
+
+    embeddings = await rate_governor.call("openai", model, lambda: client.embeddings.create(...), tokens=n)
+
+A call rejected with a rate-limit error (HTTP 429, Bedrock throttling) is retried after the
+provider's Retry-After, or an exponential backoff when there is none, plus random jitter; the
+whole (provider, model) is paused meanwhile, so other callers do not walk into the same limit.
+
+Callers have a priority, taken from a context variable: interactive by default, background
+inside `with background_priority():` (bulk ingest). Background callers wait while any
+interactive caller is waiting for the same limit, so chat is not queued behind an ingest.
+
+Limits come from RATE_LIMITS, a comma-separated list of `provider/model=rpm:tpm` entries
+(either side may be empty), e.g.
+`openai/text-embedding-3-large=3000:1000000,openai/gpt-4o=500:30000`; unlisted models use
+RATE_LIMIT_DEFAULT_RPM / RATE_LIMIT_DEFAULT_TPM, and no limit when those are unset.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+from backend.util.config import get_config_value
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+WINDOW_SECONDS = 60.0
+# Waiting callers re-check at least this often (limits free up as the window slides).
+MAX_POLL_SECONDS = 1.0
+THROTTLING_ERROR_CODES = ("ThrottlingException", "TooManyRequestsException")
+
+_priority: ContextVar[str] = ContextVar("rate_limit_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """ Provider calls made inside the block yield to interactive ones. """
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimitedError(Exception):
+    """ A provider kept rejecting a call with rate-limit errors after all retries. """
+
+
+def rate_limit_retry_after(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Whether exc is a provider rate-limit error and, if the provider said so, how many seconds
+    to wait. Understands OpenAI's status_code / retry-after(-ms) headers and botocore throttling codes.
+    """
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        return response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES, None
+    if getattr(exc, "status_code", None) != 429:
+        return False, None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return True, float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return True, float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return True, None
+
+
+class _Bucket:
+    """ Sliding window of (sent_at, tokens) for one (provider, model). """
+    __slots__ = ("rpm", "tpm", "sent", "tokens_in_window", "paused_until", "waiting", "throttled", "waited_seconds")
+
+    def __init__(self, rpm: Optional[int], tpm: Optional[int]):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.sent: Deque[Tuple[float, int]] = deque()
+        self.tokens_in_window = 0
+        self.paused_until = 0.0
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def reserve(self, tokens: int, priority: str, now: float) -> float:
+        """ Record the call and return 0 if it may go now, else how long to wait before asking again. """
+        while self.sent and self.sent[0][0] <= now - WINDOW_SECONDS:
+            self.tokens_in_window -= self.sent.popleft()[1]
+        if now < self.paused_until:
+            return self.paused_until - now
+        if priority == BACKGROUND and self.waiting[INTERACTIVE]:
+            return MAX_POLL_SECONDS
+        if self.rpm and len(self.sent) >= self.rpm:
+            return self.sent[0][0] + WINDOW_SECONDS - now
+        if self.tpm and self.sent and self.tokens_in_window + tokens > self.tpm:
+            # A call larger than the whole token limit is let through on an empty window rather
+            # than never: wait until everything sent so far has left the window.
+            if tokens > self.tpm:
+                return self.sent[-1][0] + WINDOW_SECONDS - now
+            excess = self.tokens_in_window + tokens - self.tpm
+            for sent_at, sent_tokens in self.sent:
+                excess -= sent_tokens
+                if excess <= 0:
+                    return sent_at + WINDOW_SECONDS - now
+        self.sent.append((now, tokens))
+        self.tokens_in_window += tokens
+        return 0.0
+
+
+class RateLimitGovernor:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None,
+        default_rpm: Optional[int] = None,
+        default_tpm: Optional[int] = None,
+        max_retries: int = 5,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+    ):
+        """
+        Args:
+            limits: {"provider/model": (rpm, tpm)}; None (or 0) means unlimited.
+            default_rpm / default_tpm: Limits for models not in limits.
+            max_retries: Rate-limit errors retried per call before giving up.
+            base_backoff_seconds / max_backoff_seconds: Exponential backoff when the provider
+                sends no Retry-After.
+        """
+        self.limits = limits or {}
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._buckets: Dict[str, _Bucket] = {}
+        # Buckets are shared by the event loop and worker threads (sync clients).
+        self._lock = threading.Lock()
+
+    async def call(
+        self,
+        provider: str,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+    ) -> T:
+        """ Await fn() once the limits allow it, retrying rate-limit errors with backoff. """
+        key = _key(provider, model)
+        attempt = 0
+        while True:
+            # After a rate-limit error the key is paused, so this also waits out the backoff.
+            await self._acquire_async(key, tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                self._on_error(key, e, attempt)
+            attempt += 1
+
+    def call_sync(
+        self,
+        provider: str,
+        model: str,
+        fn: Callable[[], T],
+        tokens: int = 0,
+    ) -> T:
+        """ call() for blocking clients; sleeps the calling thread, so never use it on the event loop. """
+        key = _key(provider, model)
+        attempt = 0
+        while True:
+            self._acquire_sync(key, tokens)
+            try:
+                return fn()
+            except Exception as e:
+                self._on_error(key, e, attempt)
+            attempt += 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key: {
+                    "rpm_limit": bucket.rpm,
+                    "tpm_limit": bucket.tpm,
+                    "requests_last_minute": sum(1 for sent_at, _ in bucket.sent if sent_at > now - WINDOW_SECONDS),
+                    "tokens_last_minute": sum(n for sent_at, n in bucket.sent if sent_at > now - WINDOW_SECONDS),
+                    "waiting": dict(bucket.waiting),
+                    "throttled": bucket.throttled,
+                    "waited_seconds": round(bucket.waited_seconds, 3),
+                    "paused_for_seconds": round(max(0.0, bucket.paused_until - now), 3),
+                }
+                for key, bucket in sorted(self._buckets.items())
+            }
+
+    async def _acquire_async(self, key: str, tokens: int) -> None:
+        priority = _priority.get()
+        delay = self._reserve(key, tokens, priority, waiting=False)
+        if not delay:
+            return
+        self._set_waiting(key, priority, 1)
+        try:
+            while delay:
+                await asyncio.sleep(min(delay, MAX_POLL_SECONDS))
+                delay = self._reserve(key, tokens, priority, waiting=True)
+        finally:
+            self._set_waiting(key, priority, -1)
+
+    def _acquire_sync(self, key: str, tokens: int) -> None:
+        priority = _priority.get()
+        delay = self._reserve(key, tokens, priority, waiting=False)
+        if not delay:
+            return
+        self._set_waiting(key, priority, 1)
+        try:
+            while delay:
+                time.sleep(min(delay, MAX_POLL_SECONDS))
+                delay = self._reserve(key, tokens, priority, waiting=True)
+        finally:
+            self._set_waiting(key, priority, -1)
+
+    def _reserve(self, key: str, tokens: int, priority: str, waiting: bool) -> float:
+        with self._lock:
+            bucket = self._bucket(key)
+            # A waiting interactive caller must not be held back by its own entry in the waiting count.
+            if waiting and priority == INTERACTIVE:
+                bucket.waiting[INTERACTIVE] -= 1
+            try:
+                delay = bucket.reserve(tokens, priority, time.monotonic())
+            finally:
+                if waiting and priority == INTERACTIVE:
+                    bucket.waiting[INTERACTIVE] += 1
+            if delay:
+                bucket.waited_seconds += min(delay, MAX_POLL_SECONDS)
+            return delay
+
+    def _set_waiting(self, key: str, priority: str, change: int) -> None:
+        with self._lock:
+            self._bucket(key).waiting[priority] += change
+
+    def _on_error(self, key: str, exc: Exception, attempt: int) -> None:
+        """ Re-raise exc unless it is a retryable rate-limit error; otherwise pause the key for the backoff. """
+        rate_limited, retry_after = rate_limit_retry_after(exc)
+        if not rate_limited:
+            raise exc
+        if attempt >= self.max_retries:
+            raise RateLimitedError(f"{key} is still rate limited after {self.max_retries} retries") from exc
+        backoff = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+        delay = (retry_after if retry_after is not None else backoff) + random.uniform(0, backoff / 2)
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.throttled += 1
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + delay)
+        logger.warning(f"{key} rate limited (attempt {attempt + 1}); retrying in {delay:.2f}s")
+
+    def _bucket(self, key: str) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rpm, tpm = self.limits.get(key, (self.default_rpm, self.default_tpm))
+            bucket = self._buckets[key] = _Bucket(rpm, tpm)
+        return bucket
+
+
+def _key(provider: str, model: str) -> str:
+    return f"{provider.lower()}/{model}"
+
+
+def parse_rate_limits(value: Optional[str]) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """ Parse RATE_LIMITS ("provider/model=rpm:tpm,..."). """
+    limits = {}
+    for entry in (value or "").split(","):
+        if not entry.strip():
+            continue
+        key, _, spec = entry.partition("=")
+        rpm, _, tpm = spec.partition(":")
+        provider, _, model = key.strip().partition("/")
+        limits[_key(provider, model)] = (int(rpm) if rpm.strip() else None, int(tpm) if tpm.strip() else None)
+    return limits
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+# Singleton instance
+rate_governor = RateLimitGovernor(
+    limits=parse_rate_limits(get_config_value("RATE_LIMITS")),
+    default_rpm=_optional_int(get_config_value("RATE_LIMIT_DEFAULT_RPM")),
+    default_tpm=_optional_int(get_config_value("RATE_LIMIT_DEFAULT_TPM")),
+    max_retries=int(get_config_value("RATE_LIMIT_MAX_RETRIES") or 5),
+)
@@ -0,0 +1,197 @@
+"""
+Request-scoped latency tracing.
+
+A RequestTrace is started once per request and held in a context variable, so code anywhere
+below it (assistants, vector stores, caches) can time its work with `stage(...)` without the
+trace being passed around. Every stage is also recorded into a process-wide histogram
+registry, which the admin metrics endpoint exposes; stages timed outside a request only
+go to the histograms. Stages may nest (e.g. "retrieval" contains "embed_query" and
+"vector_search"), so stage durations do not add up to the total.
+
+    trace = start_trace("chat", assistant_id=...)
+    with stage("vector_search"):
+        ...
+    finish_trace(trace)   # logs the trace and records its total
+"""
+import bisect
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from backend.util.logging import SetupLogging
+
+logger = SetupLogging()
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is unbounded.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+T = TypeVar("T")
+
+
+class RequestTrace:
+    __slots__ = ("trace_id", "name", "fields", "stages", "started")
+
+    def __init__(self, name: str, **fields):
+        self.trace_id = str(uuid.uuid4())
+        self.name = name
+        self.fields = fields
+        self.stages: List[Tuple[str, float]] = []
+        self.started = time.perf_counter()
+
+    def record(self, stage_name: str, elapsed_ms: float) -> None:
+        self.stages.append((stage_name, elapsed_ms))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self) -> dict:
+        """
+        Stage durations in milliseconds, summed per stage name (a stage can run more than once,
+        or concurrently, e.g. one vector search per kbase in a federated search).
+        """
+        stage_ms: Dict[str, float] = {}
+        for stage_name, elapsed_ms in self.stages:
+            stage_ms[stage_name] = round(stage_ms.get(stage_name, 0.0) + elapsed_ms, 2)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            **self.fields,
+            "stage_ms": stage_ms,
+            "total_ms": round(self.elapsed_ms(), 2),
+        }
+
+
+class LatencyHistogram:
+    """ Fixed-bucket histogram; quantiles are estimated by interpolating within a bucket. """
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max_ms)
+            seen += bucket_count
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5), 2),
+            "p95_ms": round(self.quantile(0.95), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class HistogramRegistry:
+    """ Per-stage latency histograms for the process; safe to update from worker threads. """
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+# Singleton instance
+latency_histograms = HistogramRegistry()
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start_trace(name: str, **fields) -> RequestTrace:
+    """ Start a trace and make it the current one for this task (and tasks it spawns). """
+    trace = RequestTrace(name, **fields)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def record_stage(stage_name: str, elapsed_ms: float) -> None:
+    """ Record a duration measured by the caller (e.g. time to first token). """
+    latency_histograms.observe(stage_name, elapsed_ms)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(stage_name, elapsed_ms)
+
+
+@contextmanager
+def stage(stage_name: str) -> Iterator[None]:
+    """ Time the enclosed block as a stage of the current trace. """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, (time.perf_counter() - started) * 1000)
+
+
+async def timed_stream(stream: AsyncIterator[T], prefix: str = "llm") -> AsyncIterator[T]:
+    """
+    Pass a stream through, recording `<prefix>_first_token` (time until the first item)
+    and `<prefix>_stream` (time until the stream ends).
+    """
+    started = time.perf_counter()
+    first = True
+    try:
+        async for item in stream:
+            if first:
+                record_stage(f"{prefix}_first_token", (time.perf_counter() - started) * 1000)
+                first = False
+            yield item
+    finally:
+        record_stage(f"{prefix}_stream", (time.perf_counter() - started) * 1000)
+
+
+def finish_trace(trace: RequestTrace) -> dict:
+    """
+    Record the trace total, log it as structured fields and return it as a dict.
+    The fields are passed as `extra` for structured handlers and repeated as JSON in the
+    message for the plain-text formatter.
+    """
+    fields = trace.to_dict()
+    latency_histograms.observe(f"{trace.name}.total", fields["total_ms"])
+    logger.info(f"trace {json.dumps(fields, default=str)}", extra={"trace": fields})
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+    return fields
@@ -0,0 +1,88 @@
+"""
+Insert throughput of the binary COPY path (PostgresVectorStore.add_document) against the
+ORM path (add_document_orm).
+
+Creates a temporary knowledge base, loads random unit vectors into it with both paths and
+deletes it again, so it only needs a reachable database:
+
+    uv run python -m benchmarks.copy_insert_benchmark --chunks 5000 --dim 1536
+
+Each document is one insert call; --chunks-per-document controls how many chunks it holds.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List, Optional
+
+import dotenv
+
+dotenv.load_dotenv()
+
+import numpy as np
+from sqlalchemy import delete
+from backend.api.kbase.kbase_schema import KbaseDocumentORM
+from backend.api.kbase.models import Chunk, Document, KnowledgeBase
+from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.repository import KbaseRepository
+from backend.util.database import async_session_maker
+
+
+def _random_documents(label: str, n_chunks: int, per_document: int, dim: int, rng: np.random.Generator) -> List[Document]:
+    vectors = rng.standard_normal((n_chunks, dim), dtype=np.float32)
+    chunks = [
+        Chunk(content=f"{label} benchmark chunk {i} " * 20, embeddings=vector.tolist(), metadata={"page": i})
+        for i, vector in enumerate(vectors)
+    ]
+    return [Document(chunks=chunks[i:i + per_document]) for i in range(0, n_chunks, per_document)]
+
+
+async def _time_inserts(insert, documents: List[Document]) -> float:
+    start = time.perf_counter()
+    for document in documents:
+        await insert(document)
+    return time.perf_counter() - start
+
+
+async def run(n_chunks: int, per_document: int, dim: int, quantization: Optional[str], batch_size: Optional[int]) -> None:
+    rng = np.random.default_rng(0)
+    async with async_session_maker() as session:
+        repository = KbaseRepository(session)
+        kbase = await repository.create_kbase(KnowledgeBase(
+            name=f"copy-benchmark-{uuid.uuid4().hex[:8]}",
+            embedding_dim=dim,
+            distance_metric="cosine",
+            quantization=quantization,
+        ))
+        if not kbase:
+            raise SystemExit("Failed to create the benchmark knowledge base")
+        try:
+            store = PostgresVectorStore.from_kbase(session, kbase)
+            print(f"{n_chunks} chunks in documents of {per_document}, {dim} dims, quantization={quantization or 'none'}")
+            print(f"{'path':<6} {'seconds':>9} {'rows/s':>10}")
+            timings = {
+                "orm": await _time_inserts(store.add_document_orm, _random_documents("orm", n_chunks, per_document, dim, rng)),
+                "copy": await _time_inserts(
+                    lambda document: store.add_document(document, batch_size=batch_size),
+                    _random_documents("copy", n_chunks, per_document, dim, rng),
+                ),
+            }
+            for path, seconds in timings.items():
+                print(f"{path:<6} {seconds:>9.2f} {n_chunks / seconds:>10.0f}")
+            print(f"speedup {timings['orm'] / timings['copy']:.1f}x")
+        finally:
+            await session.execute(delete(KbaseDocumentORM).where(KbaseDocumentORM.kbase_id == kbase.id))
+            await session.commit()
+            await repository.delete_kbase(kbase.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000, help="chunks inserted per path")
+    parser.add_argument("--chunks-per-document", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--quantization", choices=["halfvec", "binary"],
+                        help="also fill the quantized column, as a quantized kbase would")
+    parser.add_argument("--batch-size", type=int, help="COPY batch size (KBASE_COPY_BATCH_SIZE by default)")
+    args = parser.parse_args()
+    asyncio.run(run(args.chunks, args.chunks_per_document, args.dim, args.quantization, args.batch_size))
@@ -0,0 +1,68 @@
+"""
+Compare the NumPy MMR implementation against the pure-Python reference.
+
+Run from the repository root:
+
+    uv run python -m benchmarks.mmr_benchmark
+
+Candidate pools are sized like PostgresVectorStore.mmr_by_vector (10 * k).
+The reference implementation is cubic in k and takes minutes per case at
+k=50 / 3072 dims; pass --python-max-k 20 to skip those cases.
+"""
+import argparse
+import random
+import time
+from typing import Any, Callable, List, Tuple
+
+from backend.api.kbase.math_helpers import mmr, mmr_python
+
+K_VALUES = (5, 20, 50)
+DIMENSIONS = (1024, 1536, 3072)
+
+
+def _random_vectors(n: int, dim: int, rng: random.Random) -> List[List[float]]:
+    return [[rng.gauss(0.0, 1.0) for _ in range(dim)] for _ in range(n)]
+
+
+def _time_call(fn: Callable, repeat: int) -> Tuple[float, Any]:
+    """Return the best wall time in milliseconds over `repeat` runs, and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def run(repeat: int, seed: int, python_max_k: int) -> None:
+    rng = random.Random(seed)
+    print(f"{'k':>4} {'dim':>6} {'pool':>6} {'python ms':>12} {'numpy ms':>12} {'speedup':>9} {'same order':>11}")
+    for dim in DIMENSIONS:
+        for k in K_VALUES:
+            n_candidates = k * 10
+            query = _random_vectors(1, dim, rng)[0]
+            vectors = _random_vectors(n_candidates, dim, rng)
+            chunks = list(range(n_candidates))
+
+            numpy_ms, actual = _time_call(lambda: mmr(query, vectors, chunks, k), repeat)
+            if k > python_max_k:
+                print(f"{k:>4} {dim:>6} {n_candidates:>6} {'skipped':>12} {numpy_ms:>12.2f} {'-':>9} {'-':>11}")
+                continue
+
+            # A single run of the reference is enough to dwarf the NumPy timings.
+            python_ms, expected = _time_call(lambda: mmr_python(query, vectors, chunks, k), 1)
+            print(
+                f"{k:>4} {dim:>6} {n_candidates:>6} {python_ms:>12.2f} {numpy_ms:>12.2f} "
+                f"{python_ms / numpy_ms:>8.1f}x {str(expected == actual):>11}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions per case (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--python-max-k", type=int, default=max(K_VALUES), help="skip the reference for larger k")
+    args = parser.parse_args()
+    run(args.repeat, args.seed, args.python_max_k)
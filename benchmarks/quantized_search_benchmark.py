@@ -0,0 +1,106 @@
+"""
+Recall vs. latency of two-stage quantized search against exact search.
+
+Uses the chunks of an existing knowledge base as queries (a random sample of
+their own embeddings), so it needs a populated database:
+
+    uv run python -m benchmarks.quantized_search_benchmark visa_kbase --queries 100 --k 10
+
+The quantized columns must be populated for the kbase
+(`python -m backend.api.kbase.cli backfill-quantized <kbase> --quantization ...`).
+Each query excludes nothing, so the query chunk itself is part of both result sets.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Optional
+from uuid import UUID
+
+import dotenv
+
+dotenv.load_dotenv()
+
+from sqlalchemy import func, select
+from backend.api.kbase.kbase_schema import KbaseDocumentORM
+from backend.api.kbase.pgvectorstore import PostgresVectorStore
+from backend.api.kbase.repository import KbaseRepository
+from backend.util.database import async_session_maker
+
+OVERSAMPLE_FACTORS = (1, 2, 4, 10, 20)
+
+
+async def _time_searches(store: PostgresVectorStore, queries: List[List[float]], k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        retrieved = await store.similarity_search_by_vector(query, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({chunk.id for chunk in retrieved.chunks})
+    return latencies, results
+
+
+def _summary(latencies: List[float]) -> str:
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    return f"{statistics.median(latencies):>9.2f} {p95:>9.2f}"
+
+
+async def run(kbase_name: str, n_queries: int, k: int, quantizations: List[str], ef_search: Optional[int]) -> None:
+    async with async_session_maker() as session:
+        repository = KbaseRepository(session)
+        try:
+            kbase = await repository.get_kbase_by_id(UUID(kbase_name))
+        except ValueError:
+            kbase = await repository.get_kbase_by_name(kbase_name)
+        if not kbase:
+            raise SystemExit(f"Knowledge base not found: {kbase_name}")
+
+        sample = await session.execute(
+            select(KbaseDocumentORM.embedding)
+            .where(KbaseDocumentORM.kbase_id == kbase.id)
+            .order_by(func.random())
+            .limit(n_queries)
+        )
+        queries = [list(row.embedding) for row in sample]
+        if not queries:
+            raise SystemExit(f"Knowledge base {kbase.name} has no chunks")
+
+        exact = PostgresVectorStore(session, kbase.id, kbase.embedding_dim, kbase.distance_metric)
+        exact_latencies, truth = await _time_searches(exact, queries, k)
+
+        print(f"{len(queries)} queries, k={k}, kbase={kbase.name} ({kbase.embedding_dim} dims, index={kbase.index_type})")
+        print(f"{'mode':<10} {'oversample':>10} {'recall@k':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        print(f"{'exact':<10} {'-':>10} {1.0:>9.3f} {_summary(exact_latencies)}")
+
+        for quantization in quantizations:
+            for oversample in OVERSAMPLE_FACTORS:
+                index_params = {**(kbase.index_params or {}), "oversample": oversample}
+                if ef_search:
+                    index_params["ef_search"] = ef_search
+                store = PostgresVectorStore(
+                    session,
+                    kbase.id,
+                    embedding_dim=kbase.embedding_dim,
+                    distance_metric=kbase.distance_metric,
+                    index_type=kbase.index_type if kbase.quantization == quantization else None,
+                    index_params=index_params,
+                    quantization=quantization,
+                )
+                latencies, results = await _time_searches(store, queries, k)
+                recall = statistics.mean(
+                    len(expected & actual) / max(len(expected), 1) for expected, actual in zip(truth, results)
+                )
+                print(f"{quantization:<10} {oversample:>10} {recall:>9.3f} {_summary(latencies)}")
+            await session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kbase", help="knowledge base name or UUID")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--quantization", choices=["halfvec", "binary"], action="append",
+                        help="quantization(s) to test; defaults to both")
+    parser.add_argument("--ef-search", type=int, help="hnsw.ef_search for the coarse stage")
+    args = parser.parse_args()
+    asyncio.run(run(args.kbase, args.queries, args.k, args.quantization or ["halfvec", "binary"], args.ef_search))
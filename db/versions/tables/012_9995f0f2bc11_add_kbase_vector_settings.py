@@ -0,0 +1,63 @@
+"""add embedding dimension, distance metric and ANN index settings to kbase
+
+Revision ID: 9995f0f2bc11
+Revises: 1a19a754eb8f
+Create Date: 2026-10-16 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9995f0f2bc11'
+down_revision: Union[str, None] = '1a19a754eb8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+    columns = {column["name"] for column in inspector.get_columns("kbase")}
+
+    if "embedding_dim" not in columns:
+        op.add_column("kbase", sa.Column("embedding_dim", sa.Integer(), nullable=True))
+    if "distance_metric" not in columns:
+        op.add_column("kbase", sa.Column("distance_metric", sa.String(16), nullable=False, server_default="l2"))
+    if "index_type" not in columns:
+        op.add_column("kbase", sa.Column("index_type", sa.String(16), nullable=True))
+    if "index_params" not in columns:
+        op.add_column("kbase", sa.Column("index_params", JSONB(), nullable=True))
+
+    # Backfill the dimension of kbases that already have documents.
+    op.execute("""
+        UPDATE kbase k
+        SET embedding_dim = (
+            SELECT vector_dims(d.embedding) FROM kbase_documents d WHERE d.kbase_id = k.id LIMIT 1
+        )
+        WHERE k.embedding_dim IS NULL
+    """)
+
+
+def downgrade() -> None:
+    # Drop any per-kbase partial ANN indexes before removing their settings.
+    op.execute("""
+        DO $$
+        DECLARE idx record;
+        BEGIN
+            FOR idx IN SELECT indexname FROM pg_indexes
+                       WHERE tablename = 'kbase_documents' AND indexname LIKE 'ix_kbase_documents_embedding_%'
+            LOOP
+                EXECUTE format('DROP INDEX IF EXISTS %I', idx.indexname);
+            END LOOP;
+        END $$;
+    """)
+    op.drop_column("kbase", "index_params")
+    op.drop_column("kbase", "index_type")
+    op.drop_column("kbase", "distance_metric")
+    op.drop_column("kbase", "embedding_dim")
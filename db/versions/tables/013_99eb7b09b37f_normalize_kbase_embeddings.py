@@ -0,0 +1,31 @@
+"""unit-normalize stored kbase embeddings
+
+Embeddings are now normalized at ingest so that cosine, inner product and L2
+searches rank identically and scores can be read straight from the database.
+Rewrite existing rows to match. Requires pgvector >= 0.7 for l2_normalize.
+
+Revision ID: 99eb7b09b37f
+Revises: 9995f0f2bc11
+Create Date: 2026-10-16 10:02:17.553108
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99eb7b09b37f'
+down_revision: Union[str, None] = '9995f0f2bc11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE kbase_documents SET embedding = l2_normalize(embedding)")
+
+
+def downgrade() -> None:
+    # The original magnitudes are not kept; normalized vectors remain valid for every metric.
+    pass
@@ -0,0 +1,42 @@
+"""add quantized embedding columns for two-stage search
+
+Revision ID: 9b38b9867d20
+Revises: 99eb7b09b37f
+Create Date: 2026-10-16 11:24:50.871042
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b38b9867d20'
+down_revision: Union[str, None] = '99eb7b09b37f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    document_columns = {column["name"] for column in inspector.get_columns("kbase_documents")}
+    if "embedding_half" not in document_columns:
+        op.add_column("kbase_documents", sa.Column("embedding_half", HALFVEC(), nullable=True))
+    if "embedding_bq" not in document_columns:
+        op.add_column("kbase_documents", sa.Column("embedding_bq", BIT(varying=True), nullable=True))
+
+    kbase_columns = {column["name"] for column in inspector.get_columns("kbase")}
+    if "quantization" not in kbase_columns:
+        op.add_column("kbase", sa.Column("quantization", sa.String(16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("kbase", "quantization")
+    op.drop_column("kbase_documents", "embedding_bq")
+    op.drop_column("kbase_documents", "embedding_half")
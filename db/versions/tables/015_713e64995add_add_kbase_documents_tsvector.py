@@ -0,0 +1,47 @@
+"""add generated tsvector column and GIN index for hybrid search
+
+Revision ID: 713e64995add
+Revises: 9b38b9867d20
+Create Date: 2026-10-16 12:40:03.118276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '713e64995add'
+down_revision: Union[str, None] = '9b38b9867d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    columns = {column["name"] for column in inspector.get_columns("kbase_documents")}
+    if "content_tsv" not in columns:
+        # Stored generated column: Postgres keeps it in sync with content on every insert/update.
+        op.add_column(
+            "kbase_documents",
+            sa.Column("content_tsv", TSVECTOR(), sa.Computed("to_tsvector('english', content)", persisted=True)),
+        )
+
+    indexes = {index["name"] for index in inspector.get_indexes("kbase_documents")}
+    if "ix_kbase_documents_content_tsv" not in indexes:
+        op.create_index(
+            "ix_kbase_documents_content_tsv",
+            "kbase_documents",
+            ["content_tsv"],
+            postgresql_using="gin",
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kbase_documents_content_tsv", table_name="kbase_documents")
+    op.drop_column("kbase_documents", "content_tsv")
@@ -0,0 +1,45 @@
+"""add JSONB chunk metadata column and GIN index for filtered search
+
+Revision ID: c41d7e2a9b63
+Revises: 713e64995add
+Create Date: 2026-10-16 14:02:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e2a9b63'
+down_revision: Union[str, None] = '713e64995add'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    columns = {column["name"] for column in inspector.get_columns("kbase_documents")}
+    if "metadata" not in columns:
+        op.add_column("kbase_documents", sa.Column("metadata", JSONB(), nullable=True))
+
+    indexes = {index["name"] for index in inspector.get_indexes("kbase_documents")}
+    if "ix_kbase_documents_metadata" not in indexes:
+        # jsonb_path_ops only supports @>, but is smaller and faster than the default opclass.
+        op.create_index(
+            "ix_kbase_documents_metadata",
+            "kbase_documents",
+            ["metadata"],
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"},
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kbase_documents_metadata", table_name="kbase_documents")
+    op.drop_column("kbase_documents", "metadata")
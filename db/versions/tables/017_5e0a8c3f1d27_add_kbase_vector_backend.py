@@ -0,0 +1,32 @@
+"""add per-kbase vector search backend
+
+Revision ID: 5e0a8c3f1d27
+Revises: c41d7e2a9b63
+Create Date: 2026-10-16 15:31:08.640251
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0a8c3f1d27'
+down_revision: Union[str, None] = 'c41d7e2a9b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+    columns = {column["name"] for column in inspector.get_columns("kbase")}
+
+    if "vector_backend" not in columns:
+        op.add_column("kbase", sa.Column("vector_backend", sa.String(16), nullable=False, server_default="postgres"))
+
+
+def downgrade() -> None:
+    op.drop_column("kbase", "vector_backend")
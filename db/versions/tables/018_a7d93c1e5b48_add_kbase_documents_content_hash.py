@@ -0,0 +1,82 @@
+"""add content hash to kbase_documents for chunk deduplication
+
+Revision ID: a7d93c1e5b48
+Revises: 5e0a8c3f1d27
+Create Date: 2026-10-16 16:12:44.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+from backend.api.kbase.content_hash import content_hash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d93c1e5b48'
+down_revision: Union[str, None] = '5e0a8c3f1d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    columns = {column["name"] for column in inspector.get_columns("kbase_documents")}
+    if "content_hash" not in columns:
+        op.add_column("kbase_documents", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    # Hashes are computed with content_hash itself rather than in SQL, so backfilled rows hash
+    # exactly like chunks ingested later (Postgres' NFKC and whitespace classes differ from
+    # Python's). Existing duplicates are kept, but only the first copy of each content gets a
+    # hash: NULLs never conflict, so the unique constraint can be created without deleting rows.
+    _backfill_content_hashes(conn)
+
+    constraints = {constraint["name"] for constraint in inspector.get_unique_constraints("kbase_documents")}
+    if "uq_kbase_documents_kbase_id_content_hash" not in constraints:
+        op.create_unique_constraint(
+            "uq_kbase_documents_kbase_id_content_hash",
+            "kbase_documents",
+            ["kbase_id", "content_hash"],
+        )
+
+
+def _backfill_content_hashes(conn) -> None:
+    """
+    Hash every unhashed row, one kbase at a time, in batches fetched by primary key. Within a
+    kbase the lowest id of each content gets the hash; rows hashed by an earlier run count as
+    first copies, so the backfill can be re-run.
+    """
+    select_rows = sa.text(
+        "SELECT id, content FROM kbase_documents WHERE id IN :ids ORDER BY id"
+    ).bindparams(sa.bindparam("ids", expanding=True))
+    update_hash = sa.text("UPDATE kbase_documents SET content_hash = :content_hash WHERE id = :id")
+
+    kbase_ids = conn.execute(sa.text("SELECT DISTINCT kbase_id FROM kbase_documents WHERE content_hash IS NULL")).scalars().all()
+    for kbase_id in kbase_ids:
+        params = {"kbase_id": kbase_id}
+        seen = set(conn.execute(sa.text(
+            "SELECT content_hash FROM kbase_documents WHERE kbase_id = :kbase_id AND content_hash IS NOT NULL"
+        ), params).scalars())
+        ids = conn.execute(sa.text(
+            "SELECT id FROM kbase_documents WHERE kbase_id = :kbase_id AND content_hash IS NULL ORDER BY id"
+        ), params).scalars().all()
+        for start in range(0, len(ids), BACKFILL_BATCH_SIZE):
+            updates = []
+            for row in conn.execute(select_rows, {"ids": ids[start:start + BACKFILL_BATCH_SIZE]}):
+                digest = content_hash(row.content)
+                if digest not in seen:
+                    seen.add(digest)
+                    updates.append({"id": row.id, "content_hash": digest})
+            if updates:
+                conn.execute(update_hash, updates)
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_kbase_documents_kbase_id_content_hash", "kbase_documents", type_="unique")
+    op.drop_column("kbase_documents", "content_hash")
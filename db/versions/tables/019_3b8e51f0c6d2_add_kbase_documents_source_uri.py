@@ -0,0 +1,56 @@
+"""add source document URI to kbase_documents for incremental re-indexing
+
+Revision ID: 3b8e51f0c6d2
+Revises: a7d93c1e5b48
+Create Date: 2026-10-16 17:05:19.734602
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e51f0c6d2'
+down_revision: Union[str, None] = 'a7d93c1e5b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    columns = {column["name"] for column in inspector.get_columns("kbase_documents")}
+    if "source_uri" not in columns:
+        op.add_column("kbase_documents", sa.Column("source_uri", sa.Text(), nullable=True))
+
+    # DocumentLoader has always recorded the S3 URI as metadata.link.
+    op.execute("""
+        UPDATE kbase_documents
+        SET source_uri = metadata->>'link'
+        WHERE source_uri IS NULL AND metadata->>'link' IS NOT NULL
+    """)
+    # Rows stored before migration 016 have no metadata and no other record of their source, so
+    # they cannot be backfilled: re-uploading their document cannot replace them. Re-upload the
+    # affected kbases' documents, then remove the leftovers with
+    #     python -m backend.api.kbase.cli purge-unsourced-chunks <kbase>
+    unsourced = conn.execute(sa.text(
+        "SELECT kbase_id, count(*) FROM kbase_documents WHERE source_uri IS NULL GROUP BY kbase_id"
+    )).all()
+    for kbase_id, count in unsourced:
+        print(
+            f"KnowledgeBase {kbase_id} has {count} chunks without a source document; re-upload its documents "
+            f"and run the purge-unsourced-chunks CLI command to remove stale ones."
+        )
+
+    indexes = {index["name"] for index in inspector.get_indexes("kbase_documents")}
+    if "ix_kbase_documents_kbase_id_source_uri" not in indexes:
+        op.create_index("ix_kbase_documents_kbase_id_source_uri", "kbase_documents", ["kbase_id", "source_uri"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kbase_documents_kbase_id_source_uri", table_name="kbase_documents")
+    op.drop_column("kbase_documents", "source_uri")
@@ -0,0 +1,34 @@
+"""create embedding_cache table shared across knowledge bases
+
+Revision ID: c41f7a9e2d85
+Revises: 3b8e51f0c6d2
+Create Date: 2026-10-16 18:02:41.518307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.engine.reflection import Inspector
+
+from backend.api.kbase.kbase_schema import Base, EmbeddingCacheORM
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a9e2d85'
+down_revision: Union[str, None] = '3b8e51f0c6d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    if "embedding_cache" not in inspector.get_table_names():
+        # Creates the ix_embedding_cache_last_used_at index as well.
+        Base.metadata.create_all(bind=conn, tables=[EmbeddingCacheORM.__table__])
+
+
+def downgrade() -> None:
+    op.drop_table("embedding_cache")
@@ -0,0 +1,39 @@
+"""add per-kbase embedding provider and model
+
+Revision ID: 8d2f61c0b7a4
+Revises: c41f7a9e2d85
+Create Date: 2026-10-16 19:12:27.904316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f61c0b7a4'
+down_revision: Union[str, None] = 'c41f7a9e2d85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+    columns = {column["name"] for column in inspector.get_columns("kbase")}
+
+    # Existing kbases were all indexed with the OpenAI default, which the server defaults record.
+    if "embedding_provider" not in columns:
+        op.add_column("kbase", sa.Column("embedding_provider", sa.String(32), nullable=False, server_default="openai"))
+    if "embedding_model" not in columns:
+        op.add_column(
+            "kbase",
+            sa.Column("embedding_model", sa.String(255), nullable=False, server_default="text-embedding-3-large"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("kbase", "embedding_model")
+    op.drop_column("kbase", "embedding_provider")
@@ -0,0 +1,42 @@
+"""create kbase_document_sources to track which sources share deduplicated chunks
+
+Revision ID: e6b1d94a3f07
+Revises: 8d2f61c0b7a4
+Create Date: 2026-10-17 09:41:52.216048
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.engine.reflection import Inspector
+
+from backend.api.kbase.kbase_schema import Base, KbaseDocumentSourceORM
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b1d94a3f07'
+down_revision: Union[str, None] = '8d2f61c0b7a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+
+    if "kbase_document_sources" not in inspector.get_table_names():
+        # Creates the ix_kbase_document_sources_kbase_id_content_hash index as well.
+        Base.metadata.create_all(bind=conn, tables=[KbaseDocumentSourceORM.__table__])
+
+    # Every stored chunk is contained in the source it was stored for. Sources that were
+    # deduplicated against another source's rows before this table existed are not known.
+    op.execute("""
+        INSERT INTO kbase_document_sources (kbase_id, source_uri, content_hash)
+        SELECT kbase_id, source_uri, content_hash FROM kbase_documents
+        WHERE source_uri IS NOT NULL AND content_hash IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("kbase_document_sources")
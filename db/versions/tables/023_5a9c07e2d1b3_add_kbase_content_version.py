@@ -0,0 +1,32 @@
+"""add kbase content_version for cross-process flat store invalidation
+
+Revision ID: 5a9c07e2d1b3
+Revises: e6b1d94a3f07
+Create Date: 2026-10-17 10:26:03.118594
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9c07e2d1b3'
+down_revision: Union[str, None] = 'e6b1d94a3f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = Inspector.from_engine(conn)
+    columns = {column["name"] for column in inspector.get_columns("kbase")}
+
+    if "content_version" not in columns:
+        op.add_column("kbase", sa.Column("content_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("kbase", "content_version")
@@ -0,0 +1,24 @@
+import pytest
+
+from backend.api.assistant.query_classifier import is_chit_chat
+
+
+@pytest.mark.parametrize("query", ["hi", "Hello there!", "thanks a lot!", "Thank you so much 🙏", "great", "bye, have a nice day"])
+def test_small_talk_is_chit_chat(query):
+    assert is_chit_chat(query)
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    "hi?",
+    "thanks, what is the refund policy",
+    "yes",
+    "no",
+    "ok",
+    "sure, that one",
+    "yeah do it",
+    "thanks for 2024",
+    "hi hi hi hi hi hi hi hi hi",
+])
+def test_content_questions_and_answers_are_not_chit_chat(query):
+    assert not is_chit_chat(query)
@@ -0,0 +1,61 @@
+from backend.api.index.chunk_diff import diff_source
+
+
+class InMemoryKbase:
+    """ The kbase_documents / kbase_document_sources bookkeeping of IndexService, without Postgres. """
+
+    def __init__(self):
+        self.rows = {}     # content hash -> source it was stored for
+        self.sources = {}  # source -> content hashes it contains
+
+    def upload(self, source, hashes):
+        previous = self.sources.get(source, set())
+        elsewhere = {
+            digest for other, contained in self.sources.items() if other != source for digest in contained
+        }
+        diff = diff_source(hashes, previous, set(self.rows) & set(hashes), previous & elsewhere)
+        for position in diff.embed:
+            self.rows[hashes[position]] = source
+        self.sources[source] = set(hashes)
+        for digest in diff.orphaned:
+            del self.rows[digest]
+        return diff
+
+
+def test_new_source_embeds_first_occurrence_of_each_new_hash():
+    diff = diff_source(["a", "b", "a", "c"], previous=set(), stored={"c"}, referenced_elsewhere=set())
+    assert diff.embed == [0, 1]
+    assert diff.unchanged == 0
+    assert diff.removed == set()
+
+
+def test_reupload_counts_unchanged_and_orphans_removed_content():
+    diff = diff_source(["a", "c"], previous={"a", "b"}, stored={"a"}, referenced_elsewhere=set())
+    assert diff.embed == [1]
+    assert diff.unchanged == 1
+    assert diff.removed == {"b"}
+    assert diff.orphaned == {"b"}
+
+
+def test_content_another_source_contains_is_not_orphaned():
+    diff = diff_source(["a"], previous={"a", "b"}, stored={"a"}, referenced_elsewhere={"b"})
+    assert diff.removed == {"b"}
+    assert diff.orphaned == set()
+
+
+def test_reupload_of_a_keeps_content_b_deduplicated_against():
+    kbase = InMemoryKbase()
+    kbase.upload("s3://a", ["shared", "only-a"])
+    diff_b = kbase.upload("s3://b", ["shared", "only-b"])
+    # B's copy of the shared chunk is not stored again ...
+    assert diff_b.embed == [1]
+    assert kbase.rows["shared"] == "s3://a"
+
+    # ... so when A drops it, the row stays for B.
+    kbase.upload("s3://a", ["only-a"])
+    assert "shared" in kbase.rows
+
+    # Once B drops it too, nothing contains it and it is deleted.
+    diff_b = kbase.upload("s3://b", ["only-b"])
+    assert diff_b.orphaned == {"shared"}
+    assert "shared" not in kbase.rows
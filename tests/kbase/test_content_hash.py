@@ -0,0 +1,21 @@
+import pytest
+
+from backend.api.kbase.content_hash import content_hash, normalize_content
+
+
+@pytest.mark.parametrize("variant", [
+    "Visa fees\n\nare  due",
+    "  Visa fees are due\t",
+    "Visa fees are due",        # no-break space
+    "Visa fees　are due",   # em space, ideographic space
+    "Visa fees are\u0085due",   # line separator, next line
+    "Ｖｉｓａ fees are due",          # fullwidth letters (NFKC)
+])
+def test_whitespace_and_compatibility_variants_hash_the_same(variant):
+    assert normalize_content(variant) == "Visa fees are due"
+    assert content_hash(variant) == content_hash("Visa fees are due")
+
+
+def test_case_and_punctuation_are_kept():
+    assert content_hash("Visa fees are due") != content_hash("visa fees are due")
+    assert content_hash("Visa fees are due") != content_hash("Visa fees are due.")
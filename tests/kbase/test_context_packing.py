@@ -0,0 +1,56 @@
+import uuid
+
+from backend.api.kbase.context_packing import merge_overlapping, pack_context
+from backend.api.kbase.models import Chunk
+
+KBASE_ID = uuid.uuid4()
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def _chunk(content, document="doc-1"):
+    return Chunk(content=content, kbase_id=KBASE_ID, metadata={"id": document} if document else {})
+
+
+def test_merge_overlapping_needs_a_real_overlap():
+    assert merge_overlapping("alpha beta gamma delta epsilon", "gamma delta epsilon zeta", min_overlap=10) == (
+        "alpha beta gamma delta epsilon zeta"
+    )
+    assert merge_overlapping("one two", "two three", min_overlap=10) is None
+
+
+def test_overlapping_chunks_of_a_document_are_merged():
+    first = _chunk("The refund window is thirty days from delivery of the order.")
+    second = _chunk("thirty days from delivery of the order. Opened items are excluded.")
+    context = pack_context([first, second], max_tokens=100, count_tokens=count_words)
+    assert context == "The refund window is thirty days from delivery of the order. Opened items are excluded."
+
+
+def test_contained_and_other_document_chunks():
+    span = _chunk("Shipping is free above fifty euros within the European Union.")
+    contained = _chunk("free above fifty euros")
+    other = _chunk("free above fifty euros", document="doc-2")
+    context = pack_context([span, contained, other], max_tokens=100, count_tokens=count_words)
+    assert context.split("\n\n") == [span.content, other.content]
+
+
+def test_budget_skips_chunks_that_do_not_fit():
+    long = _chunk(" ".join(["word"] * 20), document=None)
+    short = _chunk("a short answer", document=None)
+    best = _chunk("the best hit", document=None)
+    context = pack_context([best, long, short], max_tokens=8, count_tokens=count_words)
+    # Separators cost 0 words; the 20-word chunk does not fit, the short one still does.
+    assert context == "the best hit\n\na short answer"
+    assert count_words(context) <= 8
+
+
+def test_a_bridging_chunk_joins_two_spans():
+    first = _chunk("Employees accrue two vacation days for every month worked.")
+    third = _chunk("Unused days expire at the end of March the following year.")
+    bridge = _chunk("for every month worked. Unused days expire at the end of March")
+    context = pack_context([first, third, bridge], max_tokens=100, count_tokens=count_words)
+    assert context == (
+        "Employees accrue two vacation days for every month worked. Unused days expire at the end of March the following year."
+    )
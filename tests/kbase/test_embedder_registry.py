@@ -0,0 +1,25 @@
+from backend.api.kbase.embedder_factory import get_embedder
+from backend.api.kbase.embedder_registry import embedder_key
+from backend.api.kbase.models import KnowledgeBase
+
+
+def test_key_is_stable_once_the_dimension_is_recorded():
+    before = KnowledgeBase(name="kb")
+    after = before.model_copy(update={"embedding_dim": 3072})
+    assert embedder_key(before) == embedder_key(after) == ("openai", "text-embedding-3-large", 3072)
+
+    titan = KnowledgeBase(name="kb", embedding_provider="boto3")
+    assert embedder_key(titan) == ("boto3", "amazon.titan-embed-text-v2:0", 1024)
+
+
+def test_shortened_and_unknown_models_keep_their_dimension():
+    assert embedder_key(KnowledgeBase(name="kb", embedding_dim=256))[2] == 256
+    assert embedder_key(KnowledgeBase(name="kb", embedding_model="custom-model"))[2] is None
+
+
+def test_native_dimension_is_cached_as_native():
+    native = get_embedder("openai", api_key="sk-test", dimensions=3072)
+    unset = get_embedder("openai", api_key="sk-test")
+    shortened = get_embedder("openai", api_key="sk-test", dimensions=256)
+    assert native.dimensions == unset.dimensions == 0
+    assert shortened.dimensions == 256
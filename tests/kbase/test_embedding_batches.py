@@ -0,0 +1,33 @@
+import asyncio
+
+from backend.api.kbase.embedding_batches import embed_in_batches, plan_batches
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def test_plan_batches_reports_each_batch_token_count():
+    texts = ["a b", "c d e", "f", "g h i j k l"]
+    assert plan_batches(texts, max_items=10, max_tokens=6, count_tokens=count_words) == [(0, 3, 6), (3, 4, 6)]
+    assert plan_batches(texts, max_items=3) == [(0, 3, None), (3, 4, None)]
+
+
+def test_embed_in_batches_tokenizes_each_text_once():
+    texts = ["a b", "c d e", "f", "g h i j k l"]
+    counted = []
+    calls = []
+
+    def count_tokens(text):
+        counted.append(text)
+        return count_words(text)
+
+    async def embed_batch(batch, tokens):
+        calls.append((batch, tokens))
+        return [[float(len(text))] for text in batch]
+
+    embeddings = asyncio.run(embed_in_batches(texts, embed_batch, max_items=10, max_tokens=6, count_tokens=count_tokens))
+
+    assert embeddings == [[3.0], [5.0], [1.0], [11.0]]
+    assert counted == texts
+    assert calls == [(["a b", "c d e", "f"], 6), (["g h i j k l"], 6)]
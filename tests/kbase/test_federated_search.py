@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from backend.api.kbase.federated_search import FederatedVectorSearch
+from backend.api.kbase.models import KnowledgeBase
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+def _row(kbase, distance):
+    return SimpleNamespace(id=uuid4(), kbase_id=kbase.id, content="c", metadata={}, distance=distance)
+
+
+def test_kbases_must_share_an_embedder():
+    with pytest.raises(ValueError):
+        FederatedVectorSearch([
+            KnowledgeBase(name="a", embedding_model="text-embedding-3-large"),
+            KnowledgeBase(name="b", embedding_model="text-embedding-3-small"),
+        ])
+    with pytest.raises(ValueError):
+        FederatedVectorSearch([KnowledgeBase(name="a", embedding_dim=256), KnowledgeBase(name="b", embedding_dim=1024)])
+
+    # A kbase that has not been indexed yet will be indexed at the model's native size.
+    with pytest.raises(ValueError):
+        FederatedVectorSearch([KnowledgeBase(name="a", embedding_dim=256), KnowledgeBase(name="b")])
+    search = FederatedVectorSearch([KnowledgeBase(name="a", embedding_dim=3072), KnowledgeBase(name="b")])
+    assert search.embedder_key == ("openai", "text-embedding-3-large", 3072)
+
+
+def test_any_strategy_applies_each_kbase_cutoffs():
+    strict = KnowledgeBase(name="strict", index_params={"max_distance": 0.5})
+    gapped = KnowledgeBase(name="gapped", index_params={"score_gap": 0.2})
+    open_ = KnowledgeBase(name="open")
+    rows = [
+        _row(strict, 0.1), _row(gapped, 0.2), _row(open_, 0.3), _row(strict, 0.4),
+        _row(strict, 0.6), _row(gapped, 0.9), _row(open_, 1.0),
+    ]
+    search = FederatedVectorSearch([strict, gapped, open_], session_factory=lambda: FakeSession(rows), strategy="any")
+
+    chunks, timings = asyncio.run(search._search_any([1.0, 0.0], 10, None, include_embeddings=False))
+
+    kept = {kbase.name: [chunk.distance for chunk in chunks if chunk.kbase_id == kbase.id] for kbase in (strict, gapped, open_)}
+    # strict drops hits beyond 0.5; gapped stops at the similarity drop from 0.98 to 0.595.
+    assert kept == {"strict": [0.1, 0.4], "gapped": [0.2], "open": [0.3, 1.0]}
+    assert [timing.num_results for timing in timings] == [2, 1, 2]
+
+
+def test_hybrid_search_merges_on_each_kbase_rrf_score(monkeypatch):
+    from backend.api.kbase.models import Chunk, RetrievedChunks
+    from backend.api.kbase.pgvectorstore import PostgresVectorStore
+
+    a, b = KnowledgeBase(name="a"), KnowledgeBase(name="b")
+    # a's best hit matched one side only; b's second hit matched both, so it outranks it.
+    hits = {
+        a.id: [Chunk(content="a1", rrf_score=1 / 61, score=0.9)],
+        b.id: [Chunk(content="b1", rrf_score=2 / 61, score=0.8), Chunk(content="b2", rrf_score=1 / 61 + 1 / 62, score=0.7)],
+    }
+
+    async def hybrid_search(self, query_text, query_embedding, k=4, **kwargs):
+        return RetrievedChunks(chunks=hits[self.kbase_id])
+
+    monkeypatch.setattr(PostgresVectorStore, "hybrid_search", hybrid_search)
+    search = FederatedVectorSearch([a, b], session_factory=lambda: FakeSession([]))
+
+    result = asyncio.run(search.hybrid_search("q", [1.0, 0.0], k=3))
+
+    assert [chunk.content for chunk in result.chunks] == ["b1", "b2", "a1"]
+    assert [chunk.kbase_id for chunk in result.chunks] == [b.id, b.id, a.id]
@@ -0,0 +1,81 @@
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+
+from backend.api.kbase.flat_vector_store import FlatVectorStore, FlatVectorStoreRegistry, read_snapshot_version
+from backend.api.kbase.models import Chunk, KnowledgeBase
+
+
+def make_kbase(kbase_id, content_version, **kwargs):
+    return KnowledgeBase(id=kbase_id, name="flat", vector_backend="flat", content_version=content_version, **kwargs)
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    kbase_id = uuid.uuid4()
+    store = FlatVectorStore(
+        kbase_id=kbase_id,
+        matrix=np.eye(2, dtype=np.float32),
+        chunks=[Chunk(content="a"), Chunk(content="b")],
+        content_version=3,
+    )
+    store.save(str(tmp_path / str(kbase_id)))
+    return kbase_id, tmp_path
+
+
+@pytest.fixture
+def postgres_loads(monkeypatch):
+    """ Record FlatVectorStore.from_postgres calls instead of querying a database. """
+    calls = []
+
+    async def from_postgres(session, kbase, batch_size=5000):
+        calls.append(kbase.content_version)
+        return FlatVectorStore(kbase_id=kbase.id, content_version=kbase.content_version)
+
+    monkeypatch.setattr(FlatVectorStore, "from_postgres", staticmethod(from_postgres))
+    return calls
+
+
+def test_save_records_content_version(snapshot):
+    kbase_id, directory = snapshot
+    assert read_snapshot_version(str(directory / str(kbase_id))) == 3
+
+
+def test_current_snapshot_is_loaded(snapshot, postgres_loads):
+    kbase_id, directory = snapshot
+    registry = FlatVectorStoreRegistry(snapshot_dir=str(directory))
+    store = asyncio.run(registry.get(None, make_kbase(kbase_id, 3)))
+    assert len(store) == 2
+    assert postgres_loads == []
+
+
+def test_stale_snapshot_falls_back_to_postgres(snapshot, postgres_loads):
+    # E.g. a restart after chunks were written: the snapshot on disk is older than the kbase.
+    kbase_id, directory = snapshot
+    registry = FlatVectorStoreRegistry(snapshot_dir=str(directory))
+    store = asyncio.run(registry.get(None, make_kbase(kbase_id, 4)))
+    assert postgres_loads == [4]
+    assert store.content_version == 4
+
+
+def test_store_is_reloaded_when_another_process_wrote(postgres_loads):
+    kbase_id = uuid.uuid4()
+    registry = FlatVectorStoreRegistry()
+    first = asyncio.run(registry.get(None, make_kbase(kbase_id, 1)))
+    # A request that read the kbase before the load does not force a reload.
+    assert asyncio.run(registry.get(None, make_kbase(kbase_id, 0))) is first
+    asyncio.run(registry.get(None, make_kbase(kbase_id, 2)))
+    assert postgres_loads == [1, 2]
+
+
+def test_search_settings_are_refreshed(postgres_loads):
+    kbase_id = uuid.uuid4()
+    registry = FlatVectorStoreRegistry()
+    asyncio.run(registry.get(None, make_kbase(kbase_id, 1)))
+    store = asyncio.run(registry.get(
+        None, make_kbase(kbase_id, 1, distance_metric="cosine", index_params={"max_distance": 0.5})
+    ))
+    assert store.distance_metric == "cosine"
+    assert store.index_params == {"max_distance": 0.5}
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from backend.api.kbase.math_helpers import distance_to_similarity, mmr, mmr_python, relevance_cutoff, similarity_to_distance
+
+
+@pytest.mark.parametrize("lambda_", [0.0, 0.3, 0.5, 1.0])
+def test_mmr_selects_like_the_reference_implementation(lambda_):
+    rng = np.random.default_rng(7)
+    query = rng.normal(size=32).tolist()
+    vectors = rng.normal(size=(40, 32)).tolist()
+    chunks = list(range(40))
+    assert mmr(query, vectors, chunks, 10, lambda_) == mmr_python(query, vectors, chunks, 10, lambda_)
+
+
+def test_mmr_with_precomputed_similarities_and_small_pools():
+    rng = np.random.default_rng(11)
+    query = rng.normal(size=16)
+    query /= np.linalg.norm(query)
+    vectors = rng.normal(size=(12, 16))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunks = list(range(12))
+    expected = mmr_python(query.tolist(), vectors.tolist(), chunks, 5)
+    assert mmr(query, vectors, chunks, 5, query_similarities=(vectors @ query).tolist()) == expected
+    assert sorted(mmr(query, vectors[:3], chunks[:3], 5)) == [0, 1, 2]
+    assert mmr(query, [], [], 5) == []
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine", "ip"])
+def test_distance_and_similarity_round_trip(metric):
+    for similarity in (-0.5, 0.0, 0.42, 1.0):
+        distance = similarity_to_distance(similarity, metric)
+        assert distance_to_similarity(distance, metric) == pytest.approx(similarity)
+
+
+def test_l2_distance_is_euclidean():
+    a = np.array([1.0, 0.0])
+    b = np.array([0.6, 0.8])
+    assert distance_to_similarity(float(np.linalg.norm(a - b)), "l2") == pytest.approx(float(a @ b))
+
+
+def test_relevance_cutoff():
+    distances = [0.1, 0.2, 0.3, 0.9]
+    scores = [0.95, 0.9, 0.85, 0.4]
+    assert relevance_cutoff(distances, scores) == 4
+    assert relevance_cutoff(distances, scores, max_distance=0.25) == 2
+    assert relevance_cutoff(distances, scores, score_gap=0.3) == 3
+    assert relevance_cutoff([None, 0.5], [None, None], max_distance=0.1) == 1
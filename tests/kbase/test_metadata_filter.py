@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import Column, MetaData, Table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+
+from backend.api.kbase.metadata_filter import build_metadata_filter, filter_cache_key, matches_metadata_filter
+
+documents = Table("kbase_documents", MetaData(), Column("metadata", JSONB))
+
+
+def _sql(filter):
+    clause = build_metadata_filter(documents.c.metadata, filter)
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_no_filter_is_true():
+    assert _sql(None) == "true"
+    assert _sql({}) == "true"
+
+
+def test_equalities_are_one_containment():
+    sql = _sql({"title": "handbook.pdf", "lang": "en"})
+    assert sql.count("@>") == 1
+
+
+def test_in_and_prefix():
+    sql = _sql({"title": "handbook.pdf", "id": {"$in": ["a", "b"]}, "link": {"$prefix": "s3://bucket/50%_off/"}})
+    assert sql.count("@>") == 3
+    assert " OR " in sql
+    assert "LIKE" in sql and "ESCAPE" in sql
+    # An empty $in matches nothing.
+    clause = build_metadata_filter(documents.c.metadata, {"id": {"$in": []}})
+    assert str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})) == "false"
+
+
+@pytest.mark.parametrize("filter", [
+    ["title"],
+    {"title": {"$regex": "x"}},
+    {"title": {"$in": "a"}},
+    {"title": {"$prefix": 1}},
+    {"title": {"$in": ["a"], "$prefix": "a"}},
+])
+def test_invalid_filters(filter):
+    with pytest.raises(ValueError):
+        build_metadata_filter(documents.c.metadata, filter)
+
+
+def test_python_evaluation_matches_jsonb_containment():
+    metadata = {"title": "handbook.pdf", "tags": ["hr", "policy"], "page": 3, "link": "s3://bucket/hr/a.pdf"}
+    assert matches_metadata_filter(metadata, {"title": "handbook.pdf", "tags": ["hr"]})
+    assert matches_metadata_filter(metadata, {"page": {"$in": [1, 3]}, "link": {"$prefix": "s3://bucket/hr/"}})
+    assert not matches_metadata_filter(metadata, {"tags": "hr"})
+    assert not matches_metadata_filter(metadata, {"page": True})
+    assert not matches_metadata_filter(metadata, {"missing": None})
+    assert not matches_metadata_filter(metadata, {"link": {"$prefix": "s3://bucket/it/"}})
+
+
+def test_cache_key_ignores_key_order():
+    assert filter_cache_key({"a": 1, "b": 2}) == filter_cache_key({"b": 2, "a": 1})
+    assert filter_cache_key(None) is None
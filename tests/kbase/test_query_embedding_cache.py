@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from backend.api.kbase.embedding_cache import QueryEmbeddingCache, normalize_query_text
+
+
+def test_normalize_query_text_collapses_whitespace_and_keeps_case():
+    assert normalize_query_text("  Visa\t fees \n") == "Visa fees"
+    assert normalize_query_text("Visa") != normalize_query_text("visa")
+
+
+def test_hits_and_lru_eviction():
+    cache = QueryEmbeddingCache(max_entries=2)
+    calls = []
+
+    async def embed(text):
+        calls.append(text)
+        return [float(len(text))]
+
+    async def main():
+        await cache.get_or_embed("openai", "m", "a", embed)
+        await cache.get_or_embed("openai", "m", "bb", embed)
+        await cache.get_or_embed("openai", "m", "a", embed)
+        await cache.get_or_embed("openai", "m", "ccc", embed)  # evicts "bb", the least recently used
+        await cache.get_or_embed("openai", "m", "a", embed)
+        await cache.get_or_embed("openai", "m", "bb", embed)
+
+    asyncio.run(main())
+    assert calls == ["a", "bb", "ccc", "bb"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_concurrent_misses_share_one_call():
+    cache = QueryEmbeddingCache()
+    calls = []
+
+    async def embed(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return [1.0, 2.0]
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_embed("openai", "m", "q", embed) for _ in range(5)))
+
+    assert asyncio.run(main()) == [[1.0, 2.0]] * 5
+    assert calls == ["q"]
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    cache = QueryEmbeddingCache()
+    release = None
+
+    async def embed(text):
+        await release.wait()
+        return [3.0]
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(cache.get_or_embed("openai", "m", "q", embed))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_embed("openai", "m", "q", embed))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == [3.0]
+    # The call completed and was cached although its caller went away.
+    assert cache.stats()["entries"] == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = QueryEmbeddingCache()
+
+    async def embed(text):
+        await asyncio.sleep(0)
+        raise RuntimeError("provider down")
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_embed("openai", "m", "q", embed) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,91 @@
+import asyncio
+
+from backend.api.kbase.base_reranker_gateway import BaseRerankerGateway
+from backend.api.kbase.models import Chunk
+from backend.api.kbase.rerank_stage import RerankCache, RerankStage
+
+
+class FakeReranker(BaseRerankerGateway):
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    @property
+    def name(self):
+        return "fake/reranker"
+
+    async def rerank(self, query, chunks, top_n):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        ranked = list(reversed(chunks))[:top_n]
+        return [chunk.model_copy(update={"rerank_score": 1.0 - i / 10}) for i, chunk in enumerate(ranked)]
+
+
+def _chunks():
+    return [Chunk(content=f"chunk {i}") for i in range(4)]
+
+
+def test_rerank_orders_and_caches():
+    chunks = _chunks()
+    reranker = FakeReranker()
+    stage = RerankStage(reranker, budget_ms=1000, cache=RerankCache())
+
+    first = asyncio.run(stage.rerank("query", chunks, 2))
+    again = asyncio.run(stage.rerank("query", list(reversed(chunks)), 2))
+
+    assert [chunk.id for chunk in first] == [chunks[3].id, chunks[2].id]
+    assert [chunk.id for chunk in again] == [chunk.id for chunk in first]
+    assert reranker.calls == 1
+
+
+def test_timeout_falls_back_to_vector_order():
+    chunks = _chunks()
+    reranker = FakeReranker(delay=1.0)
+    cache = RerankCache()
+    stage = RerankStage(reranker, budget_ms=20, cache=cache)
+
+    result = asyncio.run(stage.rerank("query", chunks, 3))
+
+    assert result == chunks[:3]
+    assert reranker.cancelled
+    # A fallback is not a ranking; it is not cached.
+    assert cache.stats()["entries"] == 0
+
+
+def test_error_falls_back_to_vector_order():
+    chunks = _chunks()
+    stage = RerankStage(FakeReranker(error=RuntimeError("provider down")), budget_ms=1000, cache=None)
+    assert asyncio.run(stage.rerank("query", chunks, 2)) == chunks[:2]
+
+
+def test_rerankers_are_shared_per_provider_model_and_key(monkeypatch):
+    import sys
+    from types import ModuleType
+
+    from backend.api.kbase import reranker_factory
+
+    class FakeCohereGateway:
+        def __init__(self, api_key, model):
+            self.api_key = api_key
+            self.model = model
+
+    module = ModuleType("backend.api.kbase.rerankers.cohere_reranker")
+    module.CohereRerankerGateway = FakeCohereGateway
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    monkeypatch.setattr(reranker_factory, "_rerankers", {})
+
+    first = reranker_factory.get_reranker("cohere", api_key="key-a", model="rerank-v3.5")
+    assert reranker_factory.get_reranker("Cohere", api_key="key-a", model="rerank-v3.5") is first
+    assert reranker_factory.get_reranker("cohere", api_key="key-b", model="rerank-v3.5") is not first
+    assert reranker_factory.get_reranker("cohere", api_key="key-a", model="rerank-english-v3.0") is not first
+    assert reranker_factory.get_reranker("lexical") is reranker_factory.get_reranker("lexical")
+    # Keys are only kept inside the gateways, never as cache keys.
+    assert not any("key-a" in part for key in reranker_factory._rerankers for part in key)
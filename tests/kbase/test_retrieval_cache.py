@@ -0,0 +1,70 @@
+import time
+import uuid
+
+import numpy as np
+
+from backend.api.kbase.models import Chunk, RetrievedChunks
+from backend.api.kbase.retrieval_cache import RetrievalCache
+
+KBASE_ID = uuid.uuid4()
+
+
+def _result(content):
+    return RetrievedChunks(chunks=[Chunk(content=content)])
+
+
+def _contents(result):
+    return [chunk.content for chunk in result.chunks] if result else None
+
+
+def test_near_duplicate_query_hits_within_its_signature():
+    cache = RetrievalCache(similarity_threshold=0.98)
+    cache.put(KBASE_ID, ("similarity", 4), [1.0, 0.0], _result("a"), cache.generation(KBASE_ID))
+    assert _contents(cache.get(KBASE_ID, ("similarity", 4), [1.0, 0.01])) == ["a"]
+    assert cache.get(KBASE_ID, ("similarity", 4), [0.0, 1.0]) is None
+    assert cache.get(KBASE_ID, ("similarity", 5), [1.0, 0.0]) is None
+    # A different dimension is a different embedding space, never a hit.
+    assert cache.get(KBASE_ID, ("similarity", 4), [1.0, 0.0, 0.0]) is None
+
+
+def test_rows_stay_aligned_through_eviction_and_growth():
+    cache = RetrievalCache(similarity_threshold=0.999, max_entries=20)
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(30, 8))
+    for i, vector in enumerate(vectors):
+        cache.put(KBASE_ID, "sig", vector.tolist(), _result(str(i)), cache.generation(KBASE_ID))
+    # The first 10 were evicted (removing rows moves others); the rest still map to their results.
+    for i, vector in enumerate(vectors):
+        assert _contents(cache.get(KBASE_ID, "sig", vector.tolist())) == (None if i < 10 else [str(i)])
+    assert cache.stats()["entries"] == 20
+
+
+def test_invalidate_drops_entries_and_rejects_stale_puts():
+    cache = RetrievalCache()
+    generation = cache.generation(KBASE_ID)
+    cache.put(KBASE_ID, "sig", [1.0, 0.0], _result("a"), generation)
+    cache.invalidate(KBASE_ID)
+    assert cache.get(KBASE_ID, "sig", [1.0, 0.0]) is None
+    cache.put(KBASE_ID, "sig", [1.0, 0.0], _result("stale"), generation)
+    assert cache.get(KBASE_ID, "sig", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_removed_on_lookup():
+    cache = RetrievalCache(ttl_seconds=0.01)
+    cache.put(KBASE_ID, "sig", [1.0, 0.0], _result("a"), cache.generation(KBASE_ID))
+    cache.put(KBASE_ID, "sig", [0.0, 1.0], _result("b"), cache.generation(KBASE_ID))
+    time.sleep(0.02)
+    assert cache.get(KBASE_ID, "sig", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_content_version_in_the_signature_separates_writes_from_other_processes():
+    from backend.api.kbase.models import KnowledgeBase
+    from backend.api.kbase.pgvectorstore import PostgresVectorStore
+
+    kbase = KnowledgeBase(name="kb", content_version=4)
+    before = PostgresVectorStore.from_kbase(None, kbase)._search_settings()
+    after = PostgresVectorStore.from_kbase(None, kbase.model_copy(update={"content_version": 5}))._search_settings()
+    assert before != after
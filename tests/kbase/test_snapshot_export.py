@@ -0,0 +1,72 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend.api.kbase import snapshot
+from backend.api.kbase.flat_vector_store import FlatVectorStore, FlatVectorStoreRegistry, read_snapshot_version
+from backend.api.kbase.models import KnowledgeBase
+
+
+class FakeResult:
+    def __init__(self, value=None, rows=None):
+        self.value = value
+        self.rows = rows
+
+    def scalar_one(self):
+        return self.value
+
+    async def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
+
+
+class FakeConnection:
+    """ Answers export_kbase_snapshot's queries in order: content_version, row count, then the rows. """
+    def __init__(self, content_version, rows):
+        self.scalars = [content_version, len(rows)]
+        self.rows = rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execution_options(self, **options):
+        return self
+
+    async def execute(self, stmt):
+        return FakeResult(value=self.scalars.pop(0))
+
+    async def stream(self, stmt):
+        return FakeResult(rows=self.rows)
+
+
+def test_exported_snapshot_is_served_by_the_registry(tmp_path, monkeypatch):
+    kbase = KnowledgeBase(name="flat", embedding_dim=2, vector_backend="flat", content_version=7)
+    rows = [
+        SimpleNamespace(id=uuid.uuid4(), source_uri="s3://b/a.pdf", content="alpha", metadata={"page": 1}, embedding=[1.0, 0.0]),
+        SimpleNamespace(id=uuid.uuid4(), source_uri="s3://b/a.pdf", content="beta", metadata={"page": 2}, embedding=[0.0, 1.0]),
+        SimpleNamespace(id=uuid.uuid4(), source_uri="s3://b/c.pdf", content="gamma", metadata=None, embedding=[0.6, 0.8]),
+    ]
+    monkeypatch.setattr(snapshot, "engine", SimpleNamespace(connect=lambda: FakeConnection(7, rows)))
+
+    async def from_postgres(*args, **kwargs):
+        raise AssertionError("the registry fell back to Postgres")
+
+    monkeypatch.setattr(FlatVectorStore, "from_postgres", staticmethod(from_postgres))
+
+    registry = FlatVectorStoreRegistry(snapshot_dir=str(tmp_path))
+    directory = registry.snapshot_path(kbase.id)
+    manifest = asyncio.run(snapshot.export_kbase_snapshot(kbase, directory, batch_size=2))
+    assert manifest["count"] == 3
+    assert manifest["content_version"] == 7
+    assert read_snapshot_version(directory) == 7
+
+    store = asyncio.run(registry.get(None, kbase))
+    assert len(store) == 3
+    assert store.content_version == 7
+    result = asyncio.run(store.similarity_search_by_vector([0.0, 1.0], k=1))
+    assert [chunk.content for chunk in result.chunks] == ["beta"]
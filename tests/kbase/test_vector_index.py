@@ -0,0 +1,59 @@
+import uuid
+
+import pytest
+
+from backend.api.kbase.vector_index import build_create_index_sql, build_drop_index_sql, index_name
+
+
+KBASE_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+
+def test_create_index_sql():
+    sql = build_create_index_sql(KBASE_ID, 1536, "cosine", "hnsw", {"m": 32})
+    assert sql.startswith(f"CREATE INDEX IF NOT EXISTS {index_name(KBASE_ID)} ON kbase_documents")
+    assert "USING hnsw ((embedding::vector(1536)) vector_cosine_ops)" in sql
+    assert "WITH (m = 32, ef_construction = 64)" in sql
+    assert sql.endswith(f"WHERE kbase_id = '{KBASE_ID}'")
+
+
+def test_large_and_quantized_embeddings_index_their_storage_type():
+    assert "(embedding::halfvec(3072)) halfvec_l2_ops" in build_create_index_sql(KBASE_ID, 3072, "l2", "ivfflat")
+    assert "bit_hamming_ops" in build_create_index_sql(KBASE_ID, 3072, "l2", "hnsw", quantization="binary")
+    with pytest.raises(ValueError):
+        build_create_index_sql(KBASE_ID, 5000, "l2", "hnsw")
+
+
+def test_concurrent_index_sql():
+    assert build_create_index_sql(KBASE_ID, 8, "l2", "hnsw", concurrently=True).startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS ")
+    assert build_drop_index_sql(KBASE_ID, concurrently=True) == f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(KBASE_ID)}"
+
+
+def test_search_params_reset_settings_left_by_an_earlier_search(monkeypatch):
+    import asyncio
+
+    from backend.api.kbase import pgvectorstore
+    from backend.api.kbase.pgvectorstore import PostgresVectorStore
+
+    class RecordingSession:
+        def __init__(self):
+            self.statements = []
+
+        async def execute(self, statement):
+            self.statements.append(statement)
+
+    def settings(statement):
+        return str(statement.compile(compile_kwargs={"literal_binds": True}))
+
+    monkeypatch.setattr(pgvectorstore, "_pgvector_version", (0, 8))
+    session = RecordingSession()
+    store = PostgresVectorStore(session, KBASE_ID, embedding_dim=8, index_type="hnsw")
+
+    async def run():
+        await store._apply_search_params(200, None, 10, filtered=True)
+        await store._apply_search_params(None, None, 10)
+
+    asyncio.run(run())
+    assert len(session.statements) == 2
+    first, second = (settings(statement) for statement in session.statements)
+    assert "'hnsw.iterative_scan', 'strict_order'" in first and "'hnsw.ef_search', '200'" in first
+    assert "'hnsw.iterative_scan', 'off'" in second and "'hnsw.ef_search', '40'" in second
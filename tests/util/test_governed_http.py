@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+import httpx
+
+from backend.util.governed_http import COMPLETION_TOKENS_ESTIMATE, RateGovernedTransport, _model_and_tokens
+
+
+def test_model_and_tokens_are_read_from_the_body():
+    body = json.dumps({"model": "gpt-4o", "messages": [{"role": "user", "content": "x" * 400}]})
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions", content=body)
+    model, tokens = _model_and_tokens(request)
+    assert model == "gpt-4o"
+    assert tokens == len(body) // 4 + COMPLETION_TOKENS_ESTIMATE
+    assert _model_and_tokens(httpx.Request("GET", "https://api.openai.com/v1/models"))[0] == "unknown"
+
+
+def test_429_is_retried_by_the_governor():
+    responses = [
+        httpx.Response(429, headers={"retry-after": "0"}, json={"error": "rate limited"}),
+        httpx.Response(200, json={"ok": True}),
+    ]
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return responses[len(seen) - 1]
+
+    async def main():
+        transport = RateGovernedTransport("openai", transport=httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.post("https://api.openai.com/v1/chat/completions", json={"model": "governed-http-test"})
+
+    response = asyncio.run(main())
+    assert response.status_code == 200
+    assert len(seen) == 2
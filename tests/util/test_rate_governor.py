@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from backend.util.rate_governor import (
+    BACKGROUND,
+    INTERACTIVE,
+    MAX_POLL_SECONDS,
+    WINDOW_SECONDS,
+    RateLimitedError,
+    RateLimitGovernor,
+    _Bucket,
+    background_priority,
+    parse_rate_limits,
+    rate_limit_retry_after,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__("429")
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def test_requests_per_minute_window_slides():
+    bucket = _Bucket(rpm=2, tpm=None)
+    assert bucket.reserve(0, INTERACTIVE, now=0.0) == 0
+    assert bucket.reserve(0, INTERACTIVE, now=1.0) == 0
+    assert bucket.reserve(0, INTERACTIVE, now=2.0) == pytest.approx(WINDOW_SECONDS - 2.0)
+    # The first request has left the window.
+    assert bucket.reserve(0, INTERACTIVE, now=WINDOW_SECONDS + 0.5) == 0
+
+
+def test_tokens_per_minute_waits_for_enough_tokens_to_expire():
+    bucket = _Bucket(rpm=None, tpm=100)
+    assert bucket.reserve(60, INTERACTIVE, now=0.0) == 0
+    assert bucket.reserve(30, INTERACTIVE, now=10.0) == 0
+    # 90 in the window; 50 more needs the first call (60 tokens) to expire.
+    assert bucket.reserve(50, INTERACTIVE, now=20.0) == pytest.approx(WINDOW_SECONDS - 20.0)
+
+
+def test_call_larger_than_token_limit_waits_for_an_empty_window():
+    bucket = _Bucket(rpm=None, tpm=100)
+    assert bucket.reserve(10, INTERACTIVE, now=0.0) == 0
+    assert bucket.reserve(10, INTERACTIVE, now=5.0) == 0
+    assert bucket.reserve(500, INTERACTIVE, now=6.0) == pytest.approx(WINDOW_SECONDS + 5.0 - 6.0)
+    assert bucket.reserve(500, INTERACTIVE, now=WINDOW_SECONDS + 5.5) == 0
+
+
+def test_background_yields_to_waiting_interactive_callers():
+    bucket = _Bucket(rpm=None, tpm=None)
+    bucket.waiting[INTERACTIVE] = 1
+    assert bucket.reserve(0, BACKGROUND, now=0.0) == MAX_POLL_SECONDS
+    assert bucket.reserve(0, INTERACTIVE, now=0.0) == 0
+
+
+def test_background_priority_context():
+    governor = RateLimitGovernor(limits={"openai/m": (1, None)})
+    seen = []
+
+    async def fn():
+        return "ok"
+
+    async def main():
+        with background_priority():
+            seen.append(governor._reserve("openai/m", 0, BACKGROUND, waiting=False))
+        return await asyncio.wait_for(governor.call("openai", "m", fn), timeout=0.1)
+
+    # The background call used the only request of the minute, so the interactive one has to wait.
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+    assert seen == [0]
+
+
+def test_rate_limit_errors_are_retried_then_raised():
+    governor = RateLimitGovernor(max_retries=2, base_backoff_seconds=0.001, max_backoff_seconds=0.001)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError({"retry-after-ms": "1"})
+        return "ok"
+
+    async def always_limited():
+        raise RateLimitError()
+
+    assert asyncio.run(governor.call("openai", "m", flaky)) == "ok"
+    assert governor.stats()["openai/m"]["throttled"] == 2
+    with pytest.raises(RateLimitedError):
+        asyncio.run(governor.call("openai", "other", always_limited))
+
+
+def test_other_errors_are_not_retried():
+    governor = RateLimitGovernor()
+
+    async def broken():
+        raise KeyError("boom")
+
+    with pytest.raises(KeyError):
+        asyncio.run(governor.call("openai", "m", broken))
+
+
+def test_rate_limit_retry_after():
+    assert rate_limit_retry_after(RateLimitError({"retry-after": "2"})) == (True, 2.0)
+    assert rate_limit_retry_after(RateLimitError({"retry-after-ms": "500"})) == (True, 0.5)
+    assert rate_limit_retry_after(RateLimitError()) == (True, None)
+    assert rate_limit_retry_after(ValueError()) == (False, None)
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("openai/gpt-4o=500:30000, Bedrock/titan=:1000") == {
+        "openai/gpt-4o": (500, 30000),
+        "bedrock/titan": (None, 1000),
+    }